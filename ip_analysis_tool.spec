@@ -36,6 +36,7 @@ a = Analysis(
         'scipy._lib.array_api_compat.numpy.fft',
         'scipy.special._special_ufuncs',
         'ip_analysis_tool.caching.graph_cache',
+        'ip_analysis_tool.caching.benchmark',
         'ip_analysis_tool.time_series_analysis',
         'ip_analysis_tool.h_backbone',
         'ip_analysis_tool.k_core'
@@ -4,19 +4,37 @@ from collections import defaultdict
 from pandas import DataFrame
 
 
+# Version of the stored hop distances, has to be increased whenever compute_hop_distances() gives different results
+ACCESSIBILITY_VERSION = 1
+
+
 def clamp(n, smallest, largest): return max(smallest, min(n, largest))
 
 
+def compute_hop_distances(g: gt.Graph) -> dict:
+    """
+    Computes the distance of each vertex from the starting node (the vertex 0) in hops, ignoring the direction of the edges.
+    :param g: The graph to analyze.
+    :return: The distances indexed by the vertex index, as a result of the derived results cache.
+    """
+    import numpy as np
+    dist_dict = gt.shortest_distance(g, source=g.vertex(0), directed=False)
+    return {"arrays": {"distance": np.array(dist_dict.a)}, "scalars": {}}
+
+
 def accessibility_within_hops(g: gt.Graph,
-                              get_ip_addresses=False) -> DataFrame:
+                              get_ip_addresses=False,
+                              cache=True) -> DataFrame:
     """
     Calculate the accessibility within hops for a given graph.
     :param g: The graph to analyze.
     :param get_ip_addresses: If True, include IP addresses in the output.
+    :param cache: Reuse the distances stored by a previous run for the same cached graph, see ip_analysis_tool.caching.derived_cache.
     :return:
     """
-    starting_node = g.vertex(0)
-    dist_dict = gt.shortest_distance(g, source=starting_node, directed=False)
+    from .caching.derived_cache import get_derived_result
+    dist_dict = g.new_vertex_property("int")
+    dist_dict.a = get_derived_result(g, "hop_distances", ACCESSIBILITY_VERSION, {}, compute_hop_distances, cache)["arrays"]["distance"]
 
     max_dist = int(max(dist_dict)) if dist_dict else 0
 
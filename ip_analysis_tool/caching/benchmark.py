@@ -0,0 +1,342 @@
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import TypedDict
+from ..util.date_util import get_date_string
+from ..enums import TimeInterval
+
+# Codecs compared by the codec benchmark unless given, see ip_analysis_tool.caching.graph_codec
+DEFAULT_BENCHMARK_CODECS = ("none", "gzip:1", "gzip", "xz", "zstd:3", "zstd:19")
+
+# Numbers of the synthetic routes per week built by the build benchmark unless given
+DEFAULT_BENCHMARK_SCALES = (10000, 100000, 1000000)
+
+# First day of the synthetic week built by the build benchmark
+SYNTHETIC_WEEK = datetime(2021, 1, 4)
+
+class BenchmarkResult(TypedDict):
+    """
+    Result of a single benchmarked run.
+    :param name: Name of the benchmarked variant, e.g. copy. (str)
+    :param rows: Number of the processed rows. (int)
+    :param seconds: Wall clock time of the run. (float)
+    :param rows_per_second: Throughput of the run. (float)
+    """
+    name: str
+    rows: int
+    seconds: float
+    rows_per_second: float
+
+class CodecBenchmarkResult(TypedDict):
+    """
+    Result of a codec over the benchmarked graphs.
+    :param codec: The codec, e.g. zstd:3. (str)
+    :param graphs: Number of the benchmarked graphs. (int)
+    :param size: Total size of the written graph files in bytes. (int)
+    :param ratio: Size relative to the uncompressed files. (float)
+    :param write_seconds: Total time of writing the graphs, the fastest of the runs. (float)
+    :param load_seconds: Total time of loading the graphs, the fastest of the runs. (float)
+    """
+    codec: str
+    graphs: int
+    size: int
+    ratio: float
+    write_seconds: float
+    load_seconds: float
+
+class BuildBenchmarkResult(TypedDict):
+    """
+    Result of a single run of the build benchmark.
+    :param scale: Number of the synthetic routes of the week. (int)
+    :param run: Index of the run. (int)
+    :param rows: Number of the routes returned by the query, which were added to the graph. (int)
+    :param seconds: Total time of the generation of the graph. (float)
+    :param rows_per_second: Throughput of the generation. (float)
+    :param phases: Dict of the phases mapped to their time in seconds, see ip_analysis_tool.caching.build_report.BUILD_PHASES. (dict)
+    :param peak_rss: Peak resident set size of the process after the run in bytes. (int)
+    :param file_size: Size of the saved graph file in bytes. (int)
+    :param num_vertices: Number of vertices of the graph. (int)
+    :param num_edges: Number of edges of the graph. (int)
+    """
+    scale: int
+    run: int
+    rows: int
+    seconds: float
+    rows_per_second: float
+    phases: dict
+    peak_rss: int
+    file_size: int
+    num_vertices: int
+    num_edges: int
+
+def benchmark_extraction(start, end, batch_size : int = None, repeat : int = 1, build : bool = False) -> list:
+    """
+    Measures how fast the routes of the given range are retrieved from the database with each of the extraction methods.
+    :param start: Date from which to retrieve the routes.
+    :param end: Date to which to retrieve the routes (exclusive).
+    :param batch_size: Number of rows fetched at once, see fetch_route_batches().
+    :param repeat: Number of runs of each method, the methods take turns so the database caches affect them equally.
+    :param build: Also feed the routes into a GraphBuilder, which measures the whole graph generation except for saving.
+    :return: List of BenchmarkResult, one for each run.
+    """
+    from .graph_cache import EXTRACTION_METHODS, create_non_reserved_ip_table, fetch_route_batches, load_starting_address
+    from .graph_builder import GraphBuilder
+    from ..util.database_util import connect_to_remote_db
+    rem_conn, rem_cur = connect_to_remote_db()
+    create_non_reserved_ip_table(rem_cur)
+    starting_address = load_starting_address()
+    results = []
+    try:
+        for _ in range(repeat):
+            for extraction in EXTRACTION_METHODS:
+                builder = GraphBuilder(start, starting_address) if build else None
+                rows = 0
+                began = perf_counter()
+                for batch in fetch_route_batches(rem_cur, get_date_string(start), get_date_string(end), batch_size, extraction=extraction):
+                    rows += len(batch)
+                    if builder is not None: builder.add_routes(batch)
+                if builder is not None: builder.finish()
+                seconds = perf_counter() - began
+                results.append({
+                    "name": extraction,
+                    "rows": rows,
+                    "seconds": seconds,
+                    "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+                })
+    finally:
+        rem_cur.close()
+        rem_conn.close()
+    return results
+
+def print_results(results : list):
+    """
+    Prints the benchmark results as a table.
+    :param results: List of BenchmarkResult.
+    """
+    print(f"{'name':<12}{'rows':>12}{'seconds':>12}{'rows/s':>14}")
+    for result in results:
+        print(f"{result['name']:<12}{result['rows']:>12}{result['seconds']:>12.3f}{result['rows_per_second']:>14.0f}")
+
+def benchmark_codecs(weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK, codecs = DEFAULT_BENCHMARK_CODECS, repeat : int = 1, limit : int = 5) -> list:
+    """
+    Measures the size, the write time and the load time of the cached graphs with each of the codecs.
+    The graphs are rewritten into a temporary folder, the cache itself isn't changed.
+    :param weighted_edges: Benchmark the graphs with weighted edges.
+    :param time_interval: Time interval of the benchmarked graphs.
+    :param codecs: The codecs, see ip_analysis_tool.caching.graph_codec.parse_codec(). Codecs whose package is missing are skipped.
+    :param repeat: Number of runs of each codec, the fastest one is reported.
+    :param limit: Number of the latest graphs of the cache to benchmark, ignored for TimeInterval.ALL.
+    :return: List of CodecBenchmarkResult, one for each codec.
+    """
+    import os
+    import tempfile
+    from .graph_codec import load_graph_file, save_graph_file, parse_codec
+    from ..util.graph_getter import get_graph_folder, get_graph_path
+    from ..util.date_util import get_cached_graph_files
+    if time_interval == TimeInterval.ALL:
+        paths = [get_graph_path(None, weighted_edges, time_interval)]
+    else:
+        paths = [f"{get_graph_folder(weighted_edges, time_interval)}/{f}" for f in get_cached_graph_files(weighted_edges, time_interval)[-limit:]]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        print("There are no cached graphs to benchmark.")
+        return []
+    graphs = [load_graph_file(path) for path in paths]
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for codec in codecs:
+            parse_codec(codec)
+            write_seconds, load_seconds = float("inf"), float("inf")
+            try:
+                for _ in range(repeat):
+                    began = perf_counter()
+                    for i, g in enumerate(graphs):
+                        save_graph_file(g, f"{folder}/{i}.gt", codec)
+                    write_seconds = min(write_seconds, perf_counter() - began)
+                    began = perf_counter()
+                    for i in range(len(graphs)):
+                        load_graph_file(f"{folder}/{i}.gt")
+                    load_seconds = min(load_seconds, perf_counter() - began)
+            except ImportError as e:
+                print(f"Skipping {codec}: {e}")
+                continue
+            results.append({
+                "codec": codec,
+                "graphs": len(graphs),
+                "size": sum(os.path.getsize(f"{folder}/{i}.gt") for i in range(len(graphs))),
+                "ratio": 0.0,
+                "write_seconds": write_seconds,
+                "load_seconds": load_seconds,
+            })
+    uncompressed = next((result["size"] for result in results if result["codec"] == "none"), None)
+    for result in results:
+        result["ratio"] = result["size"] / uncompressed if uncompressed else 0.0
+    return results
+
+def print_codec_results(results : list):
+    """
+    Prints the codec benchmark results as a table.
+    :param results: List of CodecBenchmarkResult.
+    """
+    from ..util.memory_util import format_size
+    print(f"{'codec':<12}{'graphs':>8}{'size':>10}{'ratio':>8}{'write s':>10}{'load s':>10}")
+    for result in results:
+        print(f"{result['codec']:<12}{result['graphs']:>8}{format_size(result['size']):>10}{result['ratio']:>8.2f}{result['write_seconds']:>10.3f}{result['load_seconds']:>10.3f}")
+
+def benchmark_build(scales = DEFAULT_BENCHMARK_SCALES, repeat : int = 1, weighted_edges : bool = False, extraction : str = "cursor", batch_size : int = None, seed : int = 0) -> list:
+    """
+    Measures the generation of week graphs from synthetic routes of several sizes, without the database. The routes are served by a SyntheticCursor
+    and the graphs are saved into a temporary folder with their own IP dictionary, the cache isn't changed.
+    :param scales: Numbers of the routes of the week.
+    :param repeat: Number of runs of each scale.
+    :param weighted_edges: Generate graphs with weighted edges.
+    :param extraction: How to retrieve the routes from the cursor, one of ip_analysis_tool.caching.graph_cache.EXTRACTION_METHODS.
+    :param batch_size: Number of rows fetched at once, see fetch_route_batches().
+    :param seed: Seed of the synthetic routes, the same seed gives the same routes for every scale.
+    :return: List of BuildBenchmarkResult, one for each run.
+    """
+    import tempfile
+    from .graph_cache import generate_interval_data
+    from .ip_dictionary import temporary_ip_dictionary
+    from .synthetic_routes import SyntheticCursor, SyntheticTopology, generate_routes
+    end = SYNTHETIC_WEEK + timedelta(days=7)
+    topology = SyntheticTopology(seed=seed)
+    results = []
+    for scale in scales:
+        rows = generate_routes(SYNTHETIC_WEEK.date(), end.date(), scale, topology, seed=seed)
+        for run in range(repeat):
+            with tempfile.TemporaryDirectory() as folder, temporary_ip_dictionary(f"{folder}/ip_dictionary.txt"):
+                result = generate_interval_data(SYNTHETIC_WEEK, end, SyntheticCursor(rows), folder, False, weighted_edges, TimeInterval.WEEK, batch_size,
+                                                extraction=extraction, codec="none", report=True)
+            report = result["report"]
+            results.append({
+                "scale": scale,
+                "run": run,
+                **{key: report[key] for key in ("rows", "seconds", "rows_per_second", "phases", "peak_rss", "file_size", "num_vertices", "num_edges")},
+            })
+    return results
+
+def get_commit() -> str:
+    """
+    Returns the commit of the benchmarked code.
+    :return: Hash of the checked out commit, with a + suffix if there are uncommitted changes. None if the code isn't in a git repository.
+    """
+    import os
+    import subprocess
+    folder = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=folder, capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=folder, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+" if changes else "")
+
+def save_build_results(path : str, results : list, parameters : dict):
+    """
+    Saves the build benchmark results as JSON, so the runs of different commits can be compared, see print_build_results().
+    :param path: Path to the output file.
+    :param results: List of BuildBenchmarkResult.
+    :param parameters: Parameters of the benchmark.
+    """
+    import json
+    import platform
+    with open(path, "w") as f:
+        json.dump({
+            "commit": get_commit(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "parameters": parameters,
+            "results": results,
+        }, f, indent=2)
+
+def summarize_build_results(results : list) -> dict:
+    """
+    Summarizes the runs of each scale by their median.
+    :param results: List of BuildBenchmarkResult.
+    :return: Dict of the scales mapped to dicts of the median seconds, rows_per_second and of each phase, and the rows, num_vertices and num_edges of the graph.
+    """
+    from statistics import median
+    summary = {}
+    for scale in dict.fromkeys(result["scale"] for result in results):
+        runs = [result for result in results if result["scale"] == scale]
+        summary[scale] = {
+            "rows": runs[0]["rows"],
+            "num_vertices": runs[0]["num_vertices"],
+            "num_edges": runs[0]["num_edges"],
+            "seconds": median(run["seconds"] for run in runs),
+            "rows_per_second": median(run["rows_per_second"] for run in runs),
+            "phases": {phase: median(run["phases"][phase] for run in runs) for phase in runs[0]["phases"]},
+        }
+    return summary
+
+def print_build_results(results : list, baseline : dict = None):
+    """
+    Prints the medians of the build benchmark runs of each scale as a table.
+    :param results: List of BuildBenchmarkResult.
+    :param baseline: Results saved by save_build_results(), e.g. of another commit. The speedup of each scale against it is printed as well.
+    """
+    summary = summarize_build_results(results)
+    reference = summarize_build_results(baseline["results"]) if baseline is not None else {}
+    if baseline is not None: print(f"Baseline: {baseline.get('commit') or 'unknown commit'}")
+    print(f"{'scale':>10}{'rows':>10}{'vertices':>10}{'edges':>10}{'seconds':>10}{'rows/s':>10}{'build s':>10}{'save s':>10}" + (f"{'speedup':>10}" if baseline is not None else ""))
+    for scale, medians in summary.items():
+        line = (f"{scale:>10}{medians['rows']:>10}{medians['num_vertices']:>10}{medians['num_edges']:>10}{medians['seconds']:>10.3f}{medians['rows_per_second']:>10.0f}"
+                f"{medians['phases']['construction']:>10.3f}{medians['phases']['save']:>10.3f}")
+        if baseline is not None:
+            line += f"{medians['rows_per_second'] / reference[scale]['rows_per_second']:>10.2f}" if scale in reference else f"{'-':>10}"
+        print(line)
+
+def main(args = None):
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description="Benchmarks of the graph cache generation.")
+    parser.add_argument("suite", choices=["extraction", "codec", "build"],
+                        help="What to benchmark. extraction: rows per second retrieved from the database by cursor iteration and by COPY. "
+                             "codec: size, write time and load time of the cached graphs with each compression codec. "
+                             "build: generation of week graphs from synthetic routes of several sizes, without the database.")
+    parser.add_argument("-r", "--range", nargs=2,
+                        help="Date range of the benchmarked routes, the end is inclusive. Format is YYYY-MM-DD. Default is the week containing the latest data.")
+    parser.add_argument("-b", "--batch_size", type=int,
+                        help="Number of rows fetched at once. If not given, the cursor fetches the whole range at once.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs of each variant. Default is 3.")
+    parser.add_argument("--build", action="store_true", help="Also build a graph from the routes (without saving it).")
+    parser.add_argument("-i", "--interval", default="WEEK", help="Time interval of the graphs benchmarked by the codec suite. Possible values: WEEK, MONTH, YEAR, ALL, default: WEEK")
+    parser.add_argument("-w", "--weighted_edges", action="store_true", help="Benchmark the codecs or the build on the graphs with weighted edges.")
+    parser.add_argument("-c", "--codecs", nargs="+", default=list(DEFAULT_BENCHMARK_CODECS),
+                        help=f"Codecs compared by the codec suite, e.g. none gzip:9 zstd:19. Default is {' '.join(DEFAULT_BENCHMARK_CODECS)}.")
+    parser.add_argument("-l", "--limit", type=int, default=5, help="Number of the latest cached graphs benchmarked by the codec suite. Default is 5.")
+    parser.add_argument("-s", "--scales", type=int, nargs="+", default=list(DEFAULT_BENCHMARK_SCALES),
+                        help=f"Numbers of the synthetic routes per week built by the build suite. Default is {' '.join(map(str, DEFAULT_BENCHMARK_SCALES))}.")
+    parser.add_argument("-e", "--extraction", choices=["cursor", "copy"], default="cursor", help="How the build suite retrieves the synthetic routes. Default is cursor.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic routes of the build suite. Default is 0.")
+    parser.add_argument("-o", "--output", help="Save the results of the build suite with the benchmarked commit to the given JSON file.")
+    parser.add_argument("--baseline", help="JSON file saved by --output, e.g. of another commit, the build suite prints its speedup against it.")
+    args = parser.parse_args(args)
+
+    if args.suite == "build":
+        import json
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        results = benchmark_build(args.scales, args.repeat, args.weighted_edges, args.extraction, args.batch_size, args.seed)
+        print_build_results(results, baseline)
+        if args.output:
+            save_build_results(args.output, results, {"scales": args.scales, "repeat": args.repeat, "weighted_edges": args.weighted_edges,
+                                                      "extraction": args.extraction, "batch_size": args.batch_size, "seed": args.seed})
+        return
+
+    if args.suite == "codec":
+        print_codec_results(benchmark_codecs(args.weighted_edges, TimeInterval[args.interval.upper()], args.codecs, args.repeat, args.limit))
+        return
+
+    if args.range:
+        start = datetime.strptime(args.range[0], "%Y-%m-%d").date()
+        end = datetime.strptime(args.range[1], "%Y-%m-%d").date()
+    else:
+        from ..util.database_util import get_database_range
+        from ..util.date_util import get_parent_week
+        from .graph_cache import to_date
+        start, end = get_parent_week(to_date(get_database_range()[1]))
+    if args.suite == "extraction":
+        print_results(benchmark_extraction(start, end + timedelta(days=1), args.batch_size, args.repeat, args.build))
+
+if __name__ == "__main__": main()
@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+from typing import TypedDict
+
+# Phases of the generation of a graph, in the order they happen
+BUILD_PHASES = ("query", "first_row", "fetch", "construction", "metadata", "save")
+
+class BuildReport(TypedDict):
+    """
+    Instrumentation of the generation of a single graph, written as one JSON line of the run report.
+    :param interval: Granularity of the interval, e.g. week, or scan for the shared pass over the routes of generate_data_single_scan(). (str)
+    :param start: First day of the interval. Format is YYYY-MM-DD. (str)
+    :param path: Path to the saved graph, None for the scan. (str)
+    :param rows: Number of the processed route rows. (int)
+    :param phases: Dict of the phases (see BUILD_PHASES) mapped to their wall clock time in seconds. (dict)
+    query is the execution of the query, first_row the wait for the first batch of rows after it, fetch the wait for the rest of them,
+    construction the time spent adding the routes and creating the graph, metadata the time spent on the metadata and the side-stores, save the writing of the files.
+    :param seconds: Total time of the phases. (float)
+    :param rows_per_second: Throughput of the whole generation. (float)
+    :param peak_rss: Peak resident set size of the generating process so far in bytes. (int)
+    :param file_size: Size of the saved graph file in bytes, None for the scan. (int)
+    :param num_vertices: Number of vertices of the graph, None for the scan. (int)
+    :param num_edges: Number of edges of the graph, None for the scan. (int)
+    """
+    interval: str
+    start: str
+    path: str
+    rows: int
+    phases: dict
+    seconds: float
+    rows_per_second: float
+    peak_rss: int
+    file_size: int
+    num_vertices: int
+    num_edges: int
+
+def get_peak_rss() -> int:
+    """
+    Returns the peak resident set size of the current process.
+    :return: Number of bytes.
+    """
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class BuildTimer:
+    """
+    Accumulates the time spent in each phase of the generation of a graph and the number of the processed rows.
+    """
+    def __init__(self):
+        self.phases = dict.fromkeys(BUILD_PHASES, 0.0)
+        self.rows = 0
+
+    @contextmanager
+    def phase(self, name : str):
+        """
+        Measures the enclosed block as a part of the given phase.
+        :param name: One of BUILD_PHASES.
+        """
+        began = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += perf_counter() - began
+
+    def time_batches(self, batches):
+        """
+        Measures the retrieval of the batches of rows and their processing.
+        The wait for the first batch is first_row (without the query phase measured meanwhile), the wait for the others is fetch, the time until the next batch is requested is construction.
+        :param batches: Generator of lists of records, e.g. returned by fetch_route_batches().
+        :return: A generator of the same batches.
+        """
+        first = True
+        try:
+            while True:
+                began, query = perf_counter(), self.phases["query"]
+                batch = next(batches, None)
+                elapsed = perf_counter() - began
+                if first:
+                    self.phases["first_row"] += elapsed - (self.phases["query"] - query)
+                    first = False
+                else:
+                    self.phases["fetch"] += elapsed
+                if batch is None: return
+                self.rows += len(batch)
+                began = perf_counter()
+                yield batch
+                self.phases["construction"] += perf_counter() - began
+        finally:
+            batches.close()
+
+    def create_report(self, time_interval, start, result : dict = None) -> BuildReport:
+        """
+        Creates the report of the generated graph.
+        :param time_interval: Granularity of the interval (ip_analysis_tool.enums.TimeInterval), or a name such as scan.
+        :param start: First day of the interval. (datetime.date)
+        :param result: IntervalBuildResult of the graph, None if no graph was saved.
+        :return: The report.
+        """
+        from ..util.date_util import get_date_string
+        seconds = sum(self.phases.values())
+        path = result["path"] if result is not None else None
+        return {
+            "interval": str(time_interval).lower(),
+            "start": get_date_string(start),
+            "path": path,
+            "rows": self.rows,
+            "phases": dict(self.phases),
+            "seconds": seconds,
+            "rows_per_second": self.rows / seconds if seconds > 0 else 0.0,
+            "peak_rss": get_peak_rss(),
+            "file_size": os.path.getsize(path) if path is not None and os.path.exists(path) else None,
+            "num_vertices": result["num_vertices"] if result is not None else None,
+            "num_edges": result["num_edges"] if result is not None else None,
+        }
+
+def write_report(path : str, report : BuildReport):
+    """
+    Appends a report to the run report file as a JSON line.
+    :param path: Path to the report file.
+    :param report: The report.
+    """
+    with open(path, "a") as f:
+        f.write(json.dumps(report) + "\n")
+
+def load_reports(path : str) -> list:
+    """
+    Reads the reports of a run report file.
+    :param path: Path to the report file.
+    :return: List of BuildReport.
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_slowest_intervals(reports : list, count : int = 10):
+    """
+    Prints the slowest generated graphs as a table with the time of each phase.
+    :param reports: List of BuildReport.
+    :param count: Number of the printed graphs.
+    """
+    from ..util.memory_util import format_size
+    reports = sorted(reports, key=lambda report: report["seconds"], reverse=True)[:count]
+    if not reports: return
+    print(f"Slowest {len(reports)} graphs:")
+    print(f"{'interval':<18}{'rows':>12}{'rows/s':>10}" + "".join(f"{phase:>13}" for phase in BUILD_PHASES) + f"{'total s':>10}{'peak RSS':>10}{'size':>10}")
+    for report in reports:
+        file_size = format_size(report["file_size"]) if report["file_size"] is not None else "-"
+        print(f"{report['interval'] + ' ' + report['start']:<18}{report['rows']:>12}{report['rows_per_second']:>10.0f}"
+              + "".join(f"{report['phases'][phase]:>13.3f}" for phase in BUILD_PHASES)
+              + f"{report['seconds']:>10.3f}{format_size(report['peak_rss']):>10}{file_size:>10}")
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import TypedDict
+import numpy as np
+
+# Suffix of the folder holding the derived results of a cached graph
+DERIVED_SUFFIX = ".derived"
+
+class DerivedResult(TypedDict):
+    """
+    Result of an analysis of a graph, which can be stored in the derived results cache.
+    :param arrays: Dict of names mapped to numpy arrays, e.g. a vertex property indexed by the vertex index. (dict)
+    :param scalars: Dict of names mapped to JSON serializable values. (dict)
+    """
+    arrays: dict
+    scalars: dict
+
+def get_derived_path(graph_path : str) -> str:
+    """
+    Returns the path to the folder of the derived results of a cached graph.
+    :param graph_path: Path to the .gt file of the graph.
+    :return: Path to the folder.
+    """
+    return (graph_path[:-3] if graph_path.endswith(".gt") else graph_path) + DERIVED_SUFFIX
+
+def remove_derived_results(graph_path : str):
+    """
+    Removes all the derived results of a cached graph, e.g. when the graph is generated again.
+    :param graph_path: Path to the .gt file of the graph.
+    """
+    shutil.rmtree(get_derived_path(graph_path), ignore_errors=True)
+
+def get_result_key(algorithm : str, version : int, parameters : dict) -> str:
+    """
+    Returns the name of the folder of a result.
+    :param algorithm: Name of the algorithm, e.g. k_core.
+    :param version: Version of the algorithm, has to be increased whenever its results change.
+    :param parameters: Parameters affecting the result.
+    :return: Name made of the algorithm and a hash of its version and parameters.
+    """
+    digest = hashlib.sha1(json.dumps({"version": version, "parameters": parameters}, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{algorithm}-{digest}"
+
+def get_source_path(g):
+    """
+    Returns the path to the cached graph file the graph was loaded from, if its derived results can be cached.
+    Results are only cached for whole graphs, as the stored arrays are indexed by the vertex and edge indices of the file. Views are never cached, they may be filtered, reversed or share a modified graph.
+    :param g: The graph. (graph_tool.Graph)
+    :return: Path to the .gt file, None if the graph doesn't come from the cache, is a view or was filtered.
+    """
+    from graph_tool import GraphView
+    if isinstance(g, GraphView) or "metadata" not in g.gp or g.get_vertex_filter()[0] is not None or g.get_edge_filter()[0] is not None:
+        return None
+    from ..util.graph_getter import get_source_graph_path
+    try:
+        path = get_source_graph_path(g)
+    except (ValueError, KeyError):
+        return None
+    return path if os.path.exists(path) else None
+
+def get_properties_digest(g, properties : list) -> str:
+    """
+    Returns a hash of the values of the given properties, so the results computed from edited properties aren't mixed up with the ones of the file.
+    :param g: The graph. (graph_tool.Graph)
+    :param properties: Names of the scalar edge or vertex properties, edge properties are looked up first.
+    :return: Hex digest of the values.
+    """
+    digest = hashlib.sha1()
+    for name in properties:
+        prop = g.ep[name] if name in g.ep else g.vp[name]
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(prop.fa).tobytes())
+    return digest.hexdigest()
+
+def load_derived_result(folder : str, source : dict):
+    """
+    Loads a stored result, if it was computed from the current graph file.
+    :param folder: Folder of the result.
+    :param source: Description of the graph file, see get_derived_result().
+    :return: The result, None if it's missing or outdated.
+    """
+    try:
+        with open(f"{folder}/result.json") as f:
+            stored = json.load(f)
+        if stored["source"] != source: return None
+        arrays = {name: np.load(f"{folder}/{name}.npy") for name in stored["arrays"]}
+    except (OSError, ValueError, KeyError):
+        return None
+    return {"arrays": arrays, "scalars": stored["scalars"]}
+
+def save_derived_result(folder : str, source : dict, algorithm : str, version : int, parameters : dict, result : DerivedResult):
+    """
+    Stores a result, replacing the previous one.
+    :param folder: Folder of the result.
+    :param source: Description of the graph file, see get_derived_result().
+    """
+    temporary = f"{folder}.tmp{os.getpid()}"
+    if os.path.exists(temporary): shutil.rmtree(temporary)
+    os.makedirs(temporary)
+    for name, values in result["arrays"].items():
+        np.save(f"{temporary}/{name}.npy", np.asarray(values))
+    with open(f"{temporary}/result.json", "w") as f:
+        json.dump({"algorithm": algorithm, "version": version, "parameters": parameters, "source": source,
+                   "arrays": list(result["arrays"]), "scalars": result["scalars"]}, f)
+    if os.path.exists(folder):
+        shutil.rmtree(folder, ignore_errors=True)
+    try:
+        os.replace(temporary, folder)
+    except OSError:
+        # Another process stored the same result at the same time
+        shutil.rmtree(temporary, ignore_errors=True)
+
+def get_derived_result(g, algorithm : str, version : int, parameters : dict, compute, cache : bool = True, properties : list = None) -> DerivedResult:
+    """
+    Returns the result of an analysis of a cached graph, it's only computed if it isn't stored yet.
+    Results are stored per graph file, algorithm version and parameters next to the graph. They are outdated once the graph file changes (graph_cache removes them when it generates the interval again),
+    the number of the vertices or edges of the graph differs from the stored one or the values of the properties read by the algorithm differ.
+    :param g: The graph. (graph_tool.Graph)
+    :param algorithm: Name of the algorithm, e.g. k_core.
+    :param version: Version of the algorithm, has to be increased whenever its results change.
+    :param parameters: JSON serializable parameters affecting the result, the directedness of the graph is added.
+    :param compute: Function computing the DerivedResult from the graph.
+    :param cache: Whether to use the cache, graphs not coming from the cache and views are always computed.
+    :param properties: Names of the edge or vertex properties read by the algorithm, e.g. ["traversals"]. The topology is covered by the number of the vertices and edges only.
+    :return: The result.
+    """
+    path = get_source_path(g) if cache else None
+    if path is None:
+        return compute(g)
+    stat = os.stat(path)
+    source = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "num_vertices": g.num_vertices(), "num_edges": g.num_edges()}
+    if properties:
+        source["properties"] = get_properties_digest(g, properties)
+    parameters = {**parameters, "directed": bool(g.is_directed())}
+    folder = f"{get_derived_path(path)}/{get_result_key(algorithm, version, parameters)}"
+    result = load_derived_result(folder, source)
+    if result is None:
+        result = compute(g)
+        save_derived_result(folder, source, algorithm, version, parameters, result)
+    return result
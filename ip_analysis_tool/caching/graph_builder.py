@@ -0,0 +1,393 @@
+import datetime
+import os
+from array import array
+from json import dumps, loads
+from typing import TypedDict
+from graph_tool import Graph
+from sortedcontainers import SortedSet
+from ..util.date_util import get_date_string
+from ..util.ip_util import INVALID_ADDRESS, int_to_ip, ips_to_ints
+from .build_report import BuildReport, BuildTimer
+from .graph_codec import load_graph_codec, save_graph_file
+from .ip_dictionary import get_ip_dictionary
+from .derived_cache import remove_derived_results
+from .graph_store import RaggedProperty, get_edge_order, save_ragged_properties, save_scalar_properties, split_properties
+from .latency_stats import LatencyStatistics
+from .manifest import GraphSummary, create_graph_summary
+from ..enums import TimeInterval
+
+# Version of the graph building, has to be increased whenever the generated graphs change, so the cached graphs are regenerated by incremental runs
+BUILD_VERSION = 7
+
+def get_build_parameters(weighted_edges : bool, starting_address : str) -> dict:
+    """
+    Returns the parameters affecting the generated graphs, they are recorded in the cache manifest.
+    :param weighted_edges: Whether the graphs have weighted edges.
+    :param starting_address: Address from which the routes were measured.
+    :return: Dict of the build parameters.
+    """
+    return {
+        "version": BUILD_VERSION,
+        "weighted_edges": weighted_edges,
+        "starting_address": starting_address,
+    }
+
+def is_nondecreasing_array(arr) -> bool:
+    """
+    Determine if an array is non-decreasing.
+    :param arr: Input array.
+    :return: Whether the array is non-decreasing.
+    """
+    size = len(arr)
+    for i in range(1, size):
+        if arr[i] < arr[i - 1]:
+            return False
+    return True
+
+def intern_addresses(address_ids : dict, routes):
+    """
+    Converts all the addresses of the given routes, which haven't been seen yet, to integers.
+    Addresses which aren't valid IPv4 addresses (e.g. IPv6) get their own negative keys below INVALID_ADDRESS, so each of them is still a separate vertex.
+    :param address_ids: Dict of the already converted addresses, it's updated in place.
+    :param routes: Iterable of routes, lists of addresses in the CIDR notation.
+    """
+    new_addresses = set().union(*routes).difference(address_ids.keys())
+    # The dict only grows, so its size before the update makes the keys of the invalid addresses unique
+    first_invalid = INVALID_ADDRESS - 1 - len(address_ids)
+    ids = ips_to_ints(new_addresses)
+    for k, address in enumerate(new_addresses):
+        if ids[k] == INVALID_ADDRESS: ids[k] = first_invalid - k
+    address_ids.update(zip(new_addresses, ids))
+
+class IntervalBuildResult(TypedDict):
+    """
+    Summary of a graph generated for a single interval.
+    :param path: Path to the saved graph. (str)
+    :param num_vertices: Number of vertices of the graph. (int)
+    :param num_edges: Number of edges of the graph. (int)
+    :param summary: Summary of the graph for the manifest, for TimeInterval.ALL it describes all.gt. (ip_analysis_tool.caching.manifest.GraphSummary)
+    :param report: Instrumentation of the generation, only set by generate_interval_data() when a report is requested. (ip_analysis_tool.caching.build_report.BuildReport)
+    """
+    path: str
+    num_vertices: int
+    num_edges: int
+    summary: GraphSummary
+    report: BuildReport
+
+def set_latency_properties(properties, new_property, statistics : LatencyStatistics, name : str, size : int):
+    """
+    Sets the latency statistics as scalar properties of a graph: min_, max_, avg_<name>, <name>_count and <name>_variance.
+    :param properties: Vertex or edge property maps of the graph (g.vp or g.ep).
+    :param new_property: Function creating a new property map, g.new_vertex_property or g.new_edge_property.
+    :param statistics: The latency statistics.
+    :param name: Name of the latency, distance for vertices and weight for edges.
+    :param size: Number of the vertices or edges.
+    """
+    statistics.resize(size)
+    properties[f"min_{name}"] = new_property("float", vals=statistics.minimum())
+    properties[f"max_{name}"] = new_property("float", vals=statistics.maximum())
+    properties[f"avg_{name}"] = new_property("float", vals=statistics.mean)
+    properties[f"{name}_count"] = new_property("int", vals=statistics.count)
+    properties[f"{name}_variance"] = new_property("float", vals=statistics.variance())
+
+def get_histogram_properties(statistics : LatencyStatistics, name : str, size : int) -> dict:
+    """
+    Converts the histogram sketches of the latency statistics to ragged properties.
+    :param statistics: The latency statistics.
+    :param name: Name of the latency, distance for vertices and weight for edges.
+    :param size: Number of the vertices or edges.
+    :return: Dict with the <name>_histogram_bins and <name>_histogram_counts ragged properties.
+    """
+    statistics.resize(size)
+    offsets, bins, counts = statistics.get_histograms()
+    return {
+        f"{name}_histogram_bins": RaggedProperty(offsets, bins),
+        f"{name}_histogram_counts": RaggedProperty(offsets, counts),
+    }
+
+class GraphBuilder:
+    """
+    Builds a graph for a single interval from the routes fed into it. Routes are records of (t_route, t_roundtrip, t_date) from the topology table.
+    Addresses are interned as 32-bit integers and the vertices and edges are kept in plain lists indexed by their index, the graph itself is only created by finish().
+    Route indices recorded on every hop are appended to flat typed arrays, which are saved in the CSR form into a side-store next to the graph.
+    Latencies of the vertices and of the weighted edges are summarized by streaming statistics, whose histogram sketches are saved into the side-store as well.
+    """
+    def __init__(self, start : datetime.date, starting_address : str, weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK, address_ids : dict = None):
+        """
+        :param start: First day of the interval, used as the name of the resulting graph.
+        :param starting_address: Address from which the routes were measured.
+        :param weighted_edges: Whether to generate weighted edges.
+        :param time_interval: Granularity of the interval.
+        :param address_ids: Dict of the addresses as returned by the database mapped to their integer form, can be shared by several builders.
+        """
+        self.start = start
+        self.weighted_edges = weighted_edges
+        self.time_interval = time_interval
+        self.address_ids = address_ids if address_ids is not None else {}
+
+        # Vertex properties, indexed by the vertex index
+        self.vertex_ips = []
+        self.vertex_traversals = []
+        self.hop_distance = []
+        self.position_in_route = [] # 1 - start, 2 - end
+        self.distance_statistics = LatencyStatistics()
+
+        # Edge properties, indexed by the edge index
+        self.edge_sources = []
+        self.edge_targets = []
+        self.edge_traversals = []
+        self.weight_statistics = LatencyStatistics()
+
+        # Route indices recorded on each hop of the routes
+        self.hop_vertices = array("q")
+        self.hop_edges = array("q")
+        self.hop_routes = array("q")
+
+        # Integer address -> vertex index, the starting vertex isn't included
+        self.address_to_node = {}
+        # Packed (source index << 32 | target index) -> edge index
+        self.existing_edges = {}
+        self.route_dates = SortedSet()
+        # Index of the next route, skipped routes are counted as well
+        self.route_count = 0
+        # The starting address may not be an IPv4 address (e.g. localhost), its key can't be the key of any hop
+        self.starting_address = starting_address
+        self.starting_key = INVALID_ADDRESS
+        self.starting_node = self.new_node(None, "")
+
+    def new_node(self, address : int, ip : str) -> int:
+        """
+        Adds a new vertex.
+        :param address: Integer form of the address, None for the starting vertex.
+        :param ip: Value of the ip property.
+        :return: Index of the vertex.
+        """
+        node = len(self.vertex_ips)
+        if address is not None: self.address_to_node[address] = node
+        self.vertex_ips.append(ip)
+        self.vertex_traversals.append(0)
+        self.hop_distance.append(0)
+        self.position_in_route.append(0)
+        return node
+
+    def add_node(self, address, route, i, endpoint):
+        """
+        Adds a node to the graph if it doesn't exist.
+        """
+        if i == -1: return self.starting_node
+        node = self.address_to_node.get(address)
+        # Check if the address is already in the graph, the invalid addresses keep their original form without the prefix length
+        if node is None:
+            node = self.new_node(address, int_to_ip(address) if address >= 0 else route[i].split("/")[0])
+        # Add position in route
+        if address == endpoint:
+            self.position_in_route[node] = 2
+        return node
+
+    def add_route(self, route, times, date):
+        """
+        Adds a single route to the graph.
+        :param route: List of the addresses on the route in the CIDR notation.
+        :param times: List of the roundtrip times to each of the addresses on the route.
+        :param date: Date and time of the measurement.
+        """
+        weighted_edges = self.weighted_edges
+        starting_node = self.starting_node
+        route_index = self.route_count
+        self.route_count += 1
+        if weighted_edges and not is_nondecreasing_array(times): return
+        self.vertex_traversals[starting_node] += 1
+        try:
+            addresses = [self.address_ids[address] for address in route]
+        except KeyError:
+            intern_addresses(self.address_ids, [route])
+            addresses = [self.address_ids[address] for address in route]
+        endpoint = addresses[-1]
+        hop_distance = self.hop_distance
+        distance_owners, distance_values = self.distance_statistics.owners, self.distance_statistics.values
+        weight_owners, weight_values = self.weight_statistics.owners, self.weight_statistics.values
+        # Position of the last hop whose distance was recorded, each hop is recorded once per route
+        last_recorded = -1
+
+        src = self.starting_key
+        for i, dest in enumerate(addresses):
+            if i > 0: src = addresses[i - 1]
+
+            # 0 is 0.0.0.0, an unknown hop
+            if src != 0 and dest != 0 and src != dest:
+                src_node = self.add_node(src, route, i - 1, endpoint)
+                dest_node = self.add_node(dest, route, i, endpoint)
+
+                edge_key = (src_node << 32) | dest_node
+                edge = self.existing_edges.get(edge_key)
+                # Add edge if it doesn't exist
+                if edge is None:
+                    edge = len(self.edge_sources)
+                    self.existing_edges[edge_key] = edge
+                    self.edge_sources.append(src_node)
+                    self.edge_targets.append(dest_node)
+                    self.edge_traversals.append(1)
+
+                # Increment number of traversals
+                self.edge_traversals[edge] += 1
+                self.vertex_traversals[dest_node] += 1
+                # Set the hop distance - the smallest we can find
+                if (hop_distance[dest_node] == 0 or hop_distance[dest_node] > i + 1) and dest_node != starting_node:
+                    hop_distance[dest_node] = i + 1
+
+                # Add distance to the nodes, the source only if it follows an unknown hop
+                if i > 0 and last_recorded != i - 1:
+                    distance_owners.append(src_node)
+                    distance_values.append(times[i - 1] / 2)
+                distance_owners.append(dest_node)
+                distance_values.append(times[i] / 2)
+                last_recorded = i
+
+                # Add route index to edge and vertex
+                self.hop_vertices.append(dest_node)
+                self.hop_edges.append(edge)
+                self.hop_routes.append(route_index)
+
+                if weighted_edges:
+                    weight_owners.append(edge)
+                    weight_values.append((times[i] - (times[i - 1] if i > 0 else 0)) / 2)
+
+        # Check if we had the date before
+        if isinstance(date, datetime.datetime): date = date.date()
+        if date not in self.route_dates:
+            self.route_dates.add(date)
+
+    def add_routes(self, records):
+        """
+        Adds a batch of records to the graph.
+        :param records: List of (t_route, t_roundtrip, t_date) records.
+        """
+        # Convert the addresses of the whole batch at once
+        intern_addresses(self.address_ids, (record[0] for record in records))
+        for record in records:
+            self.add_route(record[0], record[1], record[2])
+        self.distance_statistics.flush_if_needed()
+        self.weight_statistics.flush_if_needed()
+
+    def get_ragged_properties(self) -> tuple:
+        """
+        Converts the route indices recorded on each hop and the latency histogram sketches to ragged properties.
+        :return: A tuple of dicts of the vertex and the edge ragged properties.
+        """
+        import numpy as np
+        num_vertices, num_edges = len(self.vertex_ips), len(self.edge_sources)
+        hop_vertices = np.frombuffer(self.hop_vertices, dtype=np.int64)
+        hop_edges = np.frombuffer(self.hop_edges, dtype=np.int64)
+        hop_routes = np.frombuffer(self.hop_routes, dtype=np.int64).astype(np.int32)
+        vertex_properties = {
+            "routes": RaggedProperty.from_owners(hop_vertices, hop_routes, num_vertices),
+            **get_histogram_properties(self.distance_statistics, "distance", num_vertices),
+        }
+        edge_properties = {
+            "routes": RaggedProperty.from_owners(hop_edges, hop_routes, num_edges),
+        }
+        if self.weighted_edges:
+            edge_properties.update(get_histogram_properties(self.weight_statistics, "weight", num_edges))
+        return vertex_properties, edge_properties
+
+    def finish(self) -> Graph:
+        """
+        Creates the graph with all its scalar properties and metadata. The ragged properties are returned by get_ragged_properties().
+        :return: The finished graph.
+        """
+        g = self.create_graph()
+        self.add_metadata(g)
+        return g
+
+    def create_graph(self) -> Graph:
+        """
+        Creates the graph with all its scalar properties, without the metadata.
+        :return: The graph.
+        """
+        import numpy as np
+        g = Graph(directed=True)
+        g.add_vertex(len(self.vertex_ips))
+        if self.edge_sources:
+            g.add_edge_list(np.column_stack((self.edge_sources, self.edge_targets)))
+
+        # Set up vertex properties
+        g.vp["traversals"] = g.new_vertex_property("int", vals=self.vertex_traversals)
+        g.vp["hop_distance"] = g.new_vertex_property("int", vals=self.hop_distance)
+        g.vp['ip'] = g.new_vertex_property("string")
+        g.vp['position_in_route'] = g.new_vertex_property("int", vals=self.position_in_route)
+        # Stable IDs of the addresses shared by all the cached graphs
+        g.vp["gid"] = g.new_vertex_property("int64_t", vals=get_ip_dictionary().get_ids(self.vertex_ips))
+        set_latency_properties(g.vp, g.new_vertex_property, self.distance_statistics, "distance", len(self.vertex_ips))
+        for v, ip in zip(g.vertices(), self.vertex_ips):
+            g.vp.ip[v] = ip
+
+        # Set up edge properties
+        g.ep['traversals'] = g.new_edge_property("int", vals=self.edge_traversals)
+
+        if self.weighted_edges:
+            set_latency_properties(g.ep, g.new_edge_property, self.weight_statistics, "weight", len(self.edge_sources))
+        return g
+
+    def add_metadata(self, g : Graph):
+        """
+        Adds the metadata of the interval to a graph created by create_graph().
+        :param g: The graph.
+        """
+        max_distance = self.distance_statistics.maximum()
+        overall_trips = self.vertex_traversals[self.starting_node]
+        endpoints = [v for v in range(len(self.vertex_ips)) if self.position_in_route[v] == 2]
+        # Add metadata to the graph
+        g.gp["metadata"] = g.new_graph_property("string")
+        g.gp["metadata"] = dumps({
+            "date": get_date_string(self.start),
+            "route_dates": [get_date_string(date) for date in self.route_dates],
+            "weighted_edges": self.weighted_edges,
+            "time_interval": str(self.time_interval).lower(),
+            "overall_trips": overall_trips,
+            "avg_endpoint_distance": (sum([self.hop_distance[v] for v in endpoints]) / overall_trips) if overall_trips != 0 else 0,
+            "avg_endpoint_distance_ms": (sum([float(max_distance[v]) for v in endpoints]) / overall_trips) if overall_trips != 0 else 0,
+             })
+
+    def save(self, data_folder : str, verbose : bool = False, codec : str = None, timer : BuildTimer = None) -> IntervalBuildResult:
+        """
+        Finishes the graph and saves it into the cache.
+        :param data_folder: Folder of the time interval, e.g. ~/.cache/IPAnalysisTool/graphs/week
+        :param verbose: Verbose output.
+        :param codec: Compression codec of the graph file, see ip_analysis_tool.caching.graph_codec. If None, the one configured for the time interval is used.
+        :param timer: Measures the construction, metadata and save phases, see ip_analysis_tool.caching.build_report.
+        :return: Summary of the saved graph.
+        """
+        if codec is None: codec = load_graph_codec(self.time_interval)
+        if timer is None: timer = BuildTimer()
+        with timer.phase("construction"):
+            g = self.create_graph()
+        start = get_date_string(self.start)
+        data_folder = data_folder + f"/{'base' if not self.weighted_edges else 'weighted'}"
+        if not os.path.exists(data_folder): os.makedirs(data_folder)
+        with timer.phase("metadata"):
+            self.add_metadata(g)
+            vertex_properties, edge_properties = self.get_ragged_properties()
+            # The ragged properties are indexed by the edge index of the builder, the saved graph numbers the edges by their source vertex
+            edge_order = get_edge_order(g)
+            edge_properties = {name: prop.take(edge_order) for name, prop in edge_properties.items()}
+            num_vertices, num_edges, metadata = g.num_vertices(), g.num_edges(), loads(g.gp.metadata)
+            # Only the topology and the core properties are kept in the .gt file, the rest is loaded on demand from the side-store
+            scalar_properties = split_properties(g)
+        paths = [f"{data_folder}/all.gt", f"{data_folder}/{start}.gt"] if self.time_interval == TimeInterval.ALL else [f"{data_folder}/{start}.gt"]
+        with timer.phase("save"):
+            for path in paths:
+                # The graph file is written last, its modification time invalidates the graphs held in memory
+                save_scalar_properties(path, scalar_properties)
+                save_ragged_properties(path, vertex_properties, edge_properties)
+                save_graph_file(g, path, codec)
+                # Results derived from the previous graph of the interval are outdated
+                remove_derived_results(path)
+        if verbose:
+            print(f"Generated{' weighted' if self.weighted_edges else ''} graph for the {str(self.time_interval).lower()} starting with {start}.")
+            print(f"Number of vertices: {num_vertices}\nNumber of edges: {num_edges}")
+        return {
+            "path": f"{data_folder}/{start}.gt",
+            "num_vertices": num_vertices,
+            "num_edges": num_edges,
+            "summary": create_graph_summary(paths[0], num_vertices, num_edges, metadata),
+        }
@@ -1,24 +1,37 @@
 from datetime import datetime, timedelta
+import datetime as dt
 import os
-from graph_tool import Graph
-from ..util.date_util import get_parent_interval, iterate_range, get_date_string
+from .build_report import BuildTimer, print_slowest_intervals, write_report
+from .graph_builder import GraphBuilder, IntervalBuildResult, get_build_parameters, intern_addresses, is_nondecreasing_array
+from .manifest import load_manifest, save_manifest, create_manifest_entry, create_graph_summary, is_stale, is_summary_current, SourceStatistics, GRAPH_FILE_PATTERN
+from ..util.date_util import get_parent_interval, get_parent_year, iterate_range, get_date_string
 from ..util.database_util import connect_to_remote_db
-from json import dumps
-from sortedcontainers import SortedSet
 from ..enums import TimeInterval
 import yaml
 
-def is_nondecreasing_array(arr) -> bool:
-    """
-    Determine if an array is non-decreasing.
-    :param arr: Input array.
-    :return: Whether the array is non-decreasing.
-    """
-    size = len(arr)
-    for i in range(1, size):
-        if arr[i] < arr[i - 1]:
-            return False
-    return True
+# Number of rows taken from a client-side cursor at once
+DEFAULT_FETCH_SIZE = 10000
+
+# Ways of retrieving the routes from the database: iterating a cursor, or bulk COPY ... TO STDOUT
+EXTRACTION_METHODS = ("cursor", "copy")
+
+# Where the routes are read from: the remote database, or the local archive written by export_archive()
+SOURCES = ("database", "archive")
+
+# Ways of leaving out the routes to reserved destinations: joining the non-reserved IP table built in the database, or filtering the routes on the client
+FILTERING_METHODS = ("database", "client")
+
+# Statistics of an interval without any routes
+EMPTY_SOURCE : SourceStatistics = {"row_count": 0, "max_date": None}
+
+# Conditions on the topology rows used for the graphs, the non-reserved IP table is joined as n
+ROUTE_CONDITIONS = """
+               NOT ('0.0.0.0/32' = ANY(t_route))
+               AND t_status = 'C'
+               AND t_date >= %s
+               AND t_date <= %s
+               AND t_hops > 1
+            """
 
 def load_starting_address() -> str:
     """
@@ -38,204 +51,80 @@ def load_starting_address() -> str:
 
     return config["starting_address"] if config["starting_address"] else "localhost"
 
-# Generates a graph based on all data from start date to end date
-def generate_interval_data(start, end, rem_cur, data_folder : str, verbose : bool, weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK):
+def load_reserved_ranges() -> list:
     """
-    Generate graphs from the database data for a given interval. Used by generate_data() from the same module.
-    :param start: Date from which to start generating the graphs.
-    :param end: Date to which to end generating the data.
-    :param rem_cur: Database cursor used to retrieve data from the database.
-    :param data_folder: Folder where to store the graphs. Default is ~/.cache/IPAnalysisTool/graphs/
-    :param verbose: Verbose output.
-    :param weighted_edges: Whether to generate weighted edges.
-    :param time_interval: Granularity of the time intervals for which the data is going to be generated.
-    :return:
+    Loads the reserved IPv4 blocks used by the client-side filtering from the config file (reserved_ranges, a list of blocks in the CIDR notation).
+    If they aren't defined, ip_analysis_tool.util.ip_util.DEFAULT_RESERVED_RANGES are returned.
+    :return: List of the blocks as strings.
     """
+    from ..util.ip_util import DEFAULT_RESERVED_RANGES
+    config = None
+    try:
+        with open(os.path.expanduser("~/.config/IPAnalysisTool/config.yml"), "r") as f:
+            config = yaml.safe_load(f)
+    except:
+        return list(DEFAULT_RESERVED_RANGES)
+    ranges = config.get("reserved_ranges") if isinstance(config, dict) else None
+    return [str(block) for block in ranges] if ranges else list(DEFAULT_RESERVED_RANGES)
 
-    def add_node(g, address, times, i, endpoint):
-        """
-        Adds a node to the graph if it doesn't exist, otherwise updates the node's properties.
-        """
-        if i == -1: return starting_node
-        # Check if the address is already in the graph
-        if address not in address_to_node:
-            node = g.add_vertex()
-            address_to_node[address] = node
-            node_to_address[node] = address
-            ip_address[node] = address
-            min_node_distance[node] = times[i] / 2
-            max_node_distance[node] = times[i] / 2
-            avg_node_distance[node] = times[i] / 2
-        else:
-            # If the address is already in the graph, only update the node's properties
-            node = address_to_node[address]
-            avg_node_distance[node] = (avg_node_distance[node] + float(times[i] / 2)) / 2
-            if times[i] < min_node_distance[node]: min_node_distance[node] = times[i] / 2
-            if times[i] > max_node_distance[node]: max_node_distance[node] = times[i] / 2
-        # Add position in route
-        if address == endpoint:
-            position_in_route[node] = 2
-        return node
-
-    start = datetime.strftime(start, '%Y-%m-%d')
-    end = datetime.strftime(end, '%Y-%m-%d')
-
-    g = Graph(directed=True)
-
-    # Set up vertex properties
-    ip_address = g.new_vertex_property("string")
-    position_in_route = g.new_vertex_property("int") # 1 - start, 2 - end
-    node_distances = g.new_vertex_property("vector<double>")
-    min_node_distance = g.new_vertex_property("float")
-    max_node_distance = g.new_vertex_property("float")
-    avg_node_distance = g.new_vertex_property("float")
-    g.vp["traversals"] = g.new_vertex_property("int")
-    g.vp["hop_distance"] = g.new_vertex_property("int")
-    g.vp['ip'] = ip_address
-    g.vp['position_in_route'] = position_in_route
-    g.vp['distances'] = node_distances
-    g.vp['min_distance'] = min_node_distance
-    g.vp['max_distance'] = max_node_distance
-    g.vp['avg_distance'] = avg_node_distance
-    g.vp["routes"] = g.new_vertex_property("vector<int>")
-
-    # Set up edge properties
-    traversals_num = g.new_edge_property("int")
-    g.ep['traversals'] = traversals_num
-    g.ep["routes"] = g.new_edge_property("vector<int>")
-
-    address_to_node = {}
-    node_to_address = {}
-
-    if weighted_edges:
-        edge_weights = g.new_edge_property("vector<double>")
-        min_edge_weight = g.new_edge_property("float")
-        avg_edge_weight = g.new_edge_property("float")
-        max_edge_weight = g.new_edge_property("float")
-        g.edge_properties['weights'] = edge_weights
-        g.edge_properties['avg_weight'] = avg_edge_weight
-        g.edge_properties['max_weight'] = max_edge_weight
-        g.edge_properties['min_weight'] = min_edge_weight
-
-    rem_cur.execute(f"""
-                    SELECT t_route, t_roundtrip, t_date FROM topology t JOIN non_reserved_ip n ON n.ip_addr = t.ip_addr
-                       WHERE NOT ('0.0.0.0/32' = ANY(t_route))
-                       AND t_status = 'C'
-                       AND t_date >= '{start}'
-                       AND t_date <= '{end}'
-                       AND t_hops > 1
-""")
-
-    existing_edges = {}
-    route_dates = SortedSet()
-    starting_node = g.add_vertex()
-    starting_address = load_starting_address()
-    node_to_address[starting_node] = starting_address
-    address_to_node[starting_address] = starting_node
-
-    for route_index, record in enumerate(rem_cur):
-        route = record[0]
-        times = record[1]
-        if weighted_edges and not is_nondecreasing_array(times): continue
-        date = record[2]
-        g.vp["traversals"][starting_node] += 1
-        endpoint = route[-1].split("/")[0]
-        route_length = len(route)
-
-        for i in range(route_length):
-            if i == 0: src, dest = starting_address, route[0]
-            else: src, dest = route[i - 1], route[i]
-
-            if not(src == '0.0.0.0/32' or dest == '0.0.0.0/32') and src != dest:
-                src_address = src.split("/")[0]
-                dest_address = dest.split("/")[0]
-
-                src_node = add_node(g, src_address, times, i - 1, endpoint)
-                dest_node = add_node(g, dest_address, times, i, endpoint)
-
-                # Add edge if it doesn't exist
-                if (src_address, dest_address) not in existing_edges.keys():
-                    edge = g.add_edge(address_to_node[src_address], address_to_node[dest_address])
-                    existing_edges[(src_address, dest_address)] = edge
-                    traversals_num[edge] = 1
-                    if weighted_edges:
-                        min_edge_weight[edge] = (times[i] - (times[i - 1] if i > 0 else 0)) / 2
-                # Update edge's weights if it does exist
-                else:
-                    edge = existing_edges[(src_address, dest_address)]
-
-
-                # Increment number of traversals
-                traversals_num[edge] += 1
-                g.vp["traversals"][dest_node] += 1
-                # Set the hop distance - the smallest we can find
-                if (g.vp["hop_distance"][dest_node] == 0 or g.vp["hop_distance"][dest_node] > i + 1) and dest_node != starting_node:
-                    g.vp["hop_distance"][dest_node] = i + 1
-
-                # Add distance to node
-                node_distances[dest_node].append(times[i] / 2)
-
-                # Add route index to edge and vertex
-                g.ep.routes[edge].append(route_index)
-                g.vp.routes[dest_node].append(route_index)
-
-                if weighted_edges:
-                    edgeWeight = (times[i] - (times[i - 1] if i > 0 else 0)) / 2
-                    edge_weights[edge].append(edgeWeight)
-                    if edgeWeight > float(max_edge_weight[edge]): max_edge_weight[edge] = edgeWeight
-                    if edgeWeight < float(min_edge_weight[edge]): min_edge_weight[edge] = edgeWeight
-
-        # Check if we had the date before
-        date = date.date()
-        if date not in route_dates:
-            route_dates.add(date)
-
-    if weighted_edges:
-        for e in g.edges():
-            avg_edge_weight[e] = sum(edge_weights[e]) / len(edge_weights[e])
-
-    # Add metadata to the graph
-    g.gp["metadata"] = g.new_graph_property("string")
-    g.gp["metadata"] = dumps({
-        "date": start,
-        "route_dates": [get_date_string(date) for date in route_dates],
-        "weighted_edges": weighted_edges,
-        "time_interval": str(time_interval).lower(),
-        "overall_trips": g.vp["traversals"][starting_node] if starting_node != None else 0,
-        "avg_endpoint_distance": (sum([g.vp["hop_distance"][v] for v in g.vertices() if position_in_route[v] == 2]) / g.vp["traversals"][starting_node]) if g.vp["traversals"][starting_node] != 0 else 0,
-        "avg_endpoint_distance_ms": (sum([max_node_distance[v] for v in g.vertices() if position_in_route[v] == 2]) / g.vp["traversals"][starting_node]) if g.vp["traversals"][starting_node] != 0 else 0,
-         })
-    data_folder = data_folder + f"/{'base' if not weighted_edges else 'weighted'}"
-    if not os.path.exists(data_folder): os.makedirs(data_folder)
-    if time_interval == TimeInterval.ALL:
-        g.save(f"{data_folder}/all.gt")
-    g.save(f"{data_folder}/{start}.gt")
-    if verbose:
-        print(f"Generated{' weighted' if weighted_edges else ''} graph for the {str(time_interval).lower()} starting with {start}.")
-        print(f"Number of vertices: {g.num_vertices()}\nNumber of edges: {g.num_edges()}")
+def get_route_filter(non_reserved_table : str, reserved_ranges : list) -> tuple:
+    """
+    Returns the parts of a topology query leaving out the routes to reserved destinations.
+    :param non_reserved_table: Name of the table of non-reserved IP addresses, used if reserved_ranges is None.
+    :param reserved_ranges: Reserved IPv4 blocks, the rows with the destination within them are left out by a condition instead of the join.
+    :return: Tuple of the join clause, an additional condition and its parameters.
+    """
+    if reserved_ranges is None:
+        return f"JOIN {non_reserved_table} n ON n.ip_addr = t.ip_addr", "", ()
+    return "", "AND NOT (t.ip_addr <<= ANY(%s::inet[]))", (list(reserved_ranges),)
 
-# For each time interval, generate a graph
-def generate_data(start: datetime.date, end: datetime.date, verbose: bool = False, weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK):
+def filter_reserved_routes(records : list, reserved_index, address_ids : dict) -> list:
     """
-    Generates graphs from database data.
-    :param start: Date, from which to start graph generation.
-    :param end: Date, at which to end graph generation.
-    :param verbose: Verbose output.
-    :param weighted_edges: Generate a graph with weighted edges, usually results in a much smaller graph.
-    :param time_interval: Interval to split the data into.
-    :return:
+    Leaves out the routes to destinations within the reserved blocks.
+    Destinations which aren't valid IPv4 addresses (e.g. IPv6) are kept, the same as by the database filtering, which only compares IPv4 addresses with the IPv4 blocks.
+    :param records: List of (t_route, t_roundtrip, t_date, ip_addr) records.
+    :param reserved_index: Index of the reserved blocks. (ip_analysis_tool.util.ip_util.ReservedRangeIndex)
+    :param address_ids: Dict of the already converted destination addresses, it's updated in place.
+    :return: List of (t_route, t_roundtrip, t_date) records of the non-reserved destinations.
     """
-    # Database connection setup
-    rem_conn, rem_cur = connect_to_remote_db()
+    import numpy as np
+    intern_addresses(address_ids, [[record[3] for record in records]])
+    addresses = np.fromiter((address_ids[record[3]] for record in records), dtype=np.int64, count=len(records))
+    # The addresses which aren't valid IPv4 addresses have negative keys, they are never within a block
+    keep = ~reserved_index.contains(addresses)
+    return [record[:3] for record, kept in zip(records, keep) if kept]
+
+def to_date(date) -> dt.date:
+    """
+    Converts a datetime.datetime to a datetime.date, dates are returned unchanged.
+    :param date: Input date or datetime.
+    :return: The date part of the input.
+    """
+    return date.date() if isinstance(date, datetime) else date
 
+def get_data_folder(time_interval : TimeInterval) -> str:
+    """
+    Returns the cache folder of the given time interval, creating it if it doesn't exist.
+    :param time_interval: Time interval of the graphs.
+    :return: Path to the folder, e.g. ~/.cache/IPAnalysisTool/graphs/week
+    """
     data_folder : str = os.path.expanduser(f"~/.cache/IPAnalysisTool/graphs/{str(time_interval).lower()}")
     if not os.path.exists(data_folder):
         os.makedirs(data_folder)
-    
-    if verbose: print("Connected to the database, gathering a list of non-reserved IP addresses.")
+    return data_folder
 
+def create_non_reserved_ip_table(rem_cur, verbose : bool = False, table_name : str = "non_reserved_ip", temporary : bool = True):
+    """
+    Creates a table of the measured hosts, which don't belong to any reserved IP range.
+    :param rem_cur: Database cursor.
+    :param verbose: Verbose output.
+    :param table_name: Name of the created table.
+    :param temporary: Create a temporary table, which is only available for the lifetime of the cursor's connection.
+    Otherwise, an unlogged table visible to other connections is created and committed, it has to be dropped by drop_non_reserved_ip_table().
+    """
+    if verbose: print("Connected to the database, gathering a list of non-reserved IP addresses.")
     # Create a table of non-reserved IP addresses
-    rem_cur.execute("""CREATE TEMPORARY TABLE non_reserved_ip AS
+    rem_cur.execute(f"""CREATE {'TEMPORARY' if temporary else 'UNLOGGED'} TABLE {table_name} AS
                        (SELECT h.ip_addr AS ip_addr FROM hosts h WHERE
                        NOT (h.ip_addr <<= '0.0.0.0/8' 
                        OR h.ip_addr <<= '0.0.0.0/32' 
@@ -263,30 +152,597 @@ def generate_data(start: datetime.date, end: datetime.date, verbose: bool = Fals
                         )
                     )"""
                    )
-    if verbose:
-        print("Created non-reserved ip list.")
-        print(f"Generating graphs by {str(time_interval).lower()}.")
+    if not temporary:
+        rem_cur.execute(f"CREATE INDEX ON {table_name} (ip_addr)")
+        rem_cur.connection.commit()
+    if verbose: print("Created non-reserved ip list.")
+
+def drop_non_reserved_ip_table(rem_cur, table_name : str):
+    """
+    Drops a table created by create_non_reserved_ip_table() with temporary=False.
+    :param rem_cur: Database cursor.
+    :param table_name: Name of the table.
+    """
+    rem_cur.connection.rollback()
+    rem_cur.execute(f"DROP TABLE IF EXISTS {table_name}")
+    rem_cur.connection.commit()
+
+def close_connection(rem_conn, rem_cur, table_name : str = None):
+    """
+    Closes the database connection of a generation run, first dropping its non-reserved IP table if it isn't temporary.
+    :param rem_conn: Database connection, None if the database wasn't used.
+    :param rem_cur: Database cursor.
+    :param table_name: Name of the table created by create_non_reserved_ip_table() with temporary=False, None if there is none.
+    """
+    if rem_conn is None: return
+    try:
+        if table_name is not None: drop_non_reserved_ip_table(rem_cur, table_name)
+    finally:
+        rem_cur.close()
+        rem_conn.close()
 
+def fetch_route_batches(rem_cur, start : str, end : str, batch_size : int = None, order_by_date : bool = False, non_reserved_table : str = "non_reserved_ip", extraction : str = "cursor", reserved_ranges : list = None, source : str = "database", timer : BuildTimer = None):
+    """
+    Retrieves the routes (t_route, t_roundtrip, t_date) for the given date range from the database in batches.
+    :param rem_cur: Database cursor, its connection must have the non_reserved_ip table available.
+    :param start: Date from which to retrieve the routes. Format is YYYY-MM-DD.
+    :param end: Date to which to retrieve the routes (exclusive). Format is YYYY-MM-DD.
+    :param batch_size: Number of rows to fetch at once. If set, a named (server-side) cursor is used, so only one batch is held in client memory at a time.
+    If None, the whole result set is transferred to the client at once, as with a regular cursor.
+    :param order_by_date: Return the routes ordered by their date.
+    :param non_reserved_table: Name of the table of non-reserved IP addresses. If None, the routes aren't filtered and the address of their destination is added as the fourth item of the records.
+    :param extraction: Either cursor, or copy to transfer the rows in bulk using COPY ... TO STDOUT, in batches of batch_size (or DEFAULT_FETCH_SIZE) records.
+    :param reserved_ranges: Reserved IPv4 blocks. If given, the non-reserved table isn't needed, the routes to destinations within the blocks are filtered out on the client.
+    :param source: Either database, or archive to read the routes from the local archive, which were already filtered when exported. rem_cur and the filtering parameters aren't used then,
+    the routes are always ordered by their date.
+    :param timer: Measures the execution of the query by the cursor extraction, see ip_analysis_tool.caching.build_report. The query of COPY and the archive aren't measured separately from their first rows.
+    :return: A generator of lists of records.
+    """
+    if source == "archive":
+        from .route_archive import archive_route_batches
+        yield from archive_route_batches(start, end, batch_size)
+        return
+    if reserved_ranges is not None:
+        from ..util.ip_util import ReservedRangeIndex
+        reserved_index = ReservedRangeIndex(reserved_ranges)
+        address_ids = {}
+        for batch in fetch_route_batches(rem_cur, start, end, batch_size, order_by_date, extraction=extraction, non_reserved_table=None, timer=timer):
+            batch = filter_reserved_routes(batch, reserved_index, address_ids)
+            if batch: yield batch
+        return
+    if non_reserved_table is None:
+        # Unfiltered routes with their destination, for the client-side filtering
+        query = f"""
+            SELECT t_route, t_roundtrip, t_date, host(t.ip_addr) FROM topology t
+               WHERE {ROUTE_CONDITIONS}"""
+    else:
+        query = f"""
+            SELECT t_route, t_roundtrip, t_date FROM topology t JOIN {non_reserved_table} n ON n.ip_addr = t.ip_addr
+               WHERE {ROUTE_CONDITIONS}"""
+    if order_by_date: query += " ORDER BY t_date"
+    if extraction == "copy":
+        from .route_copy import copy_route_batches
+        # COPY doesn't take parameters, bind them client-side
+        yield from copy_route_batches(rem_cur, rem_cur.mogrify(query, (start, end)).decode(), batch_size if batch_size else DEFAULT_FETCH_SIZE)
+        return
+    if batch_size:
+        # Server-side cursor, rows are only transferred when fetched
+        cursor = rem_cur.connection.cursor(name=f"routes_{start}_{end}".replace("-", "_"))
+        cursor.itersize = batch_size
+    else:
+        cursor = rem_cur
+    try:
+        if timer is not None:
+            with timer.phase("query"):
+                cursor.execute(query, (start, end))
+        else:
+            cursor.execute(query, (start, end))
+        while True:
+            batch = cursor.fetchmany(batch_size if batch_size else DEFAULT_FETCH_SIZE)
+            if not batch: break
+            yield batch
+    finally:
+        if cursor is not rem_cur: cursor.close()
+
+def fetch_source_statistics(rem_cur, start : str, end : str, time_interval : TimeInterval, non_reserved_table : str = "non_reserved_ip", reserved_ranges : list = None, source : str = "database") -> dict:
+    """
+    Retrieves the number of rows and the latest date of the routes for each interval in the given date range.
+    :param rem_cur: Database cursor, its connection must have the non-reserved IP table available.
+    :param start: Date from which to count the routes. Format is YYYY-MM-DD.
+    :param end: Date to which to count the routes. Format is YYYY-MM-DD.
+    :param time_interval: Granularity of the intervals. For TimeInterval.ALL, the whole range is a single interval named by the start date.
+    :param non_reserved_table: Name of the table of non-reserved IP addresses.
+    :param reserved_ranges: Reserved IPv4 blocks. If given, they are left out by a condition and the non-reserved table isn't needed.
+    :param source: Either database, or archive to count the routes of the local archive.
+    :return: Dict of the first days of the intervals (YYYY-MM-DD) mapped to the statistics of their routes, intervals without routes are left out.
+    """
+    if source == "archive":
+        from .route_archive import archive_source_statistics
+        return archive_source_statistics(start, end, time_interval)
+    join, condition, parameters = get_route_filter(non_reserved_table, reserved_ranges)
+    if time_interval == TimeInterval.ALL:
+        rem_cur.execute(f"""
+            SELECT %s, COUNT(*), MAX(t_date) FROM topology t {join}
+               WHERE {ROUTE_CONDITIONS} {condition}""", (start, start, end) + parameters)
+    else:
+        # date_trunc starts weeks on Mondays, same as get_parent_week()
+        rem_cur.execute(f"""
+            SELECT date_trunc(%s, t_date)::date, COUNT(*), MAX(t_date) FROM topology t {join}
+               WHERE {ROUTE_CONDITIONS} {condition}
+               GROUP BY 1""", (str(time_interval).lower(), start, end) + parameters)
+    return {
+        (row[0] if isinstance(row[0], str) else get_date_string(row[0])): {
+            "row_count": row[1],
+            "max_date": row[2].isoformat() if row[2] is not None else None,
+        } for row in rem_cur.fetchall() if row[1] > 0}
+
+def get_data_range(source : str = "database") -> tuple:
+    """
+    Returns the earliest and latest date of the routes in the given source.
+    :param source: Either database or archive.
+    :return: The earliest and latest date, (None, None) if the archive is empty.
+    """
+    if source == "archive":
+        from .route_archive import get_archive_range
+        return get_archive_range()
     from ..util.database_util import get_database_range
-    data_start, data_end = get_database_range()
-    # If we don't do across all the data, we split it into intervals
-    if time_interval != TimeInterval.ALL:
-        from ..util.date_util import clamp_range
-        # Clamp data range to the database range
+    return get_database_range()
+
+def is_open_interval(last) -> bool:
+    """
+    Determines whether an interval can still receive new data.
+    :param last: Last day of the interval.
+    :return: True if the interval doesn't end before today.
+    """
+    return to_date(last) >= dt.date.today()
+
+# Generates a graph based on all data from start date to end date
+def generate_interval_data(start, end, rem_cur, data_folder : str, verbose : bool, weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK, batch_size : int = None, non_reserved_table : str = "non_reserved_ip", extraction : str = "cursor", reserved_ranges : list = None, source : str = "database", codec : str = None, report : bool = False) -> IntervalBuildResult:
+    """
+    Generate graphs from the database data for a given interval. Used by generate_data() from the same module.
+    :param start: Date from which to start generating the graphs.
+    :param end: Date to which to end generating the data.
+    :param rem_cur: Database cursor used to retrieve data from the database.
+    :param data_folder: Folder where to store the graphs. Default is ~/.cache/IPAnalysisTool/graphs/
+    :param verbose: Verbose output.
+    :param weighted_edges: Whether to generate weighted edges.
+    :param time_interval: Granularity of the time intervals for which the data is going to be generated.
+    :param batch_size: Number of rows to fetch from the database at once using a server-side cursor. If None, the whole interval is fetched at once.
+    :param non_reserved_table: Name of the table of non-reserved IP addresses.
+    :param extraction: How to retrieve the routes from the database, one of EXTRACTION_METHODS.
+    :param reserved_ranges: Reserved IPv4 blocks filtered out on the client. If None, the non-reserved table is used.
+    :param source: Where to read the routes from, one of SOURCES. rem_cur may be None for the archive.
+    :param codec: Compression codec of the graph file, see ip_analysis_tool.caching.graph_codec. If None, the one configured for the time interval is used.
+    :param report: Measure the phases of the generation and add their BuildReport to the result, see ip_analysis_tool.caching.build_report.
+    :return: Summary of the generated graph.
+    """
+    timer = BuildTimer()
+    builder = GraphBuilder(to_date(start), load_starting_address(), weighted_edges, time_interval)
+    batches = fetch_route_batches(rem_cur, datetime.strftime(start, '%Y-%m-%d'), datetime.strftime(end, '%Y-%m-%d'), batch_size, non_reserved_table=non_reserved_table, extraction=extraction, reserved_ranges=reserved_ranges, source=source, timer=timer)
+    for batch in (timer.time_batches(batches) if report else batches):
+        builder.add_routes(batch)
+    result = builder.save(data_folder, verbose, codec, timer)
+    if report: result["report"] = timer.create_report(time_interval, to_date(start), result)
+    return result
+
+# Connection of the current worker process, see generate_data_parallel()
+_worker_connection = None
+
+def _init_worker():
+    """
+    Opens the database connection of a worker process, only used when the routes are read from the database.
+    """
+    global _worker_connection
+    _worker_connection, _ = connect_to_remote_db()
+
+def _generate_interval_worker(start, end, data_folder : str, verbose : bool, weighted_edges : bool, time_interval : TimeInterval, batch_size : int, non_reserved_table : str, extraction : str, reserved_ranges : list, source : str, codec : str, report : bool) -> IntervalBuildResult:
+    """
+    Generates a graph for a single interval in a worker process using the connection of the worker.
+    """
+    if _worker_connection is None:
+        return generate_interval_data(start, end, None, data_folder, verbose, weighted_edges, time_interval, batch_size, non_reserved_table, extraction, reserved_ranges, source, codec, report)
+    rem_cur = _worker_connection.cursor()
+    try:
+        return generate_interval_data(start, end, rem_cur, data_folder, verbose, weighted_edges, time_interval, batch_size, non_reserved_table, extraction, reserved_ranges, source, codec, report)
+    finally:
+        rem_cur.close()
+        # End the transaction, a failed query would otherwise break the following intervals
+        _worker_connection.rollback()
+
+def generate_data_parallel(intervals : list, data_folder : str, verbose : bool, weighted_edges : bool, time_interval : TimeInterval, batch_size : int, non_reserved_table : str, workers : int, on_success = None, extraction : str = "cursor", reserved_ranges : list = None, source : str = "database", codec : str = None, report : bool = False) -> list:
+    """
+    Generates the graphs for the given intervals in a pool of worker processes, each of them with its own database connection.
+    :param intervals: List of the (start, end) intervals to generate.
+    :param data_folder: Folder of the time interval.
+    :param verbose: Verbose output.
+    :param weighted_edges: Whether to generate weighted edges.
+    :param time_interval: Granularity of the intervals.
+    :param batch_size: Number of rows to fetch from the database at once.
+    :param non_reserved_table: Name of the table of non-reserved IP addresses, it has to be visible to other connections.
+    :param workers: Number of worker processes.
+    :param on_success: Function called in the main process with the start of the interval and the IntervalBuildResult, whenever an interval is generated.
+    :param extraction: How to retrieve the routes from the database, one of EXTRACTION_METHODS.
+    :param reserved_ranges: Reserved IPv4 blocks filtered out on the client. If None, the non-reserved table is used.
+    :param source: Where to read the routes from, one of SOURCES. The workers only connect to the database if it's used.
+    :param codec: Compression codec of the graph files, None for the configured one.
+    :param report: Add the BuildReport of each interval to its result passed to on_success.
+    :return: List of (start, error message) of the intervals which failed to generate.
+    """
+    import concurrent.futures
+    failures = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker if source == "database" else None) as executor:
+        future_to_start = {
+            executor.submit(_generate_interval_worker, first, last + timedelta(days=1), data_folder, verbose, weighted_edges, time_interval, batch_size, non_reserved_table, extraction, reserved_ranges, source, codec, report): first
+            for first, last in intervals}
+        for done, future in enumerate(concurrent.futures.as_completed(future_to_start), start=1):
+            first = future_to_start[future]
+            try:
+                result = future.result()
+                if on_success is not None: on_success(first, result)
+                status = "done"
+            except Exception as e:
+                failures.append((first, f"{type(e).__name__}: {e}"))
+                status = "failed"
+            print(f"[{done}/{len(intervals)}] {str(time_interval).lower()} {get_date_string(first)} {status}")
+    return failures
+
+# For each time interval, generate a graph
+def generate_data(start: datetime.date, end: datetime.date, verbose: bool = False, weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK, batch_size : int = None, workers : int = 1, incremental : bool = False, extraction : str = "cursor", filtering : str = "database", source : str = "database", codec : str = None, report : str = None):
+    """
+    Generates graphs from database data.
+    :param start: Date, from which to start graph generation.
+    :param end: Date, at which to end graph generation.
+    :param verbose: Verbose output.
+    :param weighted_edges: Generate a graph with weighted edges, usually results in a much smaller graph.
+    :param time_interval: Interval to split the data into.
+    :param batch_size: Stream the data from the database in batches of this many rows using a server-side cursor, which keeps the memory usage bounded. If None, each interval is fetched at once.
+    :param workers: Number of processes generating the intervals in parallel.
+    :param incremental: Only generate the intervals whose graphs are missing, or whose source data or build parameters changed since they were generated, according to the cache manifest.
+    Intervals which haven't ended yet are always generated.
+    :param extraction: How to retrieve the routes from the database, one of EXTRACTION_METHODS. Both give the same graphs, copy is faster.
+    :param filtering: How to leave out the routes to reserved destinations, one of FILTERING_METHODS. client skips building the non-reserved IP table in the database,
+    the reserved blocks are taken from the config file (see load_reserved_ranges()).
+    :param source: Where to read the routes from, one of SOURCES. The database isn't connected to when the archive is used.
+    :param codec: Compression codec of the graph files, see ip_analysis_tool.caching.graph_codec. If None, the one configured for the time interval is used.
+    :param report: Path to a file, to which the BuildReport of each generated graph is appended as a JSON line. The slowest graphs are printed at the end.
+    :return:
+    """
+    data_folder : str = get_data_folder(time_interval)
+    graph_folder : str = data_folder + f"/{'base' if not weighted_edges else 'weighted'}"
+    manifest = load_manifest(graph_folder)
+    parameters = get_build_parameters(weighted_edges, load_starting_address())
+
+    # Parallel workers need a table visible to their own connections
+    parallel = workers > 1 and time_interval != TimeInterval.ALL
+    non_reserved_table = f"non_reserved_ip_{os.getpid()}" if parallel else "non_reserved_ip"
+    reserved_ranges = load_reserved_ranges() if filtering == "client" else None
+    uses_table = source == "database" and reserved_ranges is None
+
+    # Database connection setup, the connection is closed and the shared table dropped however the generation ends
+    rem_conn, rem_cur = connect_to_remote_db() if source == "database" else (None, None)
+    try:
+        if uses_table:
+            create_non_reserved_ip_table(rem_cur, verbose, non_reserved_table, temporary=not parallel)
+        if verbose: print(f"Generating graphs by {str(time_interval).lower()}.")
+
+        reports = []
+        def record_report(interval_report):
+            """
+            Appends the report of a generated graph to the report file.
+            """
+            reports.append(interval_report)
+            write_report(report, interval_report)
+
+        data_start, data_end = get_data_range(source)
+        if data_start is None:
+            print("The route archive is empty, export the routes first.")
+            return
+        # If we don't do across all the data, we split it into intervals
+        if time_interval != TimeInterval.ALL:
+            from ..util.date_util import clamp_range
+            # Clamp data range to the database range
+            start, end = clamp_range(start, end, data_start, data_end)
+            intervals = iterate_range(start, end, time_interval)
+            statistics = fetch_source_statistics(rem_cur, get_date_string(intervals[0][0]), get_date_string(intervals[-1][1] + timedelta(days=1)), time_interval, non_reserved_table, reserved_ranges, source) if intervals else {}
+
+            def record_interval(first, result : IntervalBuildResult):
+                """
+                Records a generated interval in the manifest and in the report.
+                """
+                manifest[f"{get_date_string(first)}.gt"] = create_manifest_entry(statistics.get(get_date_string(first), EMPTY_SOURCE), parameters, result["summary"])
+                save_manifest(graph_folder, manifest)
+                if report is not None: record_report(result["report"])
+
+            if incremental:
+                total = len(intervals)
+                intervals = [(first, last) for first, last in intervals
+                             if is_open_interval(last) or is_stale(graph_folder, f"{get_date_string(first)}.gt", manifest, statistics.get(get_date_string(first), EMPTY_SOURCE), parameters)]
+                if verbose: print(f"{total - len(intervals)} of {total} graphs are up to date.")
+            if parallel:
+                failures = generate_data_parallel(intervals, data_folder, verbose, weighted_edges, time_interval, batch_size, non_reserved_table, workers, on_success=record_interval, extraction=extraction, reserved_ranges=reserved_ranges, source=source, codec=codec, report=report is not None)
+                print(f"Generated {len(intervals) - len(failures)} of {len(intervals)} graphs.")
+                if failures:
+                    print(f"Failed to generate {len(failures)} graphs:")
+                    for first, error in sorted(failures):
+                        print(f"{get_date_string(first)}: {error}")
+            else:
+                for interval in intervals:
+                    result = generate_interval_data(interval[0], interval[1] + timedelta(days=1), rem_cur, data_folder, verbose, weighted_edges, time_interval=time_interval, batch_size=batch_size, extraction=extraction, reserved_ranges=reserved_ranges, source=source, codec=codec, report=report is not None)
+                    record_interval(interval[0], result)
+        # Else if we want the data from the entire range
+        else:
+            all_source = fetch_source_statistics(rem_cur, get_date_string(data_start), get_date_string(data_end + timedelta(days=1)), time_interval, reserved_ranges=reserved_ranges, source=source).get(get_date_string(data_start), EMPTY_SOURCE)
+            if incremental and not is_stale(graph_folder, "all.gt", manifest, all_source, parameters):
+                if verbose: print("The graph from all the data is up to date.")
+            else:
+                result = generate_interval_data(data_start, data_end + timedelta(days=1), rem_cur, data_folder, verbose, weighted_edges, time_interval=time_interval, batch_size=batch_size, extraction=extraction, reserved_ranges=reserved_ranges, source=source, codec=codec, report=report is not None)
+                manifest["all.gt"] = create_manifest_entry(all_source, parameters, result["summary"])
+                save_manifest(graph_folder, manifest)
+                if report is not None: record_report(result["report"])
+        if report is not None: print_slowest_intervals(reports)
+    finally:
+        close_connection(rem_conn, rem_cur, non_reserved_table if uses_table and parallel else None)
+
+def generate_data_single_scan(start: datetime.date, end: datetime.date, verbose: bool = False, weighted_edges : bool = False, include_all : bool = False, batch_size : int = None, extraction : str = "cursor", filtering : str = "database", source : str = "database", codec : str = None, report : str = None, incremental : bool = False):
+    """
+    Generates week, month and year graphs from database data in a single pass, every route is fed to the graphs of all the granularities at once.
+    Each graph is stored in the same place as if it was generated by generate_data().
+    :param start: Date, from which to start graph generation.
+    :param end: Date, at which to end graph generation.
+    :param verbose: Verbose output.
+    :param weighted_edges: Generate graphs with weighted edges.
+    :param include_all: Also generate the graph from all the data. Should only be used when the range covers the whole database.
+    :param batch_size: Stream the data from the database in batches of this many rows using a server-side cursor.
+    :param extraction: How to retrieve the routes from the database, one of EXTRACTION_METHODS.
+    :param filtering: How to leave out the routes to reserved destinations, one of FILTERING_METHODS.
+    :param source: Where to read the routes from, one of SOURCES.
+    :param codec: Compression codec of the graph files. If None, the one configured for each time interval is used.
+    :param report: Path to a file, to which the BuildReport of each generated graph is appended as a JSON line. The routes are retrieved once for all the graphs,
+    so their query, first_row and fetch phases are reported by a final report of the scan, the reports of the graphs only measure their construction from the added routes, metadata and save.
+    :param incremental: Only generate the graphs which are missing, or whose source data or build parameters changed since they were generated, according to the cache manifests,
+    and the graphs of the intervals which haven't ended yet. Only the range covering these graphs is scanned.
+    :return:
+    """
+    from ..util.date_util import clamp_range
+    reserved_ranges = load_reserved_ranges() if filtering == "client" else None
+    rem_conn, rem_cur = connect_to_remote_db() if source == "database" else (None, None)
+    try:
+        if source == "database" and reserved_ranges is None:
+            create_non_reserved_ip_table(rem_cur, verbose)
+
+        data_start, data_end = get_data_range(source)
+        if data_start is None:
+            print("The route archive is empty, export the routes first.")
+            return
         start, end = clamp_range(start, end, data_start, data_end)
-        intervals = iterate_range(start, end, time_interval)
-        for interval in intervals:
-            generate_interval_data(interval[0], interval[1] + timedelta(days=1), rem_cur, data_folder, verbose, weighted_edges, time_interval=time_interval)
-    # Else if we want the data from the entire range
-    else:
-        generate_interval_data(data_start, data_end + timedelta(days=1), rem_cur, data_folder, verbose, weighted_edges, time_interval=time_interval)
+        starting_address = load_starting_address()
+        granularities = [TimeInterval.WEEK, TimeInterval.MONTH, TimeInterval.YEAR]
+        data_folders = {time_interval: get_data_folder(time_interval) for time_interval in granularities}
+        graph_folders = {time_interval: data_folders[time_interval] + f"/{'base' if not weighted_edges else 'weighted'}" for time_interval in granularities}
+        manifests = {time_interval: load_manifest(graph_folders[time_interval]) for time_interval in granularities}
+        parameters = get_build_parameters(weighted_edges, starting_address)
+        intervals = {time_interval: [(to_date(first), to_date(last)) for first, last in iterate_range(start, end, time_interval)]
+                     for time_interval in granularities}
+        if not intervals[TimeInterval.WEEK]:
+            print("There are no routes in the range.")
+            return
+        # Index of the interval currently being built for each granularity
+        current = {time_interval: 0 for time_interval in granularities}
+        builders = {}
+        # Addresses converted to integers, shared by all the builders
+        address_ids = {}
+        reports = []
+        scan_timer = BuildTimer()
+
+        def save_interval(builder : GraphBuilder, data_folder : str) -> IntervalBuildResult:
+            """
+            Saves the graph of a builder, recording its report if requested.
+            """
+            timer = BuildTimer()
+            result = builder.save(data_folder, verbose, codec, timer)
+            if report is not None:
+                timer.rows = builder.route_count
+                reports.append(timer.create_report(builder.time_interval, builder.start, result))
+                write_report(report, reports[-1])
+                # Intervals saved while the routes are scanned aren't a part of the construction of the scan
+                if scan_timer is not None: scan_timer.phases["construction"] -= sum(timer.phases.values())
+            return result
+
+        def finish_interval(time_interval):
+            """
+            Saves the graph of the current interval of the given granularity (an empty one if it had no routes) and moves to the next one.
+            """
+            if current[time_interval] not in pending[time_interval]:
+                current[time_interval] += 1
+                return
+            first = intervals[time_interval][current[time_interval]][0]
+            builder = builders.pop(time_interval, None)
+            if builder is None:
+                builder = GraphBuilder(first, starting_address, weighted_edges, time_interval, address_ids)
+            result = save_interval(builder, data_folders[time_interval])
+            manifests[time_interval][f"{get_date_string(first)}.gt"] = create_manifest_entry(statistics[time_interval].get(get_date_string(first), EMPTY_SOURCE), parameters, result["summary"])
+            save_manifest(graph_folders[time_interval], manifests[time_interval])
+            current[time_interval] += 1
+
+        # The scanned range has to cover all the intervals, weeks may reach over the boundaries of the months and years
+        scan_start = min(intervals[time_interval][0][0] for time_interval in granularities)
+        scan_end = max(intervals[time_interval][-1][1] for time_interval in granularities) + timedelta(days=1)
+        statistics = {time_interval: fetch_source_statistics(rem_cur, get_date_string(scan_start), get_date_string(scan_end), time_interval, reserved_ranges=reserved_ranges, source=source)
+                      for time_interval in granularities}
+        all_folder = get_data_folder(TimeInterval.ALL) + f"/{'base' if not weighted_edges else 'weighted'}"
+        all_source = fetch_source_statistics(rem_cur, get_date_string(data_start), get_date_string(data_end + timedelta(days=1)), TimeInterval.ALL, reserved_ranges=reserved_ranges, source=source).get(get_date_string(data_start), EMPTY_SOURCE) if include_all else None
+
+        # Indices of the intervals to generate for each granularity
+        pending = {time_interval: {k for k, (first, last) in enumerate(intervals[time_interval])
+                                   if not incremental or is_open_interval(last) or is_stale(graph_folders[time_interval], f"{get_date_string(first)}.gt", manifests[time_interval], statistics[time_interval].get(get_date_string(first), EMPTY_SOURCE), parameters)}
+                   for time_interval in granularities}
+        if incremental:
+            total = sum(len(intervals[time_interval]) for time_interval in granularities)
+            if verbose: print(f"{total - sum(len(pending[time_interval]) for time_interval in granularities)} of {total} graphs are up to date.")
+            if include_all and not is_stale(all_folder, "all.gt", load_manifest(all_folder), all_source, parameters):
+                if verbose: print("The graph from all the data is up to date.")
+                include_all = False
+            # The graph from all the data needs all the routes, otherwise only the range of the stale graphs is scanned
+            if not include_all:
+                stale = [intervals[time_interval][k] for time_interval in granularities for k in pending[time_interval]]
+                if not stale:
+                    print("All the graphs are up to date.")
+                    return
+                scan_start = min(first for first, _ in stale)
+                scan_end = max(last for _, last in stale) + timedelta(days=1)
+
+        all_builder = None
+        if include_all:
+            all_builder = GraphBuilder(to_date(data_start), starting_address, weighted_edges, TimeInterval.ALL, address_ids)
+        if verbose: print(f"Generating graphs by week, month and year from {get_date_string(scan_start)} to {get_date_string(scan_end)}.")
+
+        batches = fetch_route_batches(rem_cur, get_date_string(scan_start), get_date_string(scan_end), batch_size, order_by_date=True, extraction=extraction, reserved_ranges=reserved_ranges, source=source, timer=scan_timer)
+        for batch in (scan_timer.time_batches(batches) if report is not None else batches):
+            intern_addresses(address_ids, (record[0] for record in batch))
+            for record in batch:
+                date = to_date(record[2])
+                for time_interval in granularities:
+                    # Routes come ordered by date, so the finished intervals can be saved right away
+                    while current[time_interval] < len(intervals[time_interval]) and date > intervals[time_interval][current[time_interval]][1]:
+                        finish_interval(time_interval)
+                    if current[time_interval] == len(intervals[time_interval]): continue
+                    first, last = intervals[time_interval][current[time_interval]]
+                    if date < first or current[time_interval] not in pending[time_interval]: continue
+                    if time_interval not in builders:
+                        builders[time_interval] = GraphBuilder(first, starting_address, weighted_edges, time_interval, address_ids)
+                    builders[time_interval].add_route(record[0], record[1], record[2])
+            if all_builder is not None:
+                all_builder.add_routes(batch)
+
+        if report is not None:
+            reports.append(scan_timer.create_report("scan", scan_start))
+            write_report(report, reports[-1])
+            scan_timer = None
+        # Save the remaining intervals
+        for time_interval in granularities:
+            while current[time_interval] < len(intervals[time_interval]):
+                finish_interval(time_interval)
+        if all_builder is not None:
+            result = save_interval(all_builder, get_data_folder(TimeInterval.ALL))
+            all_manifest = load_manifest(all_folder)
+            all_manifest["all.gt"] = create_manifest_entry(all_source, parameters, result["summary"])
+            save_manifest(all_folder, all_manifest)
+        if report is not None: print_slowest_intervals(reports)
+    finally:
+        close_connection(rem_conn, rem_cur)
+
+def export_archive(start: datetime.date, end: datetime.date, verbose: bool = False, batch_size : int = None, extraction : str = "cursor", filtering : str = "database", incremental : bool = False):
+    """
+    Exports the filtered routes from the database into the local archive, partitioned by week. The graphs can then be generated from the archive without the database (source archive).
+    :param start: Date, from which to start the export.
+    :param end: Date, at which to end the export.
+    :param verbose: Verbose output.
+    :param batch_size: Stream the data from the database in batches of this many rows using a server-side cursor.
+    :param extraction: How to retrieve the routes from the database, one of EXTRACTION_METHODS.
+    :param filtering: How to leave out the routes to reserved destinations, one of FILTERING_METHODS.
+    :param incremental: Only export the weeks whose partitions are missing or whose source data changed since they were exported, and the weeks which haven't ended yet.
+    :return:
+    """
+    from .route_archive import get_archive_folder, write_partition
+    from ..util.database_util import get_database_range
+    from ..util.date_util import clamp_range
+    reserved_ranges = load_reserved_ranges() if filtering == "client" else None
+    rem_conn, rem_cur = connect_to_remote_db()
+    try:
+        if reserved_ranges is None:
+            create_non_reserved_ip_table(rem_cur, verbose)
 
-    rem_cur.close()
-    rem_conn.close()
+        archive_folder = get_archive_folder()
+        manifest = load_manifest(archive_folder)
+        parameters = {"reserved_ranges": reserved_ranges if reserved_ranges is not None else "database"}
+        data_start, data_end = get_database_range()
+        start, end = clamp_range(start, end, data_start, data_end)
+        weeks = iterate_range(start, end, TimeInterval.WEEK)
+        statistics = fetch_source_statistics(rem_cur, get_date_string(weeks[0][0]), get_date_string(weeks[-1][1] + timedelta(days=1)), TimeInterval.WEEK, reserved_ranges=reserved_ranges) if weeks else {}
+        if incremental:
+            total = len(weeks)
+            weeks = [(first, last) for first, last in weeks
+                     if is_open_interval(last) or is_stale(archive_folder, f"{get_date_string(first)}.parquet", manifest, statistics.get(get_date_string(first), EMPTY_SOURCE), parameters)]
+            if verbose: print(f"{total - len(weeks)} of {total} weeks are up to date.")
+
+        for first, last in weeks:
+            rows = write_partition(to_date(first), fetch_route_batches(rem_cur, get_date_string(first), get_date_string(last + timedelta(days=1)), batch_size, order_by_date=True,
+                                                                       extraction=extraction, reserved_ranges=reserved_ranges))
+            manifest[f"{get_date_string(first)}.parquet"] = create_manifest_entry(statistics.get(get_date_string(first), EMPTY_SOURCE), parameters)
+            save_manifest(archive_folder, manifest)
+            if verbose: print(f"Exported {rows} routes of the week starting with {get_date_string(first)}.")
+    finally:
+        close_connection(rem_conn, rem_cur)
+
+def rebuild_index(weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK, verbose : bool = False):
+    """
+    Adds the missing or outdated graph summaries to the manifest of a cache folder, e.g. for graphs generated before the summaries were introduced or copied from elsewhere.
+    Only the graphs without a current summary are loaded. Entries of the graphs which no longer exist are removed.
+    :param weighted_edges: Rebuild the index of the graphs with weighted edges.
+    :param time_interval: Time interval of the graphs.
+    :param verbose: Verbose output.
+    :return:
+    """
+    from json import loads
+    from .graph_codec import load_graph_file
+    graph_folder = get_data_folder(time_interval) + f"/{'base' if not weighted_edges else 'weighted'}"
+    if not os.path.exists(graph_folder):
+        print(f"There are no cached graphs in {graph_folder}.")
+        return
+    manifest = load_manifest(graph_folder)
+    files = [f for f in os.listdir(graph_folder) if GRAPH_FILE_PATTERN.match(f) or (f == "all.gt" and time_interval == TimeInterval.ALL)]
+    removed = [f for f in manifest if f not in files]
+    for f in removed: del manifest[f]
+    updated = 0
+    for f in sorted(files):
+        entry = manifest.get(f)
+        if entry is not None and "summary" in entry and is_summary_current(entry["summary"]): continue
+        path = f"{graph_folder}/{f}"
+        g = load_graph_file(path)
+        summary = create_graph_summary(path, g.num_vertices(), g.num_edges(), loads(g.gp.metadata))
+        if entry is None:
+            # The source data and the build parameters of the graph are unknown, so incremental runs regenerate it
+            entry = create_manifest_entry(None, None)
+            manifest[f] = entry
+        entry["summary"] = summary
+        updated += 1
+        if verbose: print(f"Indexed {f}.")
+    save_manifest(graph_folder, manifest)
+    print(f"Indexed {updated} of {len(files)} graphs, removed {len(removed)} entries of missing graphs.")
+
+def create_snapshots(weighted_edges : bool = False, time_interval : TimeInterval = TimeInterval.WEEK, verbose : bool = False):
+    """
+    Creates the memory-mapped snapshots of the cached graphs of the given time interval and weighting, see ip_analysis_tool.caching.snapshot.
+    Only the missing snapshots and those of the graphs generated again since are written.
+    :param weighted_edges: Create the snapshots of the graphs with weighted edges.
+    :param time_interval: Time interval of the graphs.
+    :param verbose: Verbose output.
+    :return:
+    """
+    from .snapshot import get_snapshot_path, is_snapshot_current, write_snapshot
+    from ..util.graph_getter import load_cached_graph
+    graph_folder = get_data_folder(time_interval) + f"/{'base' if not weighted_edges else 'weighted'}"
+    if not os.path.exists(graph_folder):
+        print(f"There are no cached graphs in {graph_folder}.")
+        return
+    files = [f for f in os.listdir(graph_folder) if GRAPH_FILE_PATTERN.match(f) or (f == "all.gt" and time_interval == TimeInterval.ALL)]
+    created = 0
+    for f in sorted(files):
+        path = f"{graph_folder}/{f}"
+        if is_snapshot_current(get_snapshot_path(path), path): continue
+        source_mtime = os.stat(path).st_mtime_ns
+        write_snapshot(load_cached_graph(path), get_snapshot_path(path), source_mtime)
+        created += 1
+        if verbose: print(f"Created the snapshot of {f}.")
+    print(f"Created {created} snapshots, {len(files) - created} were up to date.")
 
 def main(args = None):
     from argparse import ArgumentParser
     parser = ArgumentParser()
+    parser.add_argument("mode", nargs="?", choices=["generate", "export", "index", "snapshot"], default="generate",
+                        help="generate: generate the graphs (default). export: export the filtered routes into the local archive partitioned by week, for generating the graphs with --source archive. "
+                             "index: add the missing summaries of the cached graphs of the given --interval and weighting to the index, so they can be listed and summarized without loading them. "
+                             "snapshot: create the memory-mapped snapshots of the cached graphs of the given --interval and weighting, which worker processes share instead of loading their own copies.")
     parser.add_argument("-r", "--range", nargs=2,
                         help="Generates graphs only for the time range which begins with the interval containing the first given date and ends with the interval containing the second given date. Format is YYYY-MM-DD.")
     parser.add_argument("-t", "--time",
@@ -297,8 +753,68 @@ def main(args = None):
                         """)
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose output")
     parser.add_argument("-w", "--weighted_edges", action="store_true", help="Generate graphs with weighted edges, results in significantly smaller graphs.")
+    parser.add_argument("-m", "--multi", action="store_true",
+                        help="Generate the week, month and year graphs in a single pass over the data, the whole years containing the given range are generated. The graph from all the data is generated as well if no range is given. "
+                             "Ignores --interval, can't be combined with --workers.")
+    parser.add_argument("-n", "--workers", type=int, default=1,
+                        help="Number of processes generating the intervals in parallel, each with its own database connection. Default is 1.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only generate the graphs which are missing or whose source data changed since they were generated, and the graphs of the intervals which haven't ended yet.")
+    parser.add_argument("-b", "--batch_size", type=int,
+                        help="Stream the data from the database in batches of the given number of rows using a server-side cursor. Keeps the memory usage bounded for long intervals (MONTH, YEAR, ALL).")
+    parser.add_argument("-e", "--extraction", choices=EXTRACTION_METHODS, default="cursor",
+                        help="How to retrieve the routes from the database: cursor iterates over the rows, copy transfers them in bulk using COPY, which is faster. Both give the same graphs. Default is cursor.")
+    parser.add_argument("-f", "--filtering", choices=FILTERING_METHODS, default="database",
+                        help="How to leave out the routes to reserved destinations: database builds a table of the non-reserved hosts first, client filters the routes as they arrive, "
+                             "which skips the slow table build. The reserved blocks of the client filtering can be set by reserved_ranges in config.yml. Default is database.")
+    parser.add_argument("-s", "--source", choices=SOURCES, default="database",
+                        help="Where to read the routes from: the remote database, or the local archive created by the export mode. Default is database.")
+    parser.add_argument("-c", "--codec",
+                        help="Compression codec of the graph files: none, gzip, xz or zstd, optionally with a level, e.g. zstd:19. "
+                             "Default is graph_codec from config.yml, which may also map the intervals to codecs, e.g. {week: none, all: xz}, or none if it isn't set.")
+    parser.add_argument("--report",
+                        help="Append a JSON line with the timing of each phase (query, first row, fetch, construction, metadata, save), the number of rows, rows per second, "
+                             "peak RSS and file size of each generated graph to the given file, and print the slowest graphs at the end.")
 
     args = parser.parse_args(args)
+    if args.codec is not None:
+        from .graph_codec import parse_codec
+        try:
+            parse_codec(args.codec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.mode == "index":
+        rebuild_index(args.weighted_edges, TimeInterval[args.interval.upper()], args.verbose)
+        return
+
+    if args.mode == "snapshot":
+        create_snapshots(args.weighted_edges, TimeInterval[args.interval.upper()], args.verbose)
+        return
+
+    if args.mode == "export":
+        if args.range:
+            start = get_parent_interval(datetime.strptime(args.range[0], "%Y-%m-%d"), time_interval=TimeInterval.WEEK)[0]
+            end = get_parent_interval(datetime.strptime(args.range[1], "%Y-%m-%d"), time_interval=TimeInterval.WEEK)[1]
+        elif args.time:
+            start, end = get_parent_interval(datetime.strptime(args.time, "%Y-%m-%d"), time_interval=TimeInterval.WEEK)
+        else:
+            start, end = get_data_range()
+        export_archive(start, end, args.verbose, args.batch_size, args.extraction, args.filtering, args.incremental)
+        return
+
+    if args.multi:
+        if args.workers > 1:
+            parser.error("--multi generates all the graphs in a single process, it can't be combined with --workers.")
+        if args.range:
+            start = get_parent_year(datetime.strptime(args.range[0], "%Y-%m-%d"))[0]
+            end = get_parent_year(datetime.strptime(args.range[1], "%Y-%m-%d"))[1]
+        elif args.time:
+            start, end = get_parent_year(datetime.strptime(args.time, "%Y-%m-%d"))
+        else:
+            start, end = get_data_range(args.source)
+        generate_data_single_scan(start, end, args.verbose, args.weighted_edges, include_all=not (args.range or args.time), batch_size=args.batch_size, extraction=args.extraction, filtering=args.filtering, source=args.source, codec=args.codec, report=args.report, incremental=args.incremental)
+        return
 
     time_interval = TimeInterval[args.interval.upper()]
     if args.range and time_interval != TimeInterval.ALL:
@@ -307,9 +823,8 @@ def main(args = None):
     elif args.time and time_interval != TimeInterval.ALL:
         start, end = get_parent_interval(datetime.strptime(args.time, "%Y-%m-%d"), time_interval=time_interval)
     else:
-        from ..util.database_util import get_database_range
-        start, end = get_database_range()
+        start, end = get_data_range(args.source)
 
-    generate_data(start, end, args.verbose, args.weighted_edges, time_interval=time_interval)
+    generate_data(start, end, args.verbose, args.weighted_edges, time_interval=time_interval, batch_size=args.batch_size, workers=args.workers, incremental=args.incremental, extraction=args.extraction, filtering=args.filtering, source=args.source, codec=args.codec, report=args.report)
 
 if __name__ == "__main__": main()
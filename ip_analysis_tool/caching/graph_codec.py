@@ -0,0 +1,115 @@
+import os
+
+# Compression codecs of the cached graph files, given as <codec> or <codec>:<level>, e.g. zstd:19
+CODECS = ("none", "gzip", "xz", "zstd")
+
+# Codec of the cached graphs, unless set by graph_codec in config.yml. Uncompressed files load the fastest.
+DEFAULT_CODEC = "none"
+
+# Leading bytes of the compressed files, files starting with none of them are read as uncompressed
+CODEC_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+def parse_codec(spec : str) -> tuple:
+    """
+    Parses a codec given as <codec> or <codec>:<level>, e.g. gzip, xz:9 or zstd:3.
+    :param spec: The codec.
+    :return: A tuple of the name of the codec and its level, None if it isn't given.
+    """
+    name, _, level = str(spec).strip().lower().partition(":")
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {spec}, possible values: {', '.join(CODECS)}")
+    if not level:
+        return name, None
+    if name == "none" or not level.isdigit():
+        raise ValueError(f"Invalid codec level: {spec}")
+    return name, int(level)
+
+def detect_codec(path : str) -> str:
+    """
+    Detects the codec of a graph file from its leading bytes.
+    :param path: Path to the file.
+    :return: Name of the codec, one of CODECS.
+    """
+    with open(path, "rb") as f:
+        header = f.read(max(len(magic) for magic in CODEC_MAGIC.values()))
+    for name, magic in CODEC_MAGIC.items():
+        if header.startswith(magic):
+            return name
+    return "none"
+
+def open_compressed(path : str, mode : str, codec : str):
+    """
+    Opens a file compressed with the given codec as a binary stream.
+    :param path: Path to the file.
+    :param mode: Either rb or wb.
+    :param codec: The codec, see parse_codec(), except for none.
+    :return: File object (de)compressing the data on the fly.
+    """
+    name, level = parse_codec(codec)
+    if name == "gzip":
+        import gzip
+        return gzip.open(path, mode, compresslevel=level if level is not None else 6)
+    if name == "xz":
+        import lzma
+        return lzma.open(path, mode, preset=level if mode == "wb" else None)
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("The zstd codec requires the zstandard package.")
+    if mode == "rb":
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return zstandard.ZstdCompressor(level=level if level is not None else 3).stream_writer(open(path, "wb"), closefd=True)
+
+def save_graph_file(g, path : str, codec : str = DEFAULT_CODEC):
+    """
+    Saves a graph in the graph_tool binary format compressed with the given codec.
+    The file keeps its .gt name whatever the codec is, load_graph_file() detects it.
+    :param g: The graph.
+    :param path: Path to the .gt file.
+    :param codec: The codec, see parse_codec().
+    """
+    # Write to a temporary file first, so readers never see a partially written graph
+    if parse_codec(codec)[0] == "none":
+        g.save(path + ".tmp", fmt="gt")
+    else:
+        with open_compressed(path + ".tmp", "wb", codec) as f:
+            g.save(f, fmt="gt")
+    os.replace(path + ".tmp", path)
+
+def load_graph_file(path : str):
+    """
+    Loads a graph saved by save_graph_file() (or by graph_tool itself), the codec is detected from the file.
+    :param path: Path to the .gt file.
+    :return: The graph. (graph_tool.Graph)
+    """
+    from graph_tool import load_graph
+    codec = detect_codec(path)
+    if codec == "none":
+        return load_graph(path, fmt="gt")
+    with open_compressed(path, "rb", codec) as f:
+        return load_graph(f, fmt="gt")
+
+def load_graph_codec(time_interval) -> str:
+    """
+    Loads the codec of the cached graphs of the given time interval from the config file.
+    graph_codec is either a single codec for all the caches, or a mapping of the time intervals to their codecs, e.g. {week: none, all: xz:9}.
+    :param time_interval: Time interval of the graphs. (ip_analysis_tool.enums.TimeInterval)
+    :return: The codec, DEFAULT_CODEC if it isn't set.
+    """
+    import yaml
+    try:
+        with open(os.path.expanduser("~/.config/IPAnalysisTool/config.yml"), "r") as f:
+            config = yaml.safe_load(f)
+        codec = config.get("graph_codec") if isinstance(config, dict) else None
+    except OSError:
+        codec = None
+    if isinstance(codec, dict):
+        codec = {str(key).lower(): value for key, value in codec.items()}.get(str(time_interval).lower())
+    if codec is None:
+        return DEFAULT_CODEC
+    parse_codec(codec)
+    return str(codec)
@@ -0,0 +1,202 @@
+import os
+import numpy as np
+
+# Suffix of the side-store file holding the ragged (per-element list) properties of a cached graph
+RAGGED_SUFFIX = ".ragged.npz"
+# Suffix of the side-store file holding the scalar properties of a cached graph, which aren't needed by most of the analyses
+PROPERTIES_SUFFIX = ".props.npz"
+# Properties kept in the .gt file itself, so they are always loaded: the topology plus these
+CORE_PROPERTIES = {"vertex": ("ip", "gid", "traversals"), "edge": ("traversals",)}
+# Types of the property maps created for the stored arrays, by their dtype
+PROPERTY_TYPES = {"int32": "int", "int64": "int64_t", "float64": "double", "uint8": "bool"}
+
+class RaggedProperty:
+    """
+    A ragged property stored in the CSR form, the value of the item i is values[offsets[i]:offsets[i + 1]].
+    """
+    def __init__(self, offsets : np.ndarray, values : np.ndarray):
+        """
+        :param offsets: Offsets of the items into values, one more than the number of items.
+        :param values: Values of all the items one after another.
+        """
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def from_owners(cls, owners : np.ndarray, values : np.ndarray, size : int):
+        """
+        Creates a ragged property from pairs of (owner, value), the order of the values of each owner is preserved.
+        :param owners: Index of the item each value belongs to.
+        :param values: The values.
+        :param size: Number of the items.
+        :return: The ragged property.
+        """
+        owners = np.asarray(owners, dtype=np.int64)
+        order = np.argsort(owners, kind="stable")
+        offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owners, minlength=size), out=offsets[1:])
+        return cls(offsets, np.asarray(values)[order])
+
+    @classmethod
+    def from_property_map(cls, prop, items):
+        """
+        Creates a ragged property from a vector property map of a graph.
+        :param prop: Vector property map, e.g. the routes property of graphs generated before the side-store was introduced.
+        :param items: Vertices or edges of the graph.
+        :return: The ragged property.
+        """
+        lists = [np.asarray(prop[item]) for item in items]
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(values) for values in lists], out=offsets[1:])
+        return cls(offsets, np.concatenate(lists) if lists else np.zeros(0))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item) -> np.ndarray:
+        item = int(item)
+        return self.values[self.offsets[item]:self.offsets[item + 1]]
+
+    def lengths(self) -> np.ndarray:
+        """
+        :return: Number of values of each item.
+        """
+        return np.diff(self.offsets)
+
+    def gather(self, items) -> np.ndarray:
+        """
+        Returns the values of the given items concatenated together.
+        :param items: Indices of the items (or vertices/edges of a graph).
+        :return: Concatenated values of the items.
+        """
+        items = np.fromiter((int(item) for item in items), dtype=np.int64)
+        if len(items) == 0: return self.values[:0]
+        starts = self.offsets[items]
+        lengths = self.offsets[items + 1] - starts
+        # Index of each gathered value in values
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return self.values[positions]
+
+    def take(self, items):
+        """
+        Returns a ragged property of the given items only, in their order.
+        :param items: Indices of the items, e.g. the edge order returned by get_edge_order().
+        :return: The ragged property, its item i holds the values of the item items[i].
+        """
+        items = np.asarray(items, dtype=np.int64)
+        offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum(self.lengths()[items], out=offsets[1:])
+        return RaggedProperty(offsets, self.gather(items))
+
+def get_ragged_path(graph_path : str) -> str:
+    """
+    Returns the path to the side-store of a cached graph.
+    :param graph_path: Path to the .gt file of the graph.
+    :return: Path to the side-store file.
+    """
+    return (graph_path[:-3] if graph_path.endswith(".gt") else graph_path) + RAGGED_SUFFIX
+
+def save_ragged_properties(graph_path : str, vertex_properties : dict, edge_properties : dict):
+    """
+    Saves the ragged properties of a graph into its side-store next to the graph file.
+    :param graph_path: Path to the .gt file of the graph.
+    :param vertex_properties: Dict of the names of the vertex properties mapped to their RaggedProperty.
+    :param edge_properties: Dict of the names of the edge properties mapped to their RaggedProperty.
+    """
+    arrays = {}
+    for kind, properties in (("vertex", vertex_properties), ("edge", edge_properties)):
+        for name, prop in properties.items():
+            arrays[f"{kind}_{name}_offsets"] = prop.offsets
+            arrays[f"{kind}_{name}_values"] = prop.values
+    # Write to a temporary file first, so readers never see a partially written side-store
+    with open(get_ragged_path(graph_path) + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(get_ragged_path(graph_path) + ".tmp", get_ragged_path(graph_path))
+
+def load_ragged_property(graph_path : str, name : str, kind : str = "vertex") -> RaggedProperty:
+    """
+    Loads a single ragged property from the side-store of a cached graph, the other properties aren't read.
+    :param graph_path: Path to the .gt file of the graph.
+    :param name: Name of the property, e.g. routes.
+    :param kind: Either vertex or edge.
+    :return: The ragged property.
+    """
+    with np.load(get_ragged_path(graph_path)) as data:
+        return RaggedProperty(data[f"{kind}_{name}_offsets"], data[f"{kind}_{name}_values"])
+
+def get_properties_path(graph_path : str) -> str:
+    """
+    Returns the path to the scalar property side-store of a cached graph.
+    :param graph_path: Path to the .gt file of the graph.
+    :return: Path to the side-store file.
+    """
+    return (graph_path[:-3] if graph_path.endswith(".gt") else graph_path) + PROPERTIES_SUFFIX
+
+def get_edge_order(g) -> np.ndarray:
+    """
+    Returns the edge indices of a graph in the order of its edge iteration (by the source vertex), which is the order of the edges in a saved .gt file.
+    Loading the file numbers the edges in this order, so it differs from the indices of a graph whose edges weren't added by their source vertex.
+    :param g: The graph.
+    :return: Array of the edge indices, its item i is the index of the edge which gets the index i once the graph is saved and loaded.
+    """
+    return g.get_edges([g.edge_index])[:, 2]
+
+def split_properties(g) -> dict:
+    """
+    Removes the vertex and edge properties other than CORE_PROPERTIES from a graph, so it can be saved without them.
+    The edge arrays are stored in the order of the edges of the saved graph, see get_edge_order().
+    :param g: The graph, it's modified in place.
+    :return: Dict of the arrays of the removed properties, keyed by vertex_<name> or edge_<name>.
+    """
+    arrays = {}
+    edge_order = get_edge_order(g)
+    for kind, properties in (("vertex", g.vp), ("edge", g.ep)):
+        for name in [name for name in properties.keys() if name not in CORE_PROPERTIES[kind]]:
+            arrays[f"{kind}_{name}"] = np.array(properties[name].a) if kind == "vertex" else np.array(properties[name].a)[edge_order]
+            del properties[name]
+    return arrays
+
+def save_scalar_properties(graph_path : str, arrays : dict):
+    """
+    Saves the scalar properties split off a graph into its side-store next to the graph file.
+    :param graph_path: Path to the .gt file of the graph.
+    :param arrays: Dict of the property arrays returned by split_properties().
+    """
+    # Write to a temporary file first, so readers never see a partially written side-store
+    with open(get_properties_path(graph_path) + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(get_properties_path(graph_path) + ".tmp", get_properties_path(graph_path))
+
+def load_scalar_properties(g, graph_path : str, properties = None):
+    """
+    Adds the scalar properties from the side-store of a cached graph to the loaded graph, only the requested ones are read.
+    Graphs generated before the side-store was introduced hold all their properties in the .gt file, the ones which weren't requested are removed instead.
+    :param g: The graph loaded from the .gt file, it's modified in place.
+    :param graph_path: Path to the .gt file of the graph.
+    :param properties: Names of the properties to add, e.g. hop_distance or avg_weight, names missing in the graph are ignored. None adds all of them.
+    """
+    path = get_properties_path(graph_path)
+    if not os.path.exists(path):
+        if properties is not None:
+            remove_properties(g, properties)
+        return
+    with np.load(path) as data:
+        for key in data.files:
+            kind, name = key.split("_", 1)
+            if properties is not None and name not in properties: continue
+            values = data[key]
+            prop = (g.new_vertex_property if kind == "vertex" else g.new_edge_property)(PROPERTY_TYPES[values.dtype.name])
+            prop.a = values
+            (g.vp if kind == "vertex" else g.ep)[name] = prop
+
+def remove_properties(g, properties):
+    """
+    Removes the scalar vertex and edge properties of a graph, which are neither in CORE_PROPERTIES nor in the given ones.
+    Vector properties are kept, get_ragged_property() reads the route lists from them in graphs generated before the ragged side-store.
+    :param g: The graph, it's modified in place.
+    :param properties: Names of the properties to keep.
+    """
+    for kind, property_maps in (("vertex", g.vp), ("edge", g.ep)):
+        for name in [name for name in property_maps.keys() if name not in CORE_PROPERTIES[kind] and name not in properties
+                     and not property_maps[name].value_type().startswith("vector")]:
+            del property_maps[name]
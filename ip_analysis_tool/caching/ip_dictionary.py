@@ -0,0 +1,128 @@
+import os
+from contextlib import contextmanager
+import numpy as np
+
+# ID of the addresses missing from the dictionary, the IDs themselves are unsigned 32-bit
+UNKNOWN_ID = -1
+# Mask of the bits of an ID, e.g. to read the IDs stored in signed 32-bit properties by older graphs
+ID_MASK = 0xFFFFFFFF
+
+def get_dictionary_path() -> str:
+    """
+    Returns the path to the global IP dictionary shared by all the cached graphs, creating its folder if it doesn't exist.
+    :return: Path to the file, e.g. ~/.cache/IPAnalysisTool/graphs/ip_dictionary.txt
+    """
+    folder = os.path.expanduser("~/.cache/IPAnalysisTool/graphs")
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    return f"{folder}/ip_dictionary.txt"
+
+class IPDictionary:
+    """
+    Append-only dictionary of IP addresses to stable integer IDs, the same address has the same ID in every cached graph.
+    The file holds one address per line, the ID of an address is its line number. Processes append new addresses under an exclusive file lock,
+    so parallel graph generation agrees on the IDs.
+    """
+    def __init__(self, path : str = None):
+        """
+        :param path: Path to the dictionary file, get_dictionary_path() by default.
+        """
+        self.path = path if path is not None else get_dictionary_path()
+        self.ids = {}
+        self.ips = []
+        # Number of bytes of the file already read
+        self.offset = 0
+
+    def refresh(self):
+        """
+        Reads the addresses appended to the file since the last read, e.g. by other processes.
+        """
+        if not os.path.exists(self.path): return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # A line being appended by another process is only read once it's complete
+        end = data.rfind(b"\n") + 1
+        for ip in data[:end].decode().splitlines():
+            self.ids[ip] = len(self.ips)
+            self.ips.append(ip)
+        self.offset += end
+
+    def lookup(self, ips) -> np.ndarray:
+        """
+        Returns the IDs of the given addresses without adding the unknown ones.
+        :param ips: Iterable of IP addresses.
+        :return: Array of the IDs (int64), UNKNOWN_ID for the unknown addresses.
+        """
+        ips = list(ips)
+        if any(ip not in self.ids for ip in ips): self.refresh()
+        return np.fromiter((self.ids.get(ip, UNKNOWN_ID) for ip in ips), dtype=np.int64, count=len(ips))
+
+    def get_ids(self, ips) -> np.ndarray:
+        """
+        Returns the IDs of the given addresses, the unknown ones are appended to the dictionary.
+        :param ips: Iterable of IP addresses.
+        :return: Array of the IDs (uint32).
+        """
+        import fcntl
+        ips = list(ips)
+        if any(ip not in self.ids for ip in ips):
+            with open(self.path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Other processes may have appended some of the addresses meanwhile
+                    self.refresh()
+                    new_ips = list(dict.fromkeys(ip for ip in ips if ip not in self.ids))
+                    if new_ips:
+                        data = "".join(f"{ip}\n" for ip in new_ips).encode()
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                        for ip in new_ips:
+                            self.ids[ip] = len(self.ips)
+                            self.ips.append(ip)
+                        self.offset += len(data)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return np.fromiter((self.ids[ip] for ip in ips), dtype=np.uint32, count=len(ips))
+
+    def get_ips(self, ids) -> list:
+        """
+        Returns the addresses of the given IDs.
+        :param ids: Iterable of IDs.
+        :return: List of the IP addresses.
+        """
+        ids = [int(i) for i in ids]
+        if ids and max(ids) >= len(self.ips): self.refresh()
+        return [self.ips[i] for i in ids]
+
+    def __len__(self) -> int:
+        return len(self.ips)
+
+# Dictionary of the current process, see get_ip_dictionary()
+_ip_dictionary = None
+
+def get_ip_dictionary() -> IPDictionary:
+    """
+    Returns the global IP dictionary of the cached graphs, loaded on first use.
+    :return: The dictionary.
+    """
+    global _ip_dictionary
+    if _ip_dictionary is None:
+        _ip_dictionary = IPDictionary()
+        _ip_dictionary.refresh()
+    return _ip_dictionary
+
+@contextmanager
+def temporary_ip_dictionary(path : str):
+    """
+    Replaces the global IP dictionary of the current process within the block, e.g. so benchmarks building synthetic graphs don't add their addresses to the cache.
+    :param path: Path to the dictionary file used within the block.
+    """
+    global _ip_dictionary
+    previous = _ip_dictionary
+    _ip_dictionary = IPDictionary(path)
+    try:
+        yield _ip_dictionary
+    finally:
+        _ip_dictionary = previous
@@ -0,0 +1,221 @@
+from array import array
+import numpy as np
+
+# The latency sketch is a histogram with logarithmically growing bins, the relative error of the quantiles is at most HISTOGRAM_GROWTH - 1
+HISTOGRAM_MIN = 0.01
+HISTOGRAM_GROWTH = 1.05
+# Bin 0 holds the values up to HISTOGRAM_MIN, the last bin everything above ~100 seconds
+HISTOGRAM_BINS = int(np.ceil(np.log(1e5 / HISTOGRAM_MIN) / np.log(HISTOGRAM_GROWTH))) + 2
+
+# Number of buffered samples, after which they are folded into the statistics
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+def get_histogram_bins(values : np.ndarray) -> np.ndarray:
+    """
+    Returns the histogram bin of each value.
+    :param values: Latencies in milliseconds.
+    :return: Bin indices of the values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    bins = np.zeros(len(values), dtype=np.int64)
+    positive = values > HISTOGRAM_MIN
+    bins[positive] = np.floor(np.log(values[positive] / HISTOGRAM_MIN) / np.log(HISTOGRAM_GROWTH)).astype(np.int64) + 1
+    return np.minimum(bins, HISTOGRAM_BINS - 1)
+
+def get_bin_values(bins : np.ndarray) -> np.ndarray:
+    """
+    Returns the representative value (geometric middle) of the given histogram bins.
+    :param bins: Bin indices.
+    :return: Latencies in milliseconds, 0 for the first bin.
+    """
+    bins = np.asarray(bins, dtype=np.float64)
+    return np.where(bins > 0, HISTOGRAM_MIN * HISTOGRAM_GROWTH ** (bins - 0.5), 0.0)
+
+class LatencyStatistics:
+    """
+    Streaming statistics of the latency samples of a set of items (vertices or edges): count, mean and variance (Welford), min, max and a histogram sketch for the quantiles.
+    Samples are appended to a buffer and periodically folded into the statistics, so the memory doesn't grow with the number of samples.
+    The statistics of different sets (e.g. of different weeks) can be merged.
+    """
+    def __init__(self, buffer_size : int = DEFAULT_BUFFER_SIZE):
+        """
+        :param buffer_size: Number of buffered samples, after which they are folded into the statistics.
+        """
+        self.buffer_size = buffer_size
+        # Buffered samples, append to both at once
+        self.owners = array("q")
+        self.values = array("d")
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0, dtype=np.float64)
+        self.m2 = np.zeros(0, dtype=np.float64)
+        self.min = np.zeros(0, dtype=np.float64)
+        self.max = np.zeros(0, dtype=np.float64)
+        # Sparse histogram, sorted keys item * HISTOGRAM_BINS + bin with their counts
+        self.histogram_keys = np.zeros(0, dtype=np.int64)
+        self.histogram_counts = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    def resize(self, size : int):
+        """
+        Grows the statistics to hold the given number of items.
+        :param size: Number of items.
+        """
+        grow = size - len(self.count)
+        if grow <= 0: return
+        self.count = np.concatenate((self.count, np.zeros(grow, dtype=np.int64)))
+        self.mean = np.concatenate((self.mean, np.zeros(grow)))
+        self.m2 = np.concatenate((self.m2, np.zeros(grow)))
+        self.min = np.concatenate((self.min, np.full(grow, np.inf)))
+        self.max = np.concatenate((self.max, np.full(grow, -np.inf)))
+
+    def flush_if_needed(self):
+        """
+        Folds the buffered samples into the statistics if the buffer is full. The buffer may grow up to the size of the histogram, which keeps the folding cost amortized.
+        """
+        if len(self.owners) >= max(self.buffer_size, len(self.histogram_keys)):
+            self.flush()
+
+    def flush(self):
+        """
+        Folds the buffered samples into the statistics.
+        """
+        if len(self.owners) == 0: return
+        owners = np.frombuffer(self.owners, dtype=np.int64)
+        values = np.frombuffer(self.values, dtype=np.float64)
+        self.resize(int(owners.max()) + 1)
+        size = len(self.count)
+
+        # Statistics of the buffered samples alone
+        count = np.bincount(owners, minlength=size)
+        mean = np.bincount(owners, weights=values, minlength=size) / np.maximum(count, 1)
+        deviations = values - mean[owners]
+        m2 = np.bincount(owners, weights=deviations * deviations, minlength=size)
+        minimum = np.full(size, np.inf)
+        np.minimum.at(minimum, owners, values)
+        maximum = np.full(size, -np.inf)
+        np.maximum.at(maximum, owners, values)
+        self.merge_arrays(np.arange(size), count, mean, m2, minimum, maximum,
+                          owners * HISTOGRAM_BINS + get_histogram_bins(values), np.ones(len(owners), dtype=np.int64))
+
+        self.owners = array("q")
+        self.values = array("d")
+
+    def merge_arrays(self, items, count, mean, m2, minimum, maximum, histogram_keys, histogram_counts):
+        """
+        Merges the statistics given as arrays into these statistics (Chan et al. parallel variance).
+        :param items: Index of the item in these statistics for each merged item.
+        :param count: Number of samples of each merged item.
+        :param mean: Mean of each merged item.
+        :param m2: Sum of the squared deviations from the mean of each merged item.
+        :param minimum: Minimum of each merged item.
+        :param maximum: Maximum of each merged item.
+        :param histogram_keys: Histogram keys (item * HISTOGRAM_BINS + bin), the items already mapped to these statistics.
+        :param histogram_counts: Counts of the histogram keys.
+        """
+        items = np.asarray(items, dtype=np.int64)
+        if len(items) > 0: self.resize(int(items.max()) + 1)
+        count_a = self.count[items]
+        total = count_a + count
+        present = total > 0
+        delta = mean - self.mean[items]
+        ratio = np.divide(count, total, out=np.zeros(len(items)), where=present)
+        self.mean[items] = self.mean[items] + delta * ratio
+        self.m2[items] = self.m2[items] + m2 + delta * delta * count_a * ratio
+        self.count[items] = total
+        self.min[items] = np.minimum(self.min[items], minimum)
+        self.max[items] = np.maximum(self.max[items], maximum)
+
+        keys, inverse = np.unique(np.concatenate((self.histogram_keys, histogram_keys)), return_inverse=True)
+        self.histogram_counts = np.bincount(inverse, weights=np.concatenate((self.histogram_counts, histogram_counts))).astype(np.int64)
+        self.histogram_keys = keys
+
+    def merge(self, other, mapping = None):
+        """
+        Merges other statistics into these statistics.
+        :param other: The other LatencyStatistics.
+        :param mapping: Index of the corresponding item in these statistics for each item of the other statistics, without duplicates. If None, the items correspond by their index.
+        """
+        other.flush()
+        self.flush()
+        mapping = np.arange(len(other)) if mapping is None else np.asarray(mapping, dtype=np.int64)
+        key_items = mapping[other.histogram_keys // HISTOGRAM_BINS]
+        self.merge_arrays(mapping, other.count, other.mean, other.m2, other.min, other.max,
+                          key_items * HISTOGRAM_BINS + other.histogram_keys % HISTOGRAM_BINS, other.histogram_counts)
+
+    def variance(self) -> np.ndarray:
+        """
+        :return: Population variance of each item, 0 for items without samples.
+        """
+        self.flush()
+        return self.m2 / np.maximum(self.count, 1)
+
+    def minimum(self) -> np.ndarray:
+        """
+        :return: Minimum of each item, 0 for items without samples.
+        """
+        self.flush()
+        return np.where(self.count > 0, self.min, 0.0)
+
+    def maximum(self) -> np.ndarray:
+        """
+        :return: Maximum of each item, 0 for items without samples.
+        """
+        self.flush()
+        return np.where(self.count > 0, self.max, 0.0)
+
+    def quantile(self, q : float) -> np.ndarray:
+        """
+        Estimates the given quantile of each item from the histogram sketch.
+        :param q: Quantile between 0 and 1, e.g. 0.95 for the 95th percentile.
+        :return: Quantile of each item, clamped to its minimum and maximum, 0 for items without samples.
+        """
+        self.flush()
+        result = np.zeros(len(self))
+        if len(self.histogram_keys) == 0: return result
+        items = self.histogram_keys // HISTOGRAM_BINS
+        cumulative = np.cumsum(self.histogram_counts)
+        # Number of samples of the items before each item
+        before = np.concatenate(([0], np.cumsum(self.count)[:-1]))
+        present = np.nonzero(self.count > 0)[0]
+        rank = before[present] + np.maximum(np.ceil(q * self.count[present]), 1)
+        keys = self.histogram_keys[np.searchsorted(cumulative, rank)]
+        result[present] = np.clip(get_bin_values(keys % HISTOGRAM_BINS), self.min[present], self.max[present])
+        return result
+
+    def get_histograms(self) -> tuple:
+        """
+        Returns the histogram sketches in the CSR form.
+        :return: A tuple of offsets, bins and counts, the histogram of the item i is given by bins[offsets[i]:offsets[i + 1]] and their counts.
+        """
+        self.flush()
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.histogram_keys // HISTOGRAM_BINS, minlength=len(self)), out=offsets[1:])
+        return offsets, (self.histogram_keys % HISTOGRAM_BINS).astype(np.uint16), self.histogram_counts.astype(np.uint32)
+
+    @classmethod
+    def from_arrays(cls, count, mean, variance, minimum, maximum, offsets, bins, counts):
+        """
+        Restores the statistics from their stored form, e.g. the properties and the side-store of a cached graph.
+        :param count: Number of samples of each item.
+        :param mean: Mean of each item.
+        :param variance: Population variance of each item.
+        :param minimum: Minimum of each item.
+        :param maximum: Maximum of each item.
+        :param offsets: Offsets of the histograms, as returned by get_histograms().
+        :param bins: Bins of the histograms.
+        :param counts: Counts of the histogram bins.
+        :return: The restored LatencyStatistics.
+        """
+        statistics = cls()
+        count = np.asarray(count, dtype=np.int64)
+        statistics.count = count.copy()
+        statistics.mean = np.asarray(mean, dtype=np.float64).copy()
+        statistics.m2 = np.asarray(variance, dtype=np.float64) * count
+        statistics.min = np.where(count > 0, minimum, np.inf)
+        statistics.max = np.where(count > 0, maximum, -np.inf)
+        items = np.repeat(np.arange(len(count), dtype=np.int64), np.diff(offsets))
+        statistics.histogram_keys = items * HISTOGRAM_BINS + np.asarray(bins, dtype=np.int64)
+        statistics.histogram_counts = np.asarray(counts, dtype=np.int64)
+        return statistics
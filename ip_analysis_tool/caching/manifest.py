@@ -0,0 +1,138 @@
+import datetime
+import os
+import re
+from json import dumps, loads
+from typing import TypedDict
+
+MANIFEST_FILE = "manifest.json"
+
+# File names of the graphs named by their date
+GRAPH_FILE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}\.gt$")
+
+class SourceStatistics(TypedDict):
+    """
+    Statistics of the database rows a graph was generated from.
+    :param row_count: Number of the rows. (int)
+    :param max_date: Latest t_date of the rows in the ISO format, None if there were no rows. (str)
+    """
+    row_count: int
+    max_date: str
+
+class GraphSummary(TypedDict):
+    """
+    Summary of a cached graph, which can be read without loading the graph.
+    :param path: Path to the graph file. (str)
+    :param date: First day of the interval of the graph (YYYY-MM-DD). (str)
+    :param num_vertices: Number of vertices of the graph. (int)
+    :param num_edges: Number of edges of the graph. (int)
+    :param file_size: Size of the graph file in bytes. (int)
+    :param mtime: Modification time of the graph file in nanoseconds, to tell whether the summary is still current. (int)
+    :param metadata: Metadata of the graph, the same as json.loads(g.gp.metadata). (dict)
+    """
+    path: str
+    date: str
+    num_vertices: int
+    num_edges: int
+    file_size: int
+    mtime: int
+    metadata: dict
+
+class ManifestEntry(TypedDict):
+    """
+    Manifest entry of a single graph file.
+    :param source: Statistics of the source data at the time of generation, None if unknown (e.g. added by rebuilding the index). (SourceStatistics)
+    :param parameters: Parameters the graph was built with, None if unknown. (dict)
+    :param generated: Time of the generation in the ISO format. (str)
+    :param summary: Summary of the graph, missing in the entries written before the summaries were introduced. (GraphSummary)
+    """
+    source: SourceStatistics
+    parameters: dict
+    generated: str
+    summary: GraphSummary
+
+def load_manifest(data_folder : str) -> dict:
+    """
+    Loads the manifest of a cache folder.
+    :param data_folder: Folder containing the graphs, e.g. ~/.cache/IPAnalysisTool/graphs/week/base
+    :return: Dict of the file names mapped to their manifest entries, empty if there is no manifest.
+    """
+    try:
+        with open(os.path.join(data_folder, MANIFEST_FILE), "r") as f:
+            return loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(data_folder : str, manifest : dict):
+    """
+    Saves the manifest of a cache folder. The file is replaced atomically, so an interrupted run can't leave a broken manifest behind.
+    :param data_folder: Folder containing the graphs.
+    :param manifest: Dict of the file names mapped to their manifest entries.
+    """
+    if not os.path.exists(data_folder): os.makedirs(data_folder)
+    path = os.path.join(data_folder, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        f.write(dumps(manifest, indent=1, sort_keys=True))
+    os.replace(path + ".tmp", path)
+
+def create_manifest_entry(source : SourceStatistics, parameters : dict, summary : GraphSummary = None) -> ManifestEntry:
+    """
+    Creates a manifest entry for a freshly generated graph.
+    :param source: Statistics of the source data.
+    :param parameters: Build parameters of the graph.
+    :param summary: Summary of the graph, see create_graph_summary().
+    :return: The manifest entry.
+    """
+    entry = {
+        "source": source,
+        "parameters": parameters,
+        "generated": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    if summary is not None: entry["summary"] = summary
+    return entry
+
+def create_graph_summary(path : str, num_vertices : int, num_edges : int, metadata : dict) -> GraphSummary:
+    """
+    Creates the summary of a saved graph.
+    :param path: Path to the graph file.
+    :param num_vertices: Number of vertices of the graph.
+    :param num_edges: Number of edges of the graph.
+    :param metadata: Metadata of the graph.
+    :return: The summary.
+    """
+    stat = os.stat(path)
+    return {
+        "path": path,
+        "date": metadata.get("date"),
+        "num_vertices": num_vertices,
+        "num_edges": num_edges,
+        "file_size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "metadata": metadata,
+    }
+
+def is_summary_current(summary : GraphSummary) -> bool:
+    """
+    Determines whether the summary still describes its graph file.
+    :param summary: The summary.
+    :return: True if the file exists and its size and modification time haven't changed.
+    """
+    try:
+        stat = os.stat(summary["path"])
+    except OSError:
+        return False
+    return stat.st_size == summary["file_size"] and stat.st_mtime_ns == summary["mtime"]
+
+def is_stale(data_folder : str, file_name : str, manifest : dict, source : SourceStatistics, parameters : dict) -> bool:
+    """
+    Determines whether a graph has to be generated again.
+    :param data_folder: Folder containing the graphs.
+    :param file_name: File name of the graph, e.g. 2021-01-04.gt
+    :param manifest: Manifest of the folder.
+    :param source: Current statistics of the source data of the graph.
+    :param parameters: Current build parameters.
+    :return: True if the graph is missing, isn't in the manifest, or its source data or build parameters changed.
+    """
+    if not os.path.exists(os.path.join(data_folder, file_name)): return True
+    entry = manifest.get(file_name)
+    if entry is None: return True
+    return entry["source"] != source or entry["parameters"] != parameters
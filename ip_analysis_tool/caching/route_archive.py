@@ -0,0 +1,164 @@
+import datetime
+import os
+import re
+from ..enums import TimeInterval
+from ..util.date_util import get_date_string, get_date_object
+
+# Name of the partition files of the archive, one file per week
+PARTITION_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}\.parquet$")
+
+def get_archive_folder() -> str:
+    """
+    Returns the folder of the local route archive, creating it if it doesn't exist.
+    :return: Path to the folder, e.g. ~/.cache/IPAnalysisTool/archive
+    """
+    archive_folder = os.path.expanduser("~/.cache/IPAnalysisTool/archive")
+    if not os.path.exists(archive_folder):
+        os.makedirs(archive_folder)
+    return archive_folder
+
+def get_partition_path(week : datetime.date) -> str:
+    """
+    Returns the path to the partition of the archive holding the routes of the given week.
+    :param week: First day of the week.
+    :return: Path to the .parquet file of the partition.
+    """
+    return f"{get_archive_folder()}/{get_date_string(week)}.parquet"
+
+def get_archive_partitions() -> list:
+    """
+    Returns the first days of the weeks stored in the archive.
+    :return: Sorted list of datetime.date.
+    """
+    return sorted(get_date_object(f[:-8]) for f in os.listdir(get_archive_folder()) if PARTITION_PATTERN.match(f))
+
+def get_archive_range() -> tuple:
+    """
+    Returns the earliest and latest date of the routes in the archive, the same as get_database_range() does for the database.
+    :return: The earliest and latest datetime found in the archive, (None, None) if the archive is empty.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    earliest, latest = None, None
+    for week in get_archive_partitions():
+        dates = pq.read_table(get_partition_path(week), columns=["t_date"])["t_date"]
+        if len(dates) == 0: continue
+        if earliest is None: earliest = pc.min(dates).as_py()
+        latest = pc.max(dates).as_py()
+    return earliest, latest
+
+def get_archive_schema():
+    """
+    :return: Schema of the archive partitions.
+    """
+    import pyarrow as pa
+    return pa.schema([
+        ("t_route", pa.list_(pa.string())),
+        ("t_roundtrip", pa.list_(pa.float64())),
+        ("t_date", pa.timestamp("us")),
+    ])
+
+def write_partition(week : datetime.date, batches) -> int:
+    """
+    Writes the routes of a week into its partition of the archive, replacing the previous one.
+    :param week: First day of the week.
+    :param batches: Iterable of lists of (t_route, t_roundtrip, t_date) records, ordered by their date.
+    Routes from the midnight starting the following week are left out, they belong to the next partition.
+    :return: Number of the written routes.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = get_archive_schema()
+    path = get_partition_path(week)
+    rows = 0
+    # Write to a temporary file first, so an interrupted export can't leave a partial partition behind
+    with pq.ParquetWriter(path + ".tmp", schema, compression="zstd") as writer:
+        next_week = datetime.datetime.combine(week + datetime.timedelta(days=7), datetime.time())
+        for batch in batches:
+            # Dates are stored as the local time they were returned as, so their date parts stay the same
+            batch = [(record[0], record[1], record[2].replace(tzinfo=None)) for record in batch if record[2].replace(tzinfo=None) < next_week]
+            if not batch: continue
+            routes, times, dates = zip(*batch)
+            writer.write_table(pa.table([pa.array(routes, schema.field("t_route").type), pa.array(times, schema.field("t_roundtrip").type),
+                                         pa.array(dates, schema.field("t_date").type)], schema=schema))
+            rows += len(batch)
+    os.replace(path + ".tmp", path)
+    return rows
+
+def get_date_filter(start : str, end : str):
+    """
+    Returns the dataset filter of the routes within the given range.
+    :param start: Date from which to retrieve the routes. Format is YYYY-MM-DD.
+    :param end: Date to which to retrieve the routes (exclusive). Format is YYYY-MM-DD.
+    :return: pyarrow.dataset expression.
+    """
+    import pyarrow.dataset as ds
+    start_date = datetime.datetime.strptime(start, "%Y-%m-%d")
+    end_date = datetime.datetime.strptime(end, "%Y-%m-%d")
+    # Same conditions as ROUTE_CONDITIONS, the end date itself is still included
+    return (ds.field("t_date") >= start_date) & (ds.field("t_date") <= end_date)
+
+def get_overlapping_partitions(start : str, end : str) -> list:
+    """
+    Returns the paths to the partitions which may hold routes of the given range.
+    """
+    start_date, end_date = get_date_object(start), get_date_object(end)
+    return [get_partition_path(week) for week in get_archive_partitions() if week <= end_date and week + datetime.timedelta(days=6) >= start_date]
+
+def archive_route_batches(start : str, end : str, batch_size : int = None):
+    """
+    Retrieves the routes (t_route, t_roundtrip, t_date) for the given date range from the archive in batches, ordered by their date.
+    Only the partitions overlapping the range are opened, and the date filter is pushed down to the row groups of the partitions.
+    :param start: Date from which to retrieve the routes. Format is YYYY-MM-DD.
+    :param end: Date to which to retrieve the routes (exclusive). Format is YYYY-MM-DD.
+    :param batch_size: Maximum number of records in each batch.
+    :return: A generator of lists of records, the same as fetch_route_batches() returns.
+    """
+    import pyarrow.dataset as ds
+    date_filter = get_date_filter(start, end)
+    for path in get_overlapping_partitions(start, end):
+        dataset = ds.dataset(path, format="parquet")
+        for batch in dataset.to_batches(filter=date_filter, batch_size=batch_size if batch_size else 1 << 17):
+            if batch.num_rows == 0: continue
+            yield list(zip(batch.column(0).to_pylist(), batch.column(1).to_pylist(), batch.column(2).to_pylist()))
+
+def get_interval_starts(days, time_interval : TimeInterval):
+    """
+    Returns the first day of the interval containing each of the days, vectorized get_parent_interval().
+    :param days: numpy array of datetime64[D].
+    :param time_interval: Granularity of the intervals, except for TimeInterval.ALL.
+    :return: numpy array of datetime64[D].
+    """
+    import numpy as np
+    if time_interval == TimeInterval.WEEK:
+        # 1970-01-01 was a Thursday, weeks start on Mondays
+        return days - (days.astype(np.int64) + 3) % 7
+    unit = "M" if time_interval == TimeInterval.MONTH else "Y"
+    return days.astype(f"datetime64[{unit}]").astype("datetime64[D]")
+
+def archive_source_statistics(start : str, end : str, time_interval : TimeInterval) -> dict:
+    """
+    Retrieves the number of rows and the latest date of the routes for each interval in the given date range from the archive, see fetch_source_statistics().
+    Only the date column of the partitions is read.
+    :param start: Date from which to count the routes. Format is YYYY-MM-DD.
+    :param end: Date to which to count the routes. Format is YYYY-MM-DD.
+    :param time_interval: Granularity of the intervals. For TimeInterval.ALL, the whole range is a single interval named by the start date.
+    :return: Dict of the first days of the intervals (YYYY-MM-DD) mapped to the statistics of their routes, intervals without routes are left out.
+    """
+    import numpy as np
+    import pyarrow.dataset as ds
+    date_filter = get_date_filter(start, end)
+    paths = get_overlapping_partitions(start, end)
+    if not paths: return {}
+    dates = ds.dataset(paths, format="parquet").to_table(columns=["t_date"], filter=date_filter)["t_date"].to_numpy()
+    if len(dates) == 0: return {}
+    if time_interval == TimeInterval.ALL:
+        firsts = np.full(len(dates), np.datetime64(start, "D"))
+    else:
+        firsts = get_interval_starts(dates.astype("datetime64[D]"), time_interval)
+    keys, inverse, counts = np.unique(firsts, return_inverse=True, return_counts=True)
+    max_dates = np.full(len(keys), np.datetime64("NaT", "us"))
+    np.maximum.at(max_dates.view(np.int64), inverse, dates.astype("datetime64[us]").view(np.int64))
+    return {
+        str(key): {"row_count": int(count), "max_date": max_date.astype(datetime.datetime).isoformat()}
+        for key, count, max_date in zip(keys, counts, max_dates)}
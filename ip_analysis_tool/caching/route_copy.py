@@ -0,0 +1,206 @@
+import gc
+from datetime import datetime
+from queue import Queue, Full
+import threading
+
+# Size of the chunks of the COPY output handed from the reading thread to the parser
+COPY_CHUNK_SIZE = 1 << 20
+# Number of chunks buffered between the reading thread and the parser, bounds the memory usage
+COPY_QUEUE_SIZE = 8
+# Format of the COPY output. The CSV format is decoded by pyarrow, tabs don't occur in the columns, so they are only quoted if they contain quotes
+COPY_OPTIONS = "WITH (FORMAT csv, DELIMITER E'\\t')"
+
+class _CopyPipe:
+    """
+    A file-like object receiving the output of cursor.copy_expert() in a reading thread and handing it over to the parser in chunks.
+    """
+    def __init__(self):
+        self.queue = Queue(COPY_QUEUE_SIZE)
+        self.parts = []
+        self.size = 0
+        # Set when the parser stops early, the rest of the output is read and dropped so the transaction stays usable
+        self.discard = False
+
+    def write(self, data) -> int:
+        if self.discard: return len(data)
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= COPY_CHUNK_SIZE: self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self.parts: return
+        chunk = b"".join(self.parts)
+        self.parts = []
+        self.size = 0
+        self.put(chunk)
+
+    def put(self, item):
+        while not self.discard:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+def parse_array(field : str) -> list:
+    """
+    Parses a one-dimensional array in the PostgreSQL text format, e.g. {192.0.2.1,192.0.2.2}.
+    :param field: The array as written by COPY.
+    :return: List of the elements as strings, None for NULL elements. None if the array itself is NULL.
+    """
+    if field == "\\N": return None
+    content = field[1:-1]
+    if not content: return []
+    if '"' not in content and "\\" not in content:
+        return [None if element == "NULL" else element for element in content.split(",")] if "NULL" in content else content.split(",")
+    # Quoted elements, only present if they contain special characters
+    elements, current, quoted, escaped, was_quoted = [], [], False, False, False
+    for char in content:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+            was_quoted = True
+        elif char == "," and not quoted:
+            element = "".join(current)
+            elements.append(None if element == "NULL" and not was_quoted else element)
+            current, was_quoted = [], False
+        else:
+            current.append(char)
+    element = "".join(current)
+    elements.append(None if element == "NULL" and not was_quoted else element)
+    return elements
+
+def parse_float_array(field : str) -> list:
+    """
+    Parses a one-dimensional array of floats in the PostgreSQL text format, e.g. {0.5,1.25}.
+    :param field: The array as written by COPY.
+    :return: List of the floats, None for NULL elements. None if the array itself is NULL.
+    """
+    if field == "\\N": return None
+    content = field[1:-1]
+    if not content: return []
+    if "NULL" in content:
+        return [None if element == "NULL" else float(element) for element in content.split(",")]
+    return list(map(float, content.split(",")))
+
+def parse_timestamp(field : str) -> datetime:
+    """
+    Parses a timestamp in the PostgreSQL text format (ISO date style), e.g. 2021-01-04 12:00:00.5+01.
+    :param field: The timestamp as written by COPY, None if it is NULL.
+    :return: The timestamp, None if it is NULL.
+    """
+    if field is None: return None
+    return datetime.fromisoformat(field)
+
+def decode_routes(routes) -> list:
+    """
+    Splits the t_route arrays of a decoded chunk.
+    :param routes: The arrays as a pyarrow string array, NULL for the NULL arrays.
+    :return: List of the routes as lists of strings.
+    """
+    decoded = []
+    append = decoded.append
+    for route in routes.to_pylist():
+        if route is None: append(None)
+        # Quoted or NULL elements need the full parser, the addresses never have them
+        elif '"' in route or "\\" in route or "NULL" in route or route == "{}": append(parse_array(route))
+        else: append(route[1:-1].split(","))
+    return decoded
+
+def decode_times(times) -> list:
+    """
+    Converts the t_roundtrip arrays of a decoded chunk to floats, all the arrays at once.
+    :param times: The arrays as a pyarrow string array, NULL for the NULL arrays.
+    :return: List of the roundtrip times as lists of floats.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    try:
+        if times.null_count: raise pa.ArrowInvalid("NULL array")
+        elements = pc.split_pattern(pc.utf8_slice_codeunits(times, 1, -1), ",")
+        values = pc.cast(elements.values, pa.float64()).to_numpy().tolist()
+    except pa.ArrowInvalid:
+        # NULL or empty arrays, or NULL elements
+        return [parse_float_array(value) if value is not None else None for value in times.to_pylist()]
+    offsets = elements.offsets.to_numpy().tolist()
+    return [values[offsets[k]:offsets[k + 1]] for k in range(len(times))]
+
+def decode_route_chunk(data : bytes) -> list:
+    """
+    Decodes complete rows of (t_route, t_roundtrip, t_date) written by COPY in the CSV format with tabs as the delimiter.
+    The chunk is split into columns by pyarrow, the roundtrip times are converted as a whole, only the records themselves are created in Python.
+    :param data: The rows including their line terminators.
+    :return: List of (t_route, t_roundtrip, t_date, ...) records, the same as returned by a cursor. Any further columns are kept as strings.
+    """
+    import io
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    names = [f"f{k}" for k in range(data[:data.find(b"\n")].count(b"\t") + 1)]
+    table = pv.read_csv(
+        io.BytesIO(data),
+        read_options=pv.ReadOptions(column_names=names),
+        parse_options=pv.ParseOptions(delimiter="\t"),
+        # Only the unquoted empty fields are NULL, the same as in the COPY output
+        convert_options=pv.ConvertOptions(column_types={name: pa.string() for name in names}, strings_can_be_null=True, quoted_strings_can_be_null=False, null_values=[""]))
+    columns = [column.combine_chunks() for column in table.columns]
+    # The records have no reference cycles, pausing the collector while they are created saves its repeated scans of the growing batch
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return list(zip(decode_routes(columns[0]), decode_times(columns[1]), map(parse_timestamp, columns[2].to_pylist()), *(column.to_pylist() for column in columns[3:])))
+    finally:
+        if enabled: gc.enable()
+
+def copy_route_batches(rem_cur, query : str, batch_size : int):
+    """
+    Retrieves the routes of a query using COPY ... TO STDOUT, which transfers the rows in bulk instead of one by one.
+    The output is read in a separate thread in the CSV format and decoded in chunks by pyarrow (see decode_route_chunk()), only a few chunks are held in memory at a time.
+    :param rem_cur: Database cursor, it must not be used by anything else until the generator is exhausted or closed.
+    :param query: Query selecting t_route, t_roundtrip and t_date (and optionally further text columns), with the parameters already bound (see cursor.mogrify()).
+    :param batch_size: Number of records in each returned batch.
+    :return: A generator of lists of (t_route, t_roundtrip, t_date) records.
+    """
+    pipe = _CopyPipe()
+    errors = []
+
+    def read():
+        try:
+            rem_cur.copy_expert(f"COPY ({query}) TO STDOUT {COPY_OPTIONS}", pipe)
+            pipe.flush()
+        except Exception as e:
+            errors.append(e)
+        # End of the output
+        pipe.put(None)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        remainder = b""
+        batch = []
+        while True:
+            chunk = pipe.queue.get()
+            if chunk is None: break
+            data = remainder + chunk
+            # Keep an unfinished row for the next chunk
+            end = data.rfind(b"\n") + 1
+            remainder = data[end:]
+            if end: batch.extend(decode_route_chunk(data[:end]))
+            done = 0
+            while len(batch) - done >= batch_size:
+                yield batch[done:done + batch_size]
+                done += batch_size
+            batch = batch[done:]
+        if errors: raise errors[0]
+        if remainder: batch.extend(decode_route_chunk(remainder + b"\n"))
+        if batch: yield batch
+    finally:
+        pipe.discard = True
+        # Unblock the reading thread, the rest of the output is dropped
+        while thread.is_alive():
+            while not pipe.queue.empty(): pipe.queue.get_nowait()
+            thread.join(0.1)
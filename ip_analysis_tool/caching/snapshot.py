@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import numpy as np
+
+# Suffix of the snapshot folder of a cached graph, the folder holds one .npy file per array
+SNAPSHOT_SUFFIX = ".snapshot"
+
+def get_snapshot_path(graph_path : str) -> str:
+    """
+    Returns the path to the snapshot of a cached graph.
+    :param graph_path: Path to the .gt file of the graph.
+    :return: Path to the snapshot folder.
+    """
+    return (graph_path[:-3] if graph_path.endswith(".gt") else graph_path) + SNAPSHOT_SUFFIX
+
+def get_csr(owners : np.ndarray, size : int) -> tuple:
+    """
+    Groups the edges by their source or target vertex in the CSR form.
+    :param owners: Source or target vertex of each edge.
+    :param size: Number of vertices.
+    :return: A tuple of the offsets (one more than the number of vertices) and the edge indices grouped by the vertex, the edges of the vertex v are edges[offsets[v]:offsets[v + 1]].
+    """
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=size), out=offsets[1:])
+    return offsets, np.argsort(owners, kind="stable").astype(np.int64)
+
+def write_snapshot_arrays(path : str, sources : np.ndarray, targets : np.ndarray, ips : list, vertex_properties : dict, edge_properties : dict, metadata : dict):
+    """
+    Writes a snapshot from plain arrays, replacing the previous one.
+    :param path: Path to the snapshot folder.
+    :param sources: Source vertex of each edge, ordered by the edge index.
+    :param targets: Target vertex of each edge, ordered by the edge index.
+    :param ips: IP address of each vertex.
+    :param vertex_properties: Dict of the names of the scalar vertex properties mapped to their arrays.
+    :param edge_properties: Dict of the names of the scalar edge properties mapped to their arrays.
+    :param metadata: Metadata of the graph, with source_mtime of the graph file it's made from.
+    """
+    num_vertices = len(ips)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    arrays = {"edge_sources": sources, "edge_targets": targets}
+    arrays["out_offsets"], arrays["out_edges"] = get_csr(sources, num_vertices)
+    arrays["in_offsets"], arrays["in_edges"] = get_csr(targets, num_vertices)
+    # The IP addresses are stored as one byte string, the address of the vertex v is ip_data[ip_offsets[v]:ip_offsets[v + 1]]
+    encoded = [ip.encode() for ip in ips]
+    arrays["ip_offsets"] = np.zeros(num_vertices + 1, dtype=np.int64)
+    np.cumsum([len(ip) for ip in encoded], out=arrays["ip_offsets"][1:])
+    arrays["ip_data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    arrays.update({f"vertex_{name}": np.asarray(values) for name, values in vertex_properties.items()})
+    arrays.update({f"edge_{name}": np.asarray(values) for name, values in edge_properties.items()})
+
+    # Write into a temporary folder first, so readers never see a partially written snapshot
+    temporary = f"{path}.tmp{os.getpid()}"
+    if os.path.exists(temporary): shutil.rmtree(temporary)
+    os.makedirs(temporary)
+    for name, values in arrays.items():
+        np.save(f"{temporary}/{name}.npy", values)
+    with open(f"{temporary}/metadata.json", "w") as f:
+        json.dump({**metadata, "num_vertices": num_vertices, "num_edges": len(sources)}, f)
+    # Folders can't be replaced in one step, the old snapshot is moved away first. Processes which still map it keep their pages.
+    if os.path.exists(path):
+        old = f"{path}.old{os.getpid()}"
+        os.replace(path, old)
+        shutil.rmtree(old, ignore_errors=True)
+    try:
+        os.replace(temporary, path)
+    except OSError:
+        # Another process wrote the snapshot at the same time, its copy is used
+        shutil.rmtree(temporary, ignore_errors=True)
+
+def write_snapshot(g, path : str, source_mtime : int = None):
+    """
+    Writes a snapshot of a graph with all its scalar vertex and edge properties.
+    :param g: The graph, e.g. a cached graph loaded with all its properties.
+    :param path: Path to the snapshot folder, see get_snapshot_path().
+    :param source_mtime: Modification time of the graph file in nanoseconds, used to detect outdated snapshots.
+    """
+    edges = g.get_edges([g.edge_index])
+    edges = edges[np.argsort(edges[:, 2])] if len(edges) else np.zeros((0, 3), dtype=np.int64)
+    vertex_properties = {name: np.array(prop.a) for name, prop in g.vp.items() if name != "ip" and prop.a is not None}
+    edge_properties = {name: np.array(prop.a) for name, prop in g.ep.items() if prop.a is not None}
+    metadata = {"graph": json.loads(g.gp.metadata) if "metadata" in g.gp else None, "source_mtime": source_mtime}
+    write_snapshot_arrays(path, edges[:, 0], edges[:, 1], [g.vp.ip[v] for v in g.vertices()], vertex_properties, edge_properties, metadata)
+
+def is_snapshot_current(path : str, graph_path : str) -> bool:
+    """
+    Checks whether a snapshot exists and was made from the current graph file.
+    :param path: Path to the snapshot folder.
+    :param graph_path: Path to the .gt file the snapshot is made from.
+    :return: Whether the snapshot can be used.
+    """
+    try:
+        with open(f"{path}/metadata.json") as f:
+            return json.load(f).get("source_mtime") == os.stat(graph_path).st_mtime_ns
+    except (OSError, ValueError):
+        return False
+
+class GraphSnapshot:
+    """
+    Read-only graph stored as memory-mapped arrays: the edge list, the CSR adjacency in both directions, the scalar properties and the IP addresses.
+    The arrays are mapped on first use, so processes reading the same snapshot share its pages through the page cache instead of each holding a copy.
+    """
+    def __init__(self, path : str):
+        """
+        :param path: Path to the snapshot folder.
+        """
+        self.path = path
+        with open(f"{path}/metadata.json") as f:
+            info = json.load(f)
+        self.metadata = info["graph"]
+        self.source_mtime = info.get("source_mtime")
+        self._num_vertices = info["num_vertices"]
+        self._num_edges = info["num_edges"]
+        self._arrays = {}
+        self._names = {f[:-4] for f in os.listdir(path) if f.endswith(".npy")}
+
+    def array(self, name : str) -> np.ndarray:
+        """
+        Returns a stored array mapped into memory.
+        :param name: Name of the array, e.g. out_offsets or vertex_hop_distance.
+        :return: Read-only array.
+        """
+        if name not in self._arrays:
+            if name not in self._names:
+                raise KeyError(name)
+            self._arrays[name] = np.load(f"{self.path}/{name}.npy", mmap_mode="r")
+        return self._arrays[name]
+
+    def num_vertices(self) -> int:
+        return self._num_vertices
+
+    def num_edges(self) -> int:
+        return self._num_edges
+
+    def vertex_properties(self) -> list:
+        """
+        :return: Names of the scalar vertex properties.
+        """
+        return sorted(name[7:] for name in self._names if name.startswith("vertex_"))
+
+    def edge_properties(self) -> list:
+        """
+        :return: Names of the scalar edge properties.
+        """
+        return sorted(name[5:] for name in self._names if name.startswith("edge_") and name not in ("edge_sources", "edge_targets"))
+
+    def vertex_property(self, name : str) -> np.ndarray:
+        """
+        :param name: Name of the property, e.g. hop_distance.
+        :return: Values of the property indexed by the vertex.
+        """
+        return self.array(f"vertex_{name}")
+
+    def edge_property(self, name : str) -> np.ndarray:
+        """
+        :param name: Name of the property, e.g. traversals.
+        :return: Values of the property indexed by the edge.
+        """
+        return self.array(f"edge_{name}")
+
+    def edges(self) -> tuple:
+        """
+        :return: A tuple of the source and the target vertex of each edge.
+        """
+        return self.array("edge_sources"), self.array("edge_targets")
+
+    def out_edges(self, v : int) -> np.ndarray:
+        """
+        :return: Indices of the edges leaving the vertex v.
+        """
+        offsets = self.array("out_offsets")
+        return self.array("out_edges")[offsets[v]:offsets[v + 1]]
+
+    def in_edges(self, v : int) -> np.ndarray:
+        """
+        :return: Indices of the edges entering the vertex v.
+        """
+        offsets = self.array("in_offsets")
+        return self.array("in_edges")[offsets[v]:offsets[v + 1]]
+
+    def out_neighbors(self, v : int) -> np.ndarray:
+        return self.array("edge_targets")[self.out_edges(v)]
+
+    def in_neighbors(self, v : int) -> np.ndarray:
+        return self.array("edge_sources")[self.in_edges(v)]
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.array("out_offsets"))
+
+    def in_degrees(self) -> np.ndarray:
+        return np.diff(self.array("in_offsets"))
+
+    def ip(self, v : int) -> str:
+        """
+        :return: IP address of the vertex v.
+        """
+        offsets = self.array("ip_offsets")
+        return self.array("ip_data")[offsets[v]:offsets[v + 1]].tobytes().decode()
+
+    def gids(self) -> np.ndarray:
+        """
+        :return: Global IDs of the IP addresses of all the vertices, see ip_analysis_tool.caching.ip_dictionary.
+        """
+        from .ip_dictionary import ID_MASK
+        return self.vertex_property("gid").astype(np.int64) & ID_MASK
+
+    def ips(self) -> list:
+        """
+        :return: IP addresses of all the vertices.
+        """
+        data = self.array("ip_data").tobytes()
+        offsets = self.array("ip_offsets")
+        return [data[offsets[v]:offsets[v + 1]].decode() for v in range(self._num_vertices)]
+
+    def to_graph(self, properties = None):
+        """
+        Creates a graph_tool graph from the snapshot, e.g. for the algorithms which need one. The graph is a private copy of the process.
+        Wrap it in a graph_tool.GraphView to filter it without copying again.
+        :param properties: Names of the vertex and edge properties to add besides ip, gid and traversals, the same as for get_graph_by_date(). None adds all of them.
+        :return: The graph with the same vertex and edge indices as the snapshot. (graph_tool.Graph)
+        """
+        from graph_tool import Graph
+        from .graph_store import CORE_PROPERTIES, PROPERTY_TYPES
+        g = Graph(directed=True)
+        g.add_vertex(self._num_vertices)
+        if self._num_edges:
+            sources, targets = self.edges()
+            g.add_edge_list(np.column_stack((sources, targets)))
+        g.vp["ip"] = g.new_vertex_property("string", vals=self.ips())
+        for kind, names, new_property, property_maps in (("vertex", self.vertex_properties(), g.new_vertex_property, g.vp),
+                                                         ("edge", self.edge_properties(), g.new_edge_property, g.ep)):
+            for name in names:
+                if properties is not None and name not in properties and name not in CORE_PROPERTIES[kind]: continue
+                values = self.array(f"{kind}_{name}")
+                prop = new_property(PROPERTY_TYPES[values.dtype.name])
+                prop.a = values
+                property_maps[name] = prop
+        if self.metadata is not None:
+            g.gp["metadata"] = g.new_graph_property("string")
+            g.gp["metadata"] = json.dumps(self.metadata)
+        return g
@@ -0,0 +1,217 @@
+import datetime
+import random
+import re
+
+# Address of an unknown hop, the same as in the topology table
+GAP_ADDRESS = "0.0.0.0/32"
+
+def random_address(rnd : random.Random, prefix : tuple = ()) -> str:
+    """
+    Returns a random public address, optionally within the given prefix.
+    :param rnd: Random number generator.
+    :param prefix: Tuple of the leading octets of the address.
+    :return: The address in the dotted notation.
+    """
+    octets = list(prefix)
+    if not octets:
+        # First octets of public unicast blocks, none of them is reserved
+        octets.append(rnd.choice([n for n in range(11, 224) if n not in (100, 127, 169, 172, 192, 198, 203)]))
+    while len(octets) < 3:
+        octets.append(rnd.randint(0, 255))
+    return ".".join(map(str, octets + [rnd.randint(1, 254)]))
+
+class SyntheticTopology:
+    """
+    Random network measured by traceroutes from a single host, used to benchmark the graph generation without the production database.
+    Every route leaves through the same access hops, crosses routers of a few shared backbone prefixes and ends in the last-mile hops of its destination.
+    The path of a destination is fixed, except for some measurements taking an alternative backbone router, as with load balancing.
+    """
+    def __init__(self, destinations : int = 2000, mean_hops : float = 12.0, hop_deviation : float = 4.0, max_hops : int = 30, access_hops : int = 2,
+                 backbone_prefixes : int = 8, routers_per_prefix : int = 64, reserved_rate : float = 0.01, seed : int = 0):
+        """
+        :param destinations: Number of the measured destinations.
+        :param mean_hops: Mean length of the routes, including the destination.
+        :param hop_deviation: Standard deviation of the length of the routes.
+        :param max_hops: Maximum length of the routes, the shortest routes have access_hops + 2 hops.
+        :param access_hops: Number of the hops shared by all the routes.
+        :param backbone_prefixes: Number of the /16 prefixes of the backbone routers.
+        :param routers_per_prefix: Number of the routers within each backbone prefix.
+        :param reserved_rate: Share of the destinations within a reserved block, which the graph generation leaves out.
+        :param seed: Seed of the random number generator, the same parameters and seed give the same topology.
+        """
+        rnd = random.Random(seed)
+        self.access = [random_address(rnd) for _ in range(access_hops)]
+        prefixes = [tuple(map(int, random_address(rnd).split(".")[:2])) for _ in range(backbone_prefixes)]
+        self.backbone = [[random_address(rnd, prefix) for _ in range(routers_per_prefix)] for prefix in prefixes]
+        self.paths = []
+        for _ in range(destinations):
+            destination = random_address(rnd, (10,)) if rnd.random() < reserved_rate else random_address(rnd)
+            length = min(max_hops, max(access_hops + 2, round(rnd.gauss(mean_hops, hop_deviation))))
+            last_mile = min(rnd.randint(1, 3), length - access_hops - 1)
+            backbone_hops = length - access_hops - last_mile
+            # The backbone path walks through neighbouring prefixes, the alternative router of each hop is in the same prefix
+            first_prefix = rnd.randrange(backbone_prefixes)
+            backbone, alternatives = [], []
+            for i in range(backbone_hops):
+                routers = self.backbone[(first_prefix + i // 3) % backbone_prefixes]
+                backbone.append(rnd.choice(routers))
+                alternatives.append(rnd.choice(routers))
+            prefix = tuple(map(int, destination.split(".")[:3]))
+            route = self.access + backbone + [random_address(rnd, prefix) for _ in range(last_mile - 1)] + [destination]
+            # Base one-way latency of each hop in milliseconds, the backbone hops are the slowest
+            latencies = [rnd.uniform(0.2, 1.0) for _ in self.access] + [rnd.uniform(0.5, 8.0) for _ in backbone] + [rnd.uniform(0.2, 2.0) for _ in range(last_mile)]
+            self.paths.append((route, alternatives, latencies))
+
+    def measure(self, rnd : random.Random, date : datetime.datetime, gap_rate : float, failure_rate : float, balance_rate : float, jitter : float) -> tuple:
+        """
+        Measures a route to a random destination.
+        :param rnd: Random number generator.
+        :param date: Date and time of the measurement.
+        :param gap_rate: Probability of the route having an unknown hop (0.0.0.0/32).
+        :param failure_rate: Probability of the measurement failing, its status isn't C.
+        :param balance_rate: Probability of each backbone hop taking the alternative router.
+        :param jitter: Standard deviation of the measured roundtrip time of each hop in milliseconds.
+        :return: A row of the topology table, see generate_routes().
+        """
+        route, alternatives, latencies = rnd.choice(self.paths)
+        route = list(route)
+        access = len(self.access)
+        for i, alternative in enumerate(alternatives):
+            if rnd.random() < balance_rate: route[access + i] = alternative
+        times, total = [], 0.0
+        for latency in latencies:
+            total += 2 * latency
+            # Roundtrip times may decrease along the route, such routes are left out of the weighted graphs
+            times.append(round(max(0.01, total + rnd.gauss(0, jitter)), 3))
+        if rnd.random() < gap_rate:
+            gap = rnd.randrange(len(route) - 1)
+            route[gap] = "0.0.0.0"
+            times[gap] = 0.0
+        destination = route[-1]
+        return [f"{address}/32" for address in route], times, date, "C" if rnd.random() >= failure_rate else "F", len(route), destination
+
+def generate_routes(start : datetime.date, end : datetime.date, routes_per_week : int = 10000, topology : SyntheticTopology = None, gap_rate : float = 0.02,
+                    failure_rate : float = 0.05, balance_rate : float = 0.05, jitter : float = 1.0, seed : int = 0) -> list:
+    """
+    Generates synthetic rows of the topology table, the same arguments always give the same rows.
+    :param start: Date of the first measurement.
+    :param end: Date to which to generate the measurements (exclusive).
+    :param routes_per_week: Number of the measurements in every 7 days, the dates are spread uniformly over the range.
+    :param topology: The measured network, SyntheticTopology(seed=seed) by default.
+    :param gap_rate: Probability of a route having an unknown hop, the graph generation leaves such routes out.
+    :param failure_rate: Probability of a failed measurement, the graph generation leaves them out.
+    :param balance_rate: Probability of each backbone hop taking the alternative router.
+    :param jitter: Standard deviation of the measured roundtrip times in milliseconds.
+    :param seed: Seed of the random number generator.
+    :return: List of (t_route, t_roundtrip, t_date, t_status, t_hops, ip_addr) rows ordered by t_date. Addresses of the routes are in the CIDR notation, as returned by the database.
+    """
+    if topology is None: topology = SyntheticTopology(seed=seed)
+    rnd = random.Random(seed)
+    start = datetime.datetime.combine(start, datetime.time())
+    seconds = (datetime.datetime.combine(end, datetime.time()) - start).total_seconds()
+    count = round(routes_per_week * seconds / (7 * 24 * 3600))
+    dates = sorted(start + datetime.timedelta(seconds=rnd.uniform(0, seconds)) for _ in range(count))
+    return [topology.measure(rnd, date, gap_rate, failure_rate, balance_rate, jitter) for date in dates]
+
+class SyntheticCursor:
+    """
+    Stands in for a database cursor over the synthetic rows, it answers the route queries of fetch_route_batches() the same as the topology table would.
+    Both the cursor and the COPY extraction are supported, the non-reserved IP table is emulated by leaving out the destinations within the default reserved blocks.
+    """
+    def __init__(self, rows : list, name : str = None):
+        """
+        :param rows: Rows returned by generate_routes().
+        :param name: Name of a server-side cursor, only kept for compatibility.
+        """
+        self.rows = rows
+        self.name = name
+        self.itersize = 2000
+        self.connection = SyntheticConnection(rows)
+        self.result = []
+        self.position = 0
+
+    def select(self, query : str, start : str, end : str) -> list:
+        """
+        Selects the records of a route query, see ip_analysis_tool.caching.graph_cache.ROUTE_CONDITIONS.
+        :param query: The query.
+        :param start: First date of the routes, format is YYYY-MM-DD.
+        :param end: Date to which to select the routes, format is YYYY-MM-DD. It's compared with the timestamps of the routes, so only the routes at its midnight are included.
+        :return: List of the selected records.
+        """
+        if not re.match(r"\s*SELECT t_route, t_roundtrip, t_date\b", query):
+            raise NotImplementedError(f"Unsupported query: {query.strip()}")
+        start, end = datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end)
+        reserved = None
+        if "JOIN" in query:
+            from ..util.ip_util import ReservedRangeIndex, ips_to_ints
+            reserved = ReservedRangeIndex()
+        records = []
+        for route, times, date, status, hops, destination in self.rows:
+            if status != "C" or hops <= 1 or not start <= date <= end or GAP_ADDRESS in route: continue
+            records.append((route, times, date, destination))
+        if reserved is not None:
+            contained = reserved.contains(ips_to_ints(record[3] for record in records))
+            records = [record for record, is_reserved in zip(records, contained) if not is_reserved]
+        if "host(" not in query:
+            records = [record[:3] for record in records]
+        # The rows are already ordered by their date
+        return records
+
+    def execute(self, query : str, parameters : tuple = ()):
+        self.result = self.select(query, *parameters)
+        self.position = 0
+
+    def fetchmany(self, size : int = None) -> list:
+        size = size if size is not None else self.itersize
+        batch = self.result[self.position:self.position + size]
+        self.position += len(batch)
+        return batch
+
+    def fetchall(self) -> list:
+        return self.fetchmany(len(self.result) - self.position)
+
+    def __iter__(self):
+        while True:
+            batch = self.fetchmany()
+            if not batch: return
+            yield from batch
+
+    def mogrify(self, query : str, parameters : tuple) -> bytes:
+        return (query % tuple(f"'{parameter}'" for parameter in parameters)).encode()
+
+    def copy_expert(self, sql : str, file):
+        """
+        Writes the records of a COPY (query) TO STDOUT WITH (FORMAT csv, DELIMITER E'\\t') statement.
+        """
+        match = re.fullmatch(r"COPY \((.*)\) TO STDOUT WITH \(FORMAT csv, DELIMITER E'\\t'\)", sql, re.DOTALL)
+        if match is None:
+            raise NotImplementedError(f"Unsupported statement: {sql}")
+        query = match.group(1)
+        dates = re.findall(r"t_date [<>]= '([^']*)'", query)
+        for record in self.select(query, *dates):
+            route, times, date, *rest = record
+            fields = ["{" + ",".join(route) + "}", "{" + ",".join(map(repr, times)) + "}", date.isoformat(sep=" "), *map(str, rest)]
+            # Only the fields with quotes need quoting, the delimiter doesn't occur in them
+            file.write(("\t".join('"' + field.replace('"', '""') + '"' if '"' in field else field for field in fields) + "\n").encode())
+
+    def close(self):
+        pass
+
+class SyntheticConnection:
+    """
+    Stands in for the connection of a SyntheticCursor.
+    """
+    def __init__(self, rows : list):
+        self.rows = rows
+
+    def cursor(self, name : str = None) -> SyntheticCursor:
+        return SyntheticCursor(self.rows, name)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
@@ -18,29 +18,43 @@ def edge_repr(e: Edge, ip_prop: VertexPropertyMap):
 def compare_graphs_jaccard(g1: gt.Graph, g2: gt.Graph) -> dict:
     """
     Compare two graphs using the Jaccard index for edges and vertices.
+    Cached graphs are compared by the global IDs of their IP addresses as integer arrays, other graphs by the address strings.
     :param g1: First graph to compare.
     :param g2: Second graph to compare.
     :return: A comparison rundown as a dictionary.
     """
-    # Apply Jaccard index for edges
-    edges1 = {edge_repr(e, g1.vp.ip) for e in g1.edges()}
-    edges2 = {edge_repr(e, g2.vp.ip) for e in g2.edges()}
-    edges_in_intersection = edges1.intersection(edges2)
-    edges_in_union = edges1.union(edges2)
+    if "gid" in g1.vp and "gid" in g2.vp:
+        import numpy as np
+        from ip_analysis_tool.util.graph_util import get_vertex_gids, get_edge_keys
+        gids1, gids2 = get_vertex_gids(g1), get_vertex_gids(g2)
+        edges1, edges2 = get_edge_keys(g1, gids1), get_edge_keys(g2, gids2)
+        vertices1, vertices2 = np.unique(gids1[g1.get_vertices()]), np.unique(gids2[g2.get_vertices()])
+        edges_in_intersection = len(np.intersect1d(edges1, edges2, assume_unique=True))
+        edges_in_union = len(edges1) + len(edges2) - edges_in_intersection
+        vertices_in_intersection = len(np.intersect1d(vertices1, vertices2, assume_unique=True))
+        vertices_in_union = len(vertices1) + len(vertices2) - vertices_in_intersection
+    else:
+        # Apply Jaccard index for edges
+        edges1 = {edge_repr(e, g1.vp.ip) for e in g1.edges()}
+        edges2 = {edge_repr(e, g2.vp.ip) for e in g2.edges()}
+        edges_in_intersection = len(edges1.intersection(edges2))
+        edges_in_union = len(edges1.union(edges2))
 
-    vertices1 = set(g1.vp.ip[v] for v in g1.vertices())
-    vertices2 = set(g2.vp.ip[v] for v in g2.vertices())
+        vertices1 = set(g1.vp.ip[v] for v in g1.vertices())
+        vertices2 = set(g2.vp.ip[v] for v in g2.vertices())
+        vertices_in_intersection = len(vertices1.intersection(vertices2))
+        vertices_in_union = len(vertices1.union(vertices2))
 
-    similarity = len(edges_in_intersection) / len(edges_in_union)
+    similarity = edges_in_intersection / edges_in_union
     return {
         "vertices_in_graph_1": g1.num_vertices(),
         "edges_in_graph_1": g1.num_edges(),
         "vertices_in_graph_2": g2.num_vertices(),
         "edges_in_graph_2": g2.num_edges(),
-        "intersection_of_edges": len(edges_in_intersection),
-        "union_of_edges": len(edges_in_union),
-        "intersection_of_vertices": len(vertices1.intersection(vertices2)),
-        "union_of_vertices": len(vertices1.union(vertices2)),
+        "intersection_of_edges": edges_in_intersection,
+        "union_of_edges": edges_in_union,
+        "intersection_of_vertices": vertices_in_intersection,
+        "union_of_vertices": vertices_in_union,
         "similarity": similarity
     }
 
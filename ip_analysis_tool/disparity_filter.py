@@ -2,6 +2,9 @@ from typing import Tuple
 from graph_tool import Graph, GraphView
 from scipy.stats import percentileofscore
 
+# Version of the stored disparity measures, has to be increased whenever disparity_compute() gives different results
+DISPARITY_VERSION = 1
+
 
 def disparity_integral(x, k):
     assert x != 1.0, "x cannot be 1.0"
@@ -14,18 +17,16 @@ def get_disparity_significance(norm_weight, degree):
                   degree) - disparity_integral(0.0, degree)))
 
 
-def disparity_compute(g: Graph) -> Tuple[Graph, dict]:
+def compute_disparity_measures(gv: Graph) -> dict:
     """
-    Compute the disparity measures of a graph.
-    :param g: Input graph.
-    :return: A tuple of the graph and the disparity measures.
+    Compute the disparity significance of each edge of an undirected graph, see disparity_compute().
+    :param gv: Undirected copy of the input graph.
+    :return: The alpha and alpha_percentile values indexed by the edge index and the alpha_measures, as a result of the derived results cache.
     """
-    if g.num_edges() == 0:
-        return Graph(), {}
+    import numpy as np
     alpha_measures = []
-    gv = Graph(g, directed=False)
     # Scale back the weights for edges
-    max_weight = max([g.ep.traversals[e] for e in gv.edges()])
+    max_weight = max([gv.ep.traversals[e] for e in gv.edges()])
     weight_prop = gv.new_edge_property("float")
     for e in gv.edges():
         weight_prop[e] = gv.ep.traversals[e] / max_weight
@@ -61,9 +62,35 @@ def disparity_compute(g: Graph) -> Tuple[Graph, dict]:
         edge_alpha_percentile[e] = percentileofscore(
             alpha_measures, edge_alpha[e])
 
+    return {
+        "arrays": {
+            "alpha": np.array(edge_alpha.a),
+            "alpha_percentile": np.array(edge_alpha_percentile.a),
+            "alpha_measures": np.array(alpha_measures, dtype=float),
+        },
+        "scalars": {},
+    }
+
+
+def disparity_compute(g: Graph, cache: bool = True) -> Tuple[Graph, dict]:
+    """
+    Compute the disparity measures of a graph.
+    :param g: Input graph.
+    :param cache: Reuse the measures stored by a previous run for the same cached graph, see ip_analysis_tool.caching.derived_cache.
+    :return: A tuple of the graph and the disparity measures.
+    """
+    from .caching.derived_cache import get_derived_result
+    if g.num_edges() == 0:
+        return Graph(), {}
+    gv = Graph(g, directed=False)
+    result = get_derived_result(g, "disparity", DISPARITY_VERSION, {}, lambda _: compute_disparity_measures(gv), cache, ["traversals"])
+    edge_alpha = gv.new_edge_property("float")
+    edge_alpha.a = result["arrays"]["alpha"]
+    edge_alpha_percentile = gv.new_edge_property("float")
+    edge_alpha_percentile.a = result["arrays"]["alpha_percentile"]
     gv.edge_properties["alpha"] = edge_alpha
     gv.edge_properties["alpha_percentile"] = edge_alpha_percentile
-    return gv, alpha_measures
+    return gv, result["arrays"]["alpha_measures"].tolist()
 
 
 def disparity_filter(g: Graph, percentile_threshold: float = 50.0) -> Graph:
@@ -117,7 +144,8 @@ def main():
         get_graph_by_date(
             get_date_object(
                 args.date),
-            weighted_edges=args.weighted_edges),
+            weighted_edges=args.weighted_edges,
+            properties=[]),
         args.percentile)
     print(g.num_vertices())
     visualize_graph(g, f"disparity_{args.date}")
@@ -2,23 +2,34 @@ from graph_tool import Graph
 from .util.calculations import get_h_index
 from .visualize.graph import visualize_graph_map
 
+# Version of the stored bridge values, has to be increased whenever add_bridge() gives different results
+BRIDGE_VERSION = 1
+
 # Get bridge of the network
 
 
-def add_bridge(g: Graph):
+def compute_bridge(g: Graph) -> dict:
+    """
+    Computes the bridge value of each edge of the graph, its betweenness divided by the number of vertices.
+    :param g: Input graph.
+    :return: The bridge values indexed by the edge index, as a result of the derived results cache.
+    """
+    from graph_tool.centrality import betweenness
+    _, edge_betweenness = betweenness(g, norm=False)
+    return {"arrays": {"bridge": edge_betweenness.a / g.num_vertices()}, "scalars": {}}
+
+
+def add_bridge(g: Graph, cache: bool = True):
     """
     Adds the bridge property to the graph
     :param g: Input graph.
+    :param cache: Reuse the bridge values stored by a previous run for the same cached graph, see ip_analysis_tool.caching.derived_cache.
     :return: Graph with bridge edge property added.
     """
-    from graph_tool.centrality import betweenness
+    from .caching.derived_cache import get_derived_result
     bridge = g.new_edge_property("double")
+    bridge.a = get_derived_result(g, "bridge", BRIDGE_VERSION, {}, compute_bridge, cache)["arrays"]["bridge"]
     g.edge_properties["bridge"] = bridge
-    _, edge_betweenness = betweenness(g, norm=False)
-
-    num_vertices = g.num_vertices()
-    for e in g.edges():
-        bridge[e] = (edge_betweenness[e] / num_vertices)
     return g
 
 # Get H-Backbone of the network
@@ -99,7 +110,8 @@ def main(args=None):
         get_graph_by_date(
             get_date_object(
                 args.date),
-            args.weighted_edges),
+            args.weighted_edges,
+            properties=[]),
         visualize=args.visualize,
         verbose=args.verbose)
 
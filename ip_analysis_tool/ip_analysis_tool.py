@@ -10,6 +10,10 @@ def main():
             "launch": ("ip_analysis_tool.caching.graph_cache", "main"),
             "description": "Cache the graph data."
         },
+        "benchmark": {
+            "launch": ("ip_analysis_tool.caching.benchmark", "main"),
+            "description": "Benchmark the graph cache generation."
+        },
         "time_series_analysis": {
             "launch": ("ip_analysis_tool.time_series_analysis", "main"),
             "description": "Gather data into a CSV file."
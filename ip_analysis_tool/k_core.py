@@ -1,4 +1,5 @@
 from typing import TypedDict
+import numpy as np
 from graph_tool import Graph, VertexPropertyMap
 
 from collections import defaultdict
@@ -6,6 +7,8 @@ from collections import defaultdict
 from ip_analysis_tool.util.graph_getter import get_graph_by_date
 from .util.date_util import get_date_string
 
+# Version of the stored k-core decompositions, has to be increased whenever k_core_decomposition() gives different results
+K_CORE_VERSION = 1
 
 class KCoreDecompositionResult(TypedDict):
     """
@@ -31,25 +34,32 @@ class KCoreDecompositionMetadata(TypedDict):
     decomposition: list[KCoreDecompositionMetadataEntry]
 
 
-def k_core_decomposition(g: Graph) -> KCoreDecompositionResult:
+def compute_k_core(g: Graph) -> dict:
     """
-    Perform k-core decomposition on the given graph.
-    :param g: The graph to perform k-core decomposition on. (graph_tool.Graph)
-    :return: (dict) A dictionary containing the input graph, the k-core decomposition, and the maximum k-core value. (KCoreDecompositionResult)
+    Computes the k-core of each vertex of the given graph, see k_core_decomposition().
+    :param g: The graph. (graph_tool.Graph)
+    :return: The k-cores indexed by the vertex index, as a result of the derived results cache. (ip_analysis_tool.caching.derived_cache.DerivedResult)
     """
     from .util.graph_manipulation import remove_reciprocal_edges
     from graph_tool.all import kcore_decomposition
     # Do k-core decomposition on a version of the graph without reciprocal
     # edges
     tmp_g = remove_reciprocal_edges(g)
-    k_core_prop = kcore_decomposition(tmp_g)
-    groups = defaultdict(list)
-    max_k = 0
-    for v in g.vertices():
-        k = k_core_prop[v]
-        groups[k].append(g.vp.ip[v])
-        if k > max_k:
-            max_k = k
+    return {"arrays": {"k_core": np.array(kcore_decomposition(tmp_g).a)}, "scalars": {}}
+
+
+def k_core_decomposition(g: Graph, cache: bool = True) -> KCoreDecompositionResult:
+    """
+    Perform k-core decomposition on the given graph.
+    :param g: The graph to perform k-core decomposition on. (graph_tool.Graph)
+    :param cache: Reuse the decomposition stored by a previous run for the same cached graph, see ip_analysis_tool.caching.derived_cache. (bool)
+    :return: (dict) A dictionary containing the input graph, the k-core decomposition, and the maximum k-core value. (KCoreDecompositionResult)
+    """
+    from .caching.derived_cache import get_derived_result
+    result = get_derived_result(g, "k_core", K_CORE_VERSION, {}, compute_k_core, cache)
+    k_core_prop = g.new_vertex_property("int")
+    k_core_prop.a = result["arrays"]["k_core"]
+    max_k = int(k_core_prop.a[g.get_vertices()].max()) if g.num_vertices() > 0 else 0
     return {
         "graph": g,
         "k_core_decomposition": k_core_prop,
@@ -161,7 +171,8 @@ def main(args=None):
         get_graph_by_date(
             args.date,
             weighted_edges=args.weighted_edges,
-            time_interval=TimeInterval[args.interval]))
+            time_interval=TimeInterval[args.interval],
+            properties=[]))
     if args.visualize:
         from .visualize.graph import visualize_graph
         visualize_graph(get_k_core(data, int(data["max_k"]) if not args.k else int(args.k)),
@@ -15,15 +15,14 @@ def paths_on_subgraph(subgraph: Graph, graph: Graph) -> PathsOnSubgraphResult:
     :param graph: Input graph.
     :return: A dict containing the count of routes in the subgraph, the count of routes in the original graph, and the ratio of the two.
     """
-    from graph_tool.util import find_vertex
-    subgraph_routes = set()
-    for v in subgraph.vertices():
-        subgraph_routes.update(subgraph.vp.routes[v])
-    original_routes_count = len(graph.vp.routes[
-        list(find_vertex(graph, graph.vp.position_in_route, 1))[0]
-    ])
+    import numpy as np
+    from .util.graph_getter import get_ragged_property
+    # Vertices of a subgraph view keep their indices from the original graph
+    routes = get_ragged_property(graph, "routes")
+    subgraph_routes_count = len(np.unique(routes.gather(subgraph.vertices())))
+    original_routes_count = len(np.unique(routes.values))
     return {
-        "subgraph_routes_count": len(subgraph_routes),
+        "subgraph_routes_count": subgraph_routes_count,
         "original_routes_count": original_routes_count,
-        "ratio": len(subgraph_routes) / original_routes_count
+        "ratio": subgraph_routes_count / original_routes_count
     }
@@ -9,10 +9,10 @@ def ping_topology_latency_correlation(time_interval: TimeInterval, verbose : boo
     :return: Dataframe containing the average latency from topology, ping and their ratios for each date.
     """
     from ..util.date_util import get_cache_date_range
-    from ..util.graph_getter import get_graph_by_date
-    from ..util.date_util import iterate_range, get_date_string
+    from ..util.graph_getter import iter_graphs
+    from ..util.date_util import get_date_string
     from ..util.database_util import connect_to_remote_db
-    range = get_cache_date_range(time_interval)
+    range = get_cache_date_range(time_interval=time_interval)
     conn, cur = connect_to_remote_db()
     
     dates = []
@@ -20,8 +20,13 @@ def ping_topology_latency_correlation(time_interval: TimeInterval, verbose : boo
     ping_latencies = []
     ratios = []
     
-    for start, end in iterate_range(range[0], range[1], time_interval):
-        g = get_graph_by_date(start, time_interval=time_interval)
+    # The following graphs are loaded while the database is queried
+    for entry in iter_graphs(range[0], range[1], time_interval, properties=["avg_distance", "position_in_route"], copy=False):
+        start, end, g = entry["start"], entry["end"], entry["graph"]
+        if g is None:
+            if verbose:
+                print("{} {}: {}".format(str(time_interval), get_date_string(start), "no cached graph" if entry["missing"] else entry["error"]))
+            continue
         # Get the avg latency data for the endpoints
         latencies = [g.vp["avg_distance"][v] for v in g.vertices() if g.vp.position_in_route[v] == 2]
         avg_latency = (sum(latencies) / len(latencies)) if len(latencies) > 0 else 0
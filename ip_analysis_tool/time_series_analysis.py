@@ -6,28 +6,258 @@
 # K-core:
 # - individual k-core sizes
 # - maximum k-core size
+import os
 import numpy as np
 import pandas as pd
 from typing import TypedDict, Optional
 from .enums import TimeInterval
 
+# Version of the per-interval results, has to be increased whenever the metrics change, so the stored results aren't reused
+TIME_SERIES_VERSION = 3
 
 class TimeSeriesAnalysisEntry(TypedDict):
+    """
+    Result of a single interval of the time series analysis.
+    :param i: Index of the interval. (int)
+    :param values: Dict of the output columns of the computed metrics mapped to their values, None if the interval has no graph. (dict)
+    """
     i: int
-    diameter_ms: Optional[float]
-    diameter: Optional[int]
-    pseudo_diameter_ms: Optional[float]
-    pseudo_diameter: Optional[int]
-    num_vertices: Optional[int]
-    num_edges: Optional[int]
-    radius_ms: Optional[float]
-    radius: Optional[int]
-    max_k_core: Optional[int]
-    max_k_core_size: Optional[int]
-    average_endpoint_distance_ms: Optional[float]
-    average_endpoint_distance: Optional[int]
-    k_core: np.ndarray
-    distances: np.ndarray
+    values: Optional[dict]
+
+
+class Metric(TypedDict):
+    """
+    A metric of the time series analysis, see METRICS.
+    :param description: Short description for the command line help. (str)
+    :param dependencies: Names of the intermediates shared by the metrics (see INTERMEDIATES) the metric uses. (list)
+    :param properties: Names of the graph properties the metric reads, only the properties of the computed metrics are loaded. (list)
+    :param columns: Function returning the list of the (name, dtype) output columns of the metric for the parameters of the analysis. (function)
+    :param compute: Function computing the dict of the values of the columns from a MetricContext. (function)
+    """
+    description: str
+    dependencies: list
+    properties: list
+    columns: object
+    compute: object
+
+
+class MetricContext:
+    """
+    Graph of an interval being analyzed, the intermediates shared by the metrics are computed once, on first use.
+    """
+    def __init__(self, graph, date, time_interval: TimeInterval, weighted_edges: bool, parameters: dict):
+        """
+        :param graph: The graph of the interval. (graph_tool.Graph)
+        :param date: First day of the interval.
+        :param time_interval: Time interval of the graph.
+        :param weighted_edges: Whether the graph has weighted edges.
+        :param parameters: Parameters of the analysis, max_k_core_data and max_distance_data.
+        """
+        self.graph = graph
+        self.date = date
+        self.time_interval = time_interval
+        self.weighted_edges = weighted_edges
+        self.parameters = parameters
+        self.intermediates = {}
+
+    def get(self, name: str):
+        """
+        Returns an intermediate, computing it if it wasn't computed yet.
+        :param name: Name of the intermediate, one of INTERMEDIATES.
+        :return: The intermediate.
+        """
+        if name not in self.intermediates:
+            self.intermediates[name] = INTERMEDIATES[name](self)
+        return self.intermediates[name]
+
+    def label(self) -> str:
+        """
+        :return: Name of the interval for the messages, e.g. week 2021-01-04.
+        """
+        from .util.date_util import get_date_string
+        return f"{str(self.time_interval).lower()} {get_date_string(self.date)}"
+
+
+def count_values(values: np.ndarray, size: int, name: str) -> np.ndarray:
+    """
+    Counts the occurrences of each value of a vertex property, e.g. the number of vertices in each k-core.
+    Values which don't fit into the histogram are counted in its last bucket and reported, instead of failing the whole interval.
+    :param values: Non-negative integer values of the vertices.
+    :param size: Number of the buckets of the histogram.
+    :param name: Name of the values in the report.
+    :return: Array of the counts of the values 0 to size - 1.
+    """
+    counts = np.bincount(values, minlength=size)
+    if len(counts) > size:
+        print(f"{name}: {int(counts[size:].sum())} vertices with values up to {len(counts) - 1} counted as {size - 1}")
+        counts[size - 1] += counts[size:].sum()
+        counts = counts[:size]
+    return counts
+
+
+def get_undirected_view(context: MetricContext):
+    """
+    :return: Undirected view of the graph, the graph isn't copied. (graph_tool.GraphView)
+    """
+    from graph_tool import GraphView
+    return GraphView(context.graph, directed=False)
+
+
+def get_k_core_decomposition(context: MetricContext):
+    """
+    :return: K-core decomposition of the graph, computed on the graph without the reciprocal edges. (ip_analysis_tool.k_core.KCoreDecompositionResult)
+    """
+    from .k_core import k_core_decomposition
+    return k_core_decomposition(context.graph)
+
+
+# Intermediates shared by the metrics, each maps a MetricContext to its value
+INTERMEDIATES = {
+    "undirected": get_undirected_view,
+    "k_core": get_k_core_decomposition,
+}
+
+
+def compute_diameter(context: MetricContext) -> dict:
+    from .util.diameter import ifub_diameter
+    g = context.get("undirected")
+    return {
+        "diameter_ms": ifub_diameter(g, g.ep.min_weight)["diameter"] if context.weighted_edges else 0,
+        "diameter": int(ifub_diameter(g)["diameter"]),
+    }
+
+
+def compute_pseudo_diameter(context: MetricContext) -> dict:
+    from .util.diameter import multi_sweep_diameter
+    g = context.get("undirected")
+    return {
+        "pseudo_diameter_ms": multi_sweep_diameter(g, g.ep.min_weight)["diameter"] if context.weighted_edges else 0,
+        "pseudo_diameter": int(multi_sweep_diameter(g)["diameter"]),
+    }
+
+
+def compute_size(context: MetricContext) -> dict:
+    return {"num_edges": context.graph.num_edges(), "num_vertices": context.graph.num_vertices()}
+
+
+def compute_radius(context: MetricContext) -> dict:
+    return {
+        "radius_ms": float(context.graph.vp.min_distance.a.max()),
+        "radius": int(context.graph.vp.hop_distance.a.max()),
+    }
+
+
+def compute_k_core(context: MetricContext) -> dict:
+    k_core_data = context.get("k_core")
+    max_k_core = k_core_data["max_k"]
+    return {
+        "max_k_core": max_k_core,
+        "max_k_core_size": int(np.count_nonzero(k_core_data["k_core_decomposition"].a == max_k_core)),
+    }
+
+
+def compute_endpoint_distance(context: MetricContext) -> dict:
+    from json import loads
+    metadata = loads(context.graph.gp.metadata)
+    return {
+        "average_endpoint_distance": metadata["avg_endpoint_distance"],
+        "average_endpoint_distance_ms": metadata["avg_endpoint_distance_ms"],
+    }
+
+
+def compute_distances(context: MetricContext) -> dict:
+    counts = count_values(context.graph.vp.hop_distance.a, context.parameters["max_distance_data"], f"{context.label()} hop distances")
+    return {f"{k}-distance": int(count) for k, count in enumerate(counts)}
+
+
+def compute_k_core_sizes(context: MetricContext) -> dict:
+    counts = count_values(context.get("k_core")["k_core_decomposition"].a, context.parameters["max_k_core_data"], f"{context.label()} k-cores")
+    # Every vertex is in the 0-core, it isn't reported
+    return {f"{k}-core": int(counts[k]) for k in range(1, len(counts))}
+
+
+# Metrics of the time series analysis in the order of their output columns
+METRICS = {
+    "diameter": {
+        "description": "exact diameter of the undirected graph in hops, and in milliseconds for the graphs with weighted edges (diameter, diameter_ms), the largest distance within a connected component. "
+                       "Computed by the iFUB algorithm, usually with a small number of searches but slower on large graphs.",
+        "dependencies": ["undirected"],
+        "properties": ["min_weight"],
+        "columns": lambda parameters: [("diameter_ms", float), ("diameter", int)],
+        "compute": compute_diameter,
+    },
+    "pseudo_diameter": {
+        "description": "lower bound of the diameter by a few sweeps of searches from the farthest vertices, often exact (pseudo_diameter, pseudo_diameter_ms)",
+        "dependencies": ["undirected"],
+        "properties": ["min_weight"],
+        "columns": lambda parameters: [("pseudo_diameter_ms", float), ("pseudo_diameter", int)],
+        "compute": compute_pseudo_diameter,
+    },
+    "size": {
+        "description": "number of edges and vertices (num_edges, num_vertices)",
+        "dependencies": [],
+        "properties": [],
+        "columns": lambda parameters: [("num_edges", int), ("num_vertices", int)],
+        "compute": compute_size,
+    },
+    "radius": {
+        "description": "largest latency and hop distance of the vertices from the start (radius_ms, radius)",
+        "dependencies": [],
+        "properties": ["min_distance", "hop_distance"],
+        "columns": lambda parameters: [("radius_ms", float), ("radius", int)],
+        "compute": compute_radius,
+    },
+    "k_core": {
+        "description": "largest k of the k-core decomposition and the size of its k-core (max_k_core, max_k_core_size)",
+        "dependencies": ["k_core"],
+        "properties": [],
+        "columns": lambda parameters: [("max_k_core", int), ("max_k_core_size", int)],
+        "compute": compute_k_core,
+    },
+    "endpoint_distance": {
+        "description": "average distance of the endpoints of the routes from the graph metadata (average_endpoint_distance, average_endpoint_distance_ms)",
+        "dependencies": [],
+        "properties": [],
+        "columns": lambda parameters: [("average_endpoint_distance", int), ("average_endpoint_distance_ms", float)],
+        "compute": compute_endpoint_distance,
+    },
+    "distances": {
+        "description": "number of vertices at each hop distance (0-distance, 1-distance, ...)",
+        "dependencies": [],
+        "properties": ["hop_distance"],
+        "columns": lambda parameters: [(f"{k}-distance", int) for k in range(parameters["max_distance_data"])],
+        "compute": compute_distances,
+    },
+    "k_core_sizes": {
+        "description": "number of vertices in each k-core (1-core, 2-core, ...)",
+        "dependencies": ["k_core"],
+        "properties": [],
+        "columns": lambda parameters: [(f"{k}-core", int) for k in range(1, parameters["max_k_core_data"])],
+        "compute": compute_k_core_sizes,
+    },
+}
+
+# Metrics computed unless others are selected
+DEFAULT_METRICS = [name for name in METRICS if name not in ("diameter", "pseudo_diameter")]
+# Metrics whose columns are always in the output, 0 unless the metric is selected, the same as before the metrics were selectable
+ALWAYS_OUTPUT_METRICS = ["diameter"]
+# Metrics whose columns follow the time_interval column
+TRAILING_METRICS = ["distances", "k_core_sizes"]
+
+
+def resolve_metrics(metrics=None, diameter=False) -> list:
+    """
+    Validates the selected metrics and orders them by their output columns.
+    :param metrics: Names of the metrics, see METRICS. None selects DEFAULT_METRICS.
+    :param diameter: Also select the diameter metric.
+    :return: List of the names of the metrics.
+    """
+    selected = set(metrics if metrics is not None else DEFAULT_METRICS)
+    unknown = selected.difference(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}. Possible values: {', '.join(METRICS)}")
+    if diameter: selected.add("diameter")
+    return [name for name in METRICS if name in selected]
 
 
 def process_date(
@@ -38,7 +268,9 @@ def process_date(
         time_interval: TimeInterval = TimeInterval.WEEK,
         max_k_core_data: int = 100,
         max_distance_data: int = 65,
-        diameter=False
+        diameter=False,
+        snapshots=False,
+        metrics=None
 ) -> TimeSeriesAnalysisEntry:
     """
     Process a single date for the time series analysis.
@@ -46,106 +278,65 @@ def process_date(
     :param date: Date of the interval to process. It should point to the first day of the given interval.
     :param verbose: Verbose output on stdout.
     :param weighted_edges: Whether to use graphs with weighted edges. This will add additional data to the output, such as weighted diameter, but the accuracy is questionable given the much lower amount of the data.
-    :return: A tuple containing the index of the interval, the diameter of the network, the number of vertices, the number of edges, the radius of the network, and the sizes of the k-cores.
+    :param diameter: Also compute the diameter metric.
+    :param snapshots: Read the graph from its memory-mapped snapshot, which the worker processes share, instead of keeping a copy of the graph in each of them.
+    :param metrics: Names of the metrics to compute, see METRICS. None computes DEFAULT_METRICS. Only the graph properties and the intermediates of these metrics are loaded and computed.
+    :return: The values of the output columns of the metrics, see TimeSeriesAnalysisEntry.
     """
-    from .util.graph_getter import get_graph_by_date
-    from .util.calculations import calculate_diameter
+    from .util.graph_getter import get_graph_by_date, get_snapshot_by_date
     from .util.date_util import get_date_string
-    from .k_core import k_core_decomposition
-    from json import loads
 
+    metrics = resolve_metrics(metrics, diameter)
+    properties = sorted({name for metric in metrics for name in METRICS[metric]["properties"]})
     try:
-        current_graph = get_graph_by_date(
-            date,
-            weighted_edges=weighted_edges,
-            time_interval=time_interval)
-    except KeyError:
-        return TimeSeriesAnalysisEntry(
-            i=i,
-            diameter_ms=None,
-            diameter=None,
-            num_vertices=None,
-            num_edges=None,
-            radius_ms=None,
-            radius=None,
-            k_core=np.zeros(max_k_core_data, dtype=int),
-            distances=np.zeros(max_distance_data, dtype=int),
-            max_k_core=None,
-            max_k_core_size=None,
-            average_endpoint_distance=None,
-            average_endpoint_distance_ms=None
-        )
-    k_core_data = k_core_decomposition(current_graph)
-
-    if current_graph:
-        # Calculate the diameter
-        if diameter:
-            if weighted_edges:
-                diameter = calculate_diameter(
-                    current_graph, current_graph.gp.min_weight)
-            else:
-                diameter = 0
-            diameter_vertices = calculate_diameter(current_graph)
-        # If we don't want the diameter, set it to 0
+        if snapshots:
+            snapshot = get_snapshot_by_date(date, weighted_edges, time_interval)
+            current_graph = snapshot.to_graph(properties) if snapshot is not None else None
         else:
-            diameter = 0
-            diameter_vertices = 0
-
-        radius_ms = max([current_graph.vp.min_distance[v]
-                        for v in current_graph.vertices()])
-        radius = max([current_graph.vp.hop_distance[v]
-                     for v in current_graph.vertices()])
-
-        # Count vertices and edges
-        vertices = current_graph.num_vertices()
-        edges = current_graph.num_edges()
-
-        # Process k-cores and distances
-        local_k_core_sizes = np.zeros(max_k_core_data, dtype=int)
-        local_distances = np.zeros(max_distance_data, dtype=int)
-        for v in current_graph.vertices():
-            k = k_core_data["k_core_decomposition"][v]
-            local_k_core_sizes[k] += 1
-            distance = current_graph.vp.hop_distance[v]
-            local_distances[distance] += 1
-
-        max_k_core = k_core_data["max_k"]
-        max_k_core_size = int(local_k_core_sizes[max_k_core])
-
-        if verbose:
-            print(str(time_interval) + " " + get_date_string(date) + " done")
-
-        return TimeSeriesAnalysisEntry(
-            i=i,
-            diameter_ms=diameter,
-            diameter=int(diameter_vertices),
-            num_vertices=vertices,
-            num_edges=edges,
-            radius_ms=radius_ms,
-            radius=radius,
-            k_core=local_k_core_sizes,
-            distances=local_distances,
-            max_k_core=max_k_core,
-            max_k_core_size=max_k_core_size,
-            average_endpoint_distance=loads(
-                current_graph.gp.metadata)["avg_endpoint_distance"],
-            average_endpoint_distance_ms=loads(
-                current_graph.gp.metadata)["avg_endpoint_distance_ms"])
-    return TimeSeriesAnalysisEntry(
-        i=i,
-        diameter_ms=None,
-        diameter=None,
-        num_vertices=None,
-        num_edges=None,
-        radius_ms=None,
-        radius=None,
-        k_core=np.zeros(max_k_core_data, dtype=int),
-        distances=np.zeros(max_distance_data, dtype=int),
-        max_k_core=None,
-        max_k_core_size=None,
-        average_endpoint_distance=None,
-        average_endpoint_distance_ms=None
-    )
+            current_graph = get_graph_by_date(
+                date,
+                weighted_edges=weighted_edges,
+                time_interval=time_interval,
+                properties=properties)
+    except KeyError:
+        current_graph = None
+    if not current_graph:
+        return TimeSeriesAnalysisEntry(i=i, values=None)
+
+    context = MetricContext(current_graph, date, time_interval, weighted_edges, {"max_k_core_data": max_k_core_data, "max_distance_data": max_distance_data})
+    values = {}
+    for metric in metrics:
+        values.update(METRICS[metric]["compute"](context))
+
+    if verbose:
+        print(str(time_interval) + " " + get_date_string(date) + " done")
+    return TimeSeriesAnalysisEntry(i=i, values=values)
+
+
+# Estimated memory of the analysis of a graph, per vertex and edge of the graph. Covers the loaded properties and the intermediates (k-core decomposition, distance arrays)
+ANALYSIS_BYTES_PER_VERTEX = 256
+ANALYSIS_BYTES_PER_EDGE = 128
+# Estimated ratio of the memory of a loaded graph to the size of its file, for the graphs without a summary in the manifest
+GRAPH_FILE_EXPANSION = 8
+# Estimated memory of a worker process without a graph (interpreter and graph_tool)
+WORKER_MEMORY = 256 << 20
+
+
+def estimate_task_memory(source: dict, summary: dict = None, snapshots=False) -> int:
+    """
+    Estimates the peak memory of process_date() for a graph.
+    :param source: State of the graph file, see ip_analysis_tool.util.interval_results.get_source_state(). None if the graph doesn't exist.
+    :param summary: Summary of the graph from the manifest, the vertex and edge counts are used if given. (ip_analysis_tool.caching.manifest.GraphSummary)
+    :param snapshots: Whether the graph is read from a memory-mapped snapshot, which only counts half, as its pages are shared and can be dropped.
+    :return: Estimated number of bytes.
+    """
+    if summary is not None:
+        size = ANALYSIS_BYTES_PER_VERTEX * summary["num_vertices"] + ANALYSIS_BYTES_PER_EDGE * summary["num_edges"]
+    elif source is not None:
+        size = GRAPH_FILE_EXPANSION * source["size"]
+    else:
+        size = 0
+    return WORKER_MEMORY + (size // 2 if snapshots else size)
 
 
 def time_series_analysis(
@@ -156,7 +347,11 @@ def time_series_analysis(
         time_interval: TimeInterval = TimeInterval.WEEK,
         max_k_core_data: int = 100,
         max_distance_data: int = 65,
-        diameter=False
+        diameter=False,
+        snapshots=False,
+        update=False,
+        metrics=None,
+        memory_limit=None
 ) -> pd.DataFrame:
     """
     Generate metrics from graph data.
@@ -168,13 +363,24 @@ def time_series_analysis(
     :param max_k_core_data: The maximum number of kcore decomposition results to return.
     :param max_distance_data: The maximum number of distance data points to return.
     :param diameter: Whether to calculate diameter metrics. Default is False.
-    :return:
+    :param snapshots: Read the graphs from their memory-mapped snapshots, see process_date(). Default is False.
+    :param update: Reuse the stored results of the intervals whose graph files haven't changed since they were processed, only the new and changed intervals are processed.
+    The results of every processed interval are stored per metric, see ip_analysis_tool.util.interval_results. Default is False.
+    :param metrics: Names of the metrics to compute, see METRICS. None computes DEFAULT_METRICS.
+    :param memory_limit: Memory budget of the processed intervals, e.g. 12G, see estimate_task_memory(). Fewer than max_threads intervals run at once if their graphs don't fit.
+    None only limits the number of the threads. The intervals which run out of memory are retried with fewer threads in either case.
+    :return: Dataframe with the date, the columns of the metrics and the time interval of each interval, the columns of the distances and the k-cores follow the time interval.
+    The diameter columns are always included, 0 unless the diameter is selected. The columns of the intervals without a graph, or whose processing failed, are 0.
     """
     from .util.date_util import iterate_range, get_date_string, get_date_object, get_cache_date_range
-    import concurrent.futures
+    from .util.graph_getter import get_graph_path
+    from .util.interval_results import get_results_folder, get_source_state, load_interval_result, save_interval_result
+    from .util.memory_util import parse_size
+    from .util.task_scheduler import ScheduledTask, run_scheduled
     from functools import partial
 
-    graph_date_range = get_cache_date_range()
+    metrics = resolve_metrics(metrics, diameter)
+    graph_date_range = get_cache_date_range(weighted_edges, time_interval)
     dates = [
         date[0] for date in iterate_range(
             graph_date_range[0],
@@ -199,100 +405,118 @@ def time_series_analysis(
         print(f"Processing {all_dates_count} dates")
 
     # Initialize data arrays
-    network_diameters_in_ms = np.zeros(all_dates_count, dtype=float)
-    network_diameters_in_vertices = np.zeros(all_dates_count, dtype=int)
-    num_vertices = np.zeros(all_dates_count, dtype=int)
-    num_edges = np.zeros(all_dates_count, dtype=int)
-    radii_ms = np.zeros(all_dates_count, dtype=float)
-    radii = np.zeros(all_dates_count, dtype=int)
-    k_core_sizes = np.zeros((all_dates_count, max_k_core_data), dtype=int)
-    distances = np.zeros((all_dates_count, max_distance_data), dtype=int)
-    max_k_cores = np.zeros(all_dates_count, dtype=int)
-    max_k_core_sizes = np.zeros(all_dates_count, dtype=int)
-    avg_endpoint_distances = np.zeros(all_dates_count, dtype=int)
-    avg_endpoint_distances_ms = np.zeros(all_dates_count, dtype=float)
-
-    # Use ProcessPoolExecutor to process dates in parallel
-    with concurrent.futures.ProcessPoolExecutor(max_workers=max_threads) as executor:
-        # Create a partial function with some fixed parameters
-        worker = partial(
-            process_date,
-            verbose=verbose,
-            weighted_edges=weighted_edges,
-            time_interval=time_interval,
-            max_k_core_data=max_k_core_data,
-            diameter=diameter)
-
-        # Submit all tasks and map them to their date index
-        future_to_idx = {
-            executor.submit(
-                worker,
-                i,
-                all_dates[i]): i for i in range(all_dates_count)}
-
-        # Process results as they complete
-        for future in concurrent.futures.as_completed(future_to_idx):
-            try:
-                result = future.result()
-                i = result["i"]
-                diameter = result["diameter_ms"]
-                diameter_vertices = result["diameter"]
-                vertices = result["num_vertices"]
-                edges = result["num_edges"]
-                current_radius_ms = result["radius_ms"]
-                current_radius = result["radius"]
-                k_core = result["k_core"]
-                current_distances = result["distances"]
-                max_k_core = result["max_k_core"]
-                max_k_core_size = result["max_k_core_size"]
-                avg_endpoint_distance = result["average_endpoint_distance"]
-                avg_endpoint_distance_ms = result["average_endpoint_distance_ms"]
-
-                if diameter is not None:
-                    network_diameters_in_ms[i] = diameter
-                    network_diameters_in_vertices[i] = diameter_vertices
-                    num_vertices[i] = vertices
-                    num_edges[i] = edges
-                    radii_ms[i] = current_radius_ms
-                    radii[i] = current_radius
-                    k_core_sizes[i] = k_core
-                    distances[i] = current_distances
-                    max_k_cores[i] = max_k_core
-                    max_k_core_sizes[i] = max_k_core_size
-                    avg_endpoint_distances[i] = avg_endpoint_distance
-                    avg_endpoint_distances_ms[i] = avg_endpoint_distance_ms
-
-            except Exception as e:
-                print(f"Error processing date: {e}")
-
-    date_strings = [get_date_string(date) for date in all_dates]
-    data = {
-        "date": date_strings,
-        "diameter_ms": network_diameters_in_ms,
-        "diameter": network_diameters_in_vertices,
-        "num_edges": num_edges,
-        "num_vertices": num_vertices,
-        "radius_ms": radii_ms,
-        "radius": radii,
-        "max_k_core": max_k_cores,
-        "max_k_core_size": max_k_core_sizes,
-        "average_endpoint_distance": avg_endpoint_distances,
-        "average_endpoint_distance_ms": avg_endpoint_distances_ms,
-        "time_interval": str(time_interval),
-    }
+    parameters = {"max_k_core_data": max_k_core_data, "max_distance_data": max_distance_data}
+    output_metrics = [name for name in METRICS if name in metrics or name in ALWAYS_OUTPUT_METRICS]
+    columns = {metric: METRICS[metric]["columns"](parameters) for metric in output_metrics}
+    data_arrays = {name: np.zeros(all_dates_count, dtype=dtype) for metric in output_metrics for name, dtype in columns[metric]}
 
-    # Add distance columns properly
-    for k in range(max_distance_data):
-        data[f"{k}-distance"] = [distances[i][k]
-                                 for i in range(all_dates_count)]
-    # Add k-core columns properly
-    for k in range(1, max_k_core_data):
-        data[f"{k}-core"] = [k_core_sizes[i][k]
-                             for i in range(all_dates_count)]
+    def record(i: int, values: dict):
+        """
+        Adds the values of an interval to the data arrays.
+        """
+        for name, value in values.items():
+            data_arrays[name][i] = value
 
+    # Results are stored per interval and metric, along with the state of the graph file they were computed from
+    results_folders = {metric: get_results_folder(f"time_series_{metric}", TIME_SERIES_VERSION, parameters, weighted_edges, time_interval) for metric in metrics}
+    sources = [get_source_state(get_graph_path(date, weighted_edges, time_interval)) for date in all_dates]
+    pending = {}
+    for i in range(all_dates_count):
+        for metric in metrics:
+            stored = load_interval_result(results_folders[metric], get_date_string(all_dates[i]), sources[i]) if update else None
+            if stored is None:
+                pending.setdefault(i, []).append(metric)
+            else:
+                record(i, stored)
+    if verbose and update:
+        print(f"{all_dates_count - len(pending)} of {all_dates_count} dates are up to date")
+
+    # The largest graphs are processed first, as many at once as the memory limit allows
+    summaries = {}
+    if memory_limit is not None:
+        from .util.graph_getter import get_graph_summaries
+        summaries = {summary["path"]: summary for summary in get_graph_summaries(weighted_edges, time_interval)}
+    worker = partial(
+        process_date,
+        verbose=verbose,
+        weighted_edges=weighted_edges,
+        time_interval=time_interval,
+        max_k_core_data=max_k_core_data,
+        max_distance_data=max_distance_data,
+        snapshots=snapshots)
+    # Only the metrics which aren't up to date are computed
+    tasks = []
+    for i, pending_metrics in pending.items():
+        path = get_graph_path(all_dates[i], weighted_edges, time_interval)
+        tasks.append(ScheduledTask(key=i, args=(i, all_dates[i]), kwargs={"metrics": pending_metrics},
+                                   memory=estimate_task_memory(sources[i], summaries.get(path), snapshots)))
+
+    failed = []
+    for outcome in run_scheduled(worker, tasks, max_threads, parse_size(memory_limit) if memory_limit is not None else None, verbose):
+        i = outcome["key"]
+        if outcome["error"] is not None:
+            print(f"Error processing date {get_date_string(all_dates[i])}: {outcome['error']}")
+            failed.append(get_date_string(all_dates[i]))
+            continue
+        result = outcome["result"]
+        # Intervals without a graph aren't stored, their graph may be generated later
+        if result["values"] is None: continue
+        record(i, result["values"])
+        if sources[i] is not None:
+            for metric in pending[i]:
+                save_interval_result(results_folders[metric], get_date_string(all_dates[i]), sources[i],
+                                     {name: result["values"][name] for name, _ in columns[metric]})
+    if failed:
+        print(f"{len(failed)} dates failed and their metrics are 0: {', '.join(sorted(failed))}")
+
+    data = {"date": [get_date_string(date) for date in all_dates]}
+    for metric in output_metrics:
+        if metric in TRAILING_METRICS and "time_interval" not in data:
+            data["time_interval"] = str(time_interval)
+        data.update({name: data_arrays[name] for name, _ in columns[metric]})
+    data["time_interval"] = str(time_interval)
     return pd.DataFrame(data)
 
 
+def merge_time_series(existing : pd.DataFrame, result : pd.DataFrame) -> pd.DataFrame:
+    """
+    Merges the rows of a time series analysis into an existing output, the rows of the same dates are replaced.
+    :param existing: Output of a previous analysis.
+    :param result: Output of the current analysis.
+    :return: Dataframe with the rows of both, ordered by the date.
+    """
+    existing = existing[~existing["date"].isin(result["date"])]
+    return pd.concat([existing, result], ignore_index=True).sort_values("date", ignore_index=True)
+
+
+def summary_time_series(
+        date_range=None,
+        weighted_edges=False,
+        time_interval: TimeInterval = TimeInterval.WEEK
+) -> pd.DataFrame:
+    """
+    Collect the basic metrics of the cached graphs from the index of the graph cache, without loading the graphs.
+    :param date_range: A range of dates to include. The format is YYYY-MM-DD YYYY-MM-DD. If not specified, all the cached graphs are included.
+    :param weighted_edges: Whether to use graphs with weighted edges.
+    :param time_interval: Time granularity of the graphs.
+    :return: Dataframe with the date, number of vertices and edges, file size, overall trips and average endpoint distances of each graph.
+    """
+    from .util.graph_getter import get_graph_summaries
+    summaries = get_graph_summaries(weighted_edges, time_interval)
+    if date_range:
+        summaries = [summary for summary in summaries if date_range[0] <= summary["date"] <= date_range[1]]
+    return pd.DataFrame({
+        "date": [summary["date"] for summary in summaries],
+        "num_vertices": [summary["num_vertices"] for summary in summaries],
+        "num_edges": [summary["num_edges"] for summary in summaries],
+        "file_size": [summary["file_size"] for summary in summaries],
+        "overall_trips": [summary["metadata"].get("overall_trips") for summary in summaries],
+        "average_endpoint_distance": [summary["metadata"].get("avg_endpoint_distance") for summary in summaries],
+        "average_endpoint_distance_ms": [summary["metadata"].get("avg_endpoint_distance_ms") for summary in summaries],
+        "time_interval": str(time_interval),
+    })
+
+
 def main(args=None):
     from argparse import ArgumentParser
     parser = ArgumentParser()
@@ -331,20 +555,58 @@ def main(args=None):
         "-d",
         "--diameter",
         action="store_true",
-        help="Compute the diameter for the data. Can be computationally (and space) expensive.")
+        help="Compute the exact diameter for the data. Can be computationally expensive on large graphs, pseudo_diameter in --metrics is a faster lower bound. The same as adding diameter to --metrics.")
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        choices=list(METRICS),
+        help="Metrics to compute, only their graph properties are loaded and only their intermediates computed. The diameter columns are always in the output, 0 unless diameter is selected. Default: " + ", ".join(DEFAULT_METRICS) + ". Possible values: "
+             + "; ".join(f"{name}: {metric['description']}" for name, metric in METRICS.items()))
+    parser.add_argument(
+        "-s",
+        "--summary",
+        action="store_true",
+        help="Only output the basic metrics (vertices, edges, trips, endpoint distances) read from the index of the graph cache, without loading the graphs.")
+    parser.add_argument(
+        "-m",
+        "--mmap",
+        action="store_true",
+        help="Read the graphs from memory-mapped snapshots shared by the threads instead of loading a copy in each of them (see graph_cache snapshot). Reduces the memory usage of --threads.")
+    parser.add_argument(
+        "-u",
+        "--update",
+        action="store_true",
+        help="Only process the intervals whose graphs are new or changed since they were last processed, the stored results of the others are reused. "
+             "The rows are merged into the existing output, the rows of other dates are kept.")
+    parser.add_argument(
+        "--memory-limit",
+        help="Memory budget of the intervals processed at once, e.g. 12G. The intervals are estimated from the vertex and edge counts in the manifest, or from the graph file size, "
+             "and the largest are processed first. Without it only --threads limits the intervals processed at once.")
     if args is None:
         args = parser.parse_args()
     else:
         args = parser.parse_args(args)
     print(args.range)
     time_interval = TimeInterval[args.interval.upper()]
+    if args.summary:
+        result = summary_time_series(args.range, args.weighted_edges, time_interval)
+        result.to_csv(args.output, index=False)
+        if args.verbose:
+            print(f"Data saved to {args.output}")
+        return
     result = time_series_analysis(
         args.verbose,
         args.range,
         args.threads,
         args.weighted_edges,
         time_interval,
-        diameter=args.diameter)
+        diameter=args.diameter,
+        snapshots=args.mmap,
+        update=args.update,
+        metrics=args.metrics,
+        memory_limit=args.memory_limit)
+    if args.update and args.output and os.path.exists(args.output):
+        result = merge_time_series(pd.read_csv(args.output), result)
     result.to_csv(args.output, index=False)
     if args.verbose:
         print(f"Data saved to {args.output}")
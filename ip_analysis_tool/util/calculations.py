@@ -24,12 +24,10 @@ def get_h_index(g : Graph, values : VertexPropertyMap) -> int:
 
 def calculate_diameter(graph, weights=None) -> float:
     """
-    Calculate the diameter of a graph.
+    Calculate the diameter of a graph, the largest finite distance between two of its vertices. Uses the iFUB algorithm, see ip_analysis_tool.util.diameter.ifub_diameter().
     :param graph: The graph to calculate the diameter of.
     :param weights: The weights to use for the graph. Default is None, all edges will then have weight of 1.
     :return: The diameter of the graph. (float)
     """
-    from graph_tool.all import shortest_distance
-    from sortedcontainers import SortedSet
-    shortest_distances = shortest_distance(graph, directed=False, weights=weights)
-    return SortedSet(max(shortest_distances[v]) for v in graph.vertices())[-1]
\ No newline at end of file
+    from .diameter import ifub_diameter
+    return ifub_diameter(graph, weights)["diameter"]
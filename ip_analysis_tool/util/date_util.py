@@ -99,6 +99,18 @@ def get_date_object(input: str) -> datetime.date:
     """
     return datetime.datetime.strptime(input, "%Y-%m-%d").date()
 
+def get_cached_graph_files(weighted = False, time_interval : TimeInterval = TimeInterval.WEEK) -> list:
+    """
+    Returns the sorted file names of the cached graphs named by their date, other files in the cache folder (manifest, side-stores) are left out.
+    The folder is always listed, the manifest may not cover the graphs generated before it was introduced.
+    :param weighted: Whether we want graphs with weighted edges or not.
+    :param time_interval: Time interval to adhere to. Default is TimeInterval.WEEK.
+    :return: Sorted list of the file names, e.g. 2021-01-04.gt
+    """
+    from ..caching.manifest import GRAPH_FILE_PATTERN
+    folder = os.path.expanduser(f"~/.cache/IPAnalysisTool/graphs/{str(time_interval).lower()}/{'base' if not weighted else 'weighted'}/")
+    return sorted(f for f in os.listdir(folder) if GRAPH_FILE_PATTERN.match(f))
+
 def get_cache_date_range(weighted = False, time_interval : TimeInterval = TimeInterval.WEEK) -> Tuple[datetime.date, datetime.date]:
     """
     Returns the date range of the graph stored data, by which we mean the earliest and latest date found in the local graph storage.
@@ -106,8 +118,7 @@ def get_cache_date_range(weighted = False, time_interval : TimeInterval = TimeIn
     :param time_interval: Time interval to adhere to. Default is TimeInterval.WEEK.
     :return: The earliest and latest date found in the local graph storage.
     """
-    files = [f for f in os.listdir(os.path.expanduser(f"~/.cache/IPAnalysisTool/graphs/{str(time_interval).lower()}/{'base' if not weighted else 'weighted'}/"))]
-    files.sort()
+    files = get_cached_graph_files(weighted, time_interval)
     first_file = files[0]
     last_file = files[-1]
     return get_date_object(first_file.split(".")[0]), get_date_object(last_file.split(".")[0])
@@ -0,0 +1,166 @@
+from typing import TypedDict, Optional
+import numpy as np
+
+class DiameterResult(TypedDict):
+    """
+    Diameter of a graph, the largest finite distance between two of its vertices (in any of its connected components).
+    :param diameter: Length of the longest shortest path found, the diameter itself if exact. (float)
+    :param upper_bound: Upper bound of the diameter, the same as diameter if exact. (float)
+    :param exact: Whether the diameter is exact, the multi-sweep only gives a lower bound. (bool)
+    :param bfs_count: Number of the single-source shortest path searches run. (int)
+    :param endpoints: Vertex indices of the ends of the longest shortest path found, None for a graph without edges. (tuple)
+    """
+    diameter: float
+    upper_bound: float
+    exact: bool
+    bfs_count: int
+    endpoints: Optional[tuple]
+
+def get_distances(g, source : int, weights = None) -> np.ndarray:
+    """
+    Computes the undirected distances from a vertex, only a single array of the size of the graph is kept.
+    :param g: The graph, possibly a filtered view. (graph_tool.Graph)
+    :param source: Index of the source vertex.
+    :param weights: Edge lengths, e.g. the min_weight edge property. None counts the hops. (graph_tool.EdgePropertyMap)
+    :return: Distances indexed by the vertex index, inf for the unreachable and the filtered vertices.
+    """
+    from graph_tool.all import shortest_distance
+    distances = shortest_distance(g, source=g.vertex(source), weights=weights, directed=False).a
+    unreachable = np.iinfo(distances.dtype).max if np.issubdtype(distances.dtype, np.integer) else np.inf
+    result = np.where(distances == unreachable, np.inf, distances.astype(float))
+    if g.get_vertex_filter()[0] is not None:
+        active = np.zeros(len(result), dtype=bool)
+        active[g.get_vertices()] = True
+        result[~active] = np.inf
+    return result
+
+def get_eccentricity(distances : np.ndarray) -> tuple:
+    """
+    :param distances: Distances from a vertex, see get_distances().
+    :return: A tuple of the largest finite distance and the index of the vertex at that distance.
+    """
+    far = int(np.argmax(np.where(np.isfinite(distances), distances, -1)))
+    return float(distances[far]), far
+
+def get_components(g) -> list:
+    """
+    Splits the vertices of a graph into its connected components, ignoring the edge directions.
+    :param g: The graph. (graph_tool.Graph)
+    :return: List of arrays of the vertex indices of the components with at least two vertices, the largest first.
+    """
+    from graph_tool.all import label_components
+    labels, _ = label_components(g, directed=False)
+    vertices = g.get_vertices()
+    labels = labels.a[vertices]
+    order = np.argsort(labels, kind="stable")
+    components = np.split(vertices[order], np.flatnonzero(np.diff(labels[order])) + 1)
+    return sorted((component for component in components if len(component) > 1), key=len, reverse=True)
+
+def get_start(g, component : np.ndarray) -> int:
+    """
+    :return: The vertex of the component with the highest degree, a good start of the sweeps.
+    """
+    return int(component[np.argmax(g.get_total_degrees(component))])
+
+def sweep(g, start : int, weights, sweeps : int) -> tuple:
+    """
+    Runs repeated sweeps from the start, each sweep searches from the farthest vertex of the previous one, until the found distance stops growing.
+    :return: A tuple of the longest distance found, its endpoints, the distances from both endpoints (None for the second one if it wasn't searched from) and the set of the searched vertices.
+    """
+    source = get_eccentricity(get_distances(g, start, weights))[1]
+    searched = {start}
+    best, endpoints, source_distances, target_distances = -1.0, None, None, None
+    for _ in range(sweeps):
+        distances = get_distances(g, source, weights)
+        searched.add(source)
+        eccentricity, target = get_eccentricity(distances)
+        if endpoints is not None and source == endpoints[1]:
+            target_distances = distances
+        if eccentricity <= best: break
+        best, endpoints, source_distances, target_distances = eccentricity, (source, target), distances, None
+        source = target
+    return best, endpoints, source_distances, target_distances, searched
+
+def combine_results(results : list, bfs_count : int) -> DiameterResult:
+    """
+    Combines the diameters of the components of a graph.
+    """
+    if not results:
+        return {"diameter": 0.0, "upper_bound": 0.0, "exact": True, "bfs_count": bfs_count, "endpoints": None}
+    best = max(results, key=lambda result: result["diameter"])
+    return {
+        "diameter": best["diameter"],
+        "upper_bound": max(result["upper_bound"] for result in results),
+        "exact": all(result["exact"] for result in results),
+        "bfs_count": bfs_count,
+        "endpoints": best["endpoints"],
+    }
+
+def multi_sweep_diameter(g, weights = None, sweeps : int = 4) -> DiameterResult:
+    """
+    Estimates the diameter by repeated sweeps, a lower bound which is often exact on sparse networks. Only a few searches per connected component are run.
+    :param g: The graph, the edge directions are ignored. (graph_tool.Graph)
+    :param weights: Edge lengths, e.g. the min_weight edge property. None counts the hops. (graph_tool.EdgePropertyMap)
+    :param sweeps: Maximum number of the sweeps per component.
+    :return: The lower bound, the upper bound is the trivial bound of twice the eccentricity of the start. (DiameterResult)
+    """
+    results, bfs_count = [], 0
+    for component in get_components(g):
+        if weights is None and results and len(component) - 1 <= max(result["diameter"] for result in results):
+            # The component can't have a longer path than the one already found
+            continue
+        best, endpoints, _, _, searched = sweep(g, get_start(g, component), weights, sweeps)
+        bfs_count += len(searched)
+        # The longest distance is the eccentricity of a vertex, no two vertices are farther than twice that apart
+        upper_bound = 2 * best if weights is not None else min(2 * best, len(component) - 1)
+        results.append({"diameter": best, "upper_bound": upper_bound, "exact": best >= upper_bound, "endpoints": endpoints})
+    return combine_results(results, bfs_count)
+
+def ifub_diameter(g, weights = None, max_bfs : int = None) -> DiameterResult:
+    """
+    Computes the exact diameter by the iFUB algorithm (Crescenzi et al.), in practice with far fewer searches than the number of vertices and in linear memory.
+    A double sweep finds a long path, the search continues from its middle vertex u. The eccentricities of the vertices are then computed in the decreasing order of their distance from u,
+    until the longest distance found is at least twice the distance of the remaining vertices from u, which bounds the distance between any two of them.
+    Works for the hop and, as the bound only needs the triangle inequality, for the non-negative weighted distances.
+    :param g: The graph, the edge directions are ignored. (graph_tool.Graph)
+    :param weights: Non-negative edge lengths, e.g. the min_weight edge property. None counts the hops. (graph_tool.EdgePropertyMap)
+    :param max_bfs: Maximum number of the searches per component. When reached, the diameter is the lower bound found so far and the result isn't exact. None for no limit.
+    :return: The diameter. (DiameterResult)
+    """
+    results, bfs_count = [], 0
+    for component in get_components(g):
+        if weights is None and results and len(component) - 1 <= max(result["diameter"] for result in results):
+            continue
+        lower, endpoints, source_distances, target_distances, searched = sweep(g, get_start(g, component), weights, 2)
+        if target_distances is None:
+            target_distances = get_distances(g, endpoints[1], weights)
+            searched.add(endpoints[1])
+        # The middle vertex of the path found, it lies on a shortest path between its ends
+        on_path = component[np.isclose(source_distances[component] + target_distances[component], lower)]
+        middle = int(on_path[np.argmin(np.abs(source_distances[on_path] - target_distances[on_path]))])
+        del source_distances, target_distances
+        middle_distances = get_distances(g, middle, weights)
+        searched.add(middle)
+        eccentricity, far = get_eccentricity(middle_distances)
+        if eccentricity > lower: lower, endpoints = eccentricity, (middle, far)
+        upper = 2 * eccentricity
+        searches = len(searched)
+        for v in component[np.argsort(-middle_distances[component], kind="stable")]:
+            bound = 2 * middle_distances[v]
+            # Any two of the remaining vertices are at most bound apart
+            if lower >= bound:
+                upper = lower
+                break
+            # The eccentricities of the searched vertices are already known
+            if v in searched: continue
+            if max_bfs is not None and searches >= max_bfs:
+                upper = bound
+                break
+            eccentricity, far = get_eccentricity(get_distances(g, int(v), weights))
+            searches += 1
+            if eccentricity > lower: lower, endpoints = eccentricity, (int(v), far)
+        else:
+            upper = lower
+        bfs_count += searches
+        results.append({"diameter": lower, "upper_bound": max(lower, upper), "exact": upper <= lower, "endpoints": endpoints})
+    return combine_results(results, bfs_count)
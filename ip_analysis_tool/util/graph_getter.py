@@ -1,37 +1,278 @@
 from graph_tool import Graph, load_graph
 import os
 import datetime
+from typing import TypedDict, Optional
 from .date_util import get_parent_week, get_parent_interval, get_date_string
 from ..enums import TimeInterval
 
-def get_graph_by_date(date: datetime.date = None, weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK) -> Graph:
+def get_graph_folder(weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK) -> str:
+    """
+    Returns the folder of the cached graphs of the given time interval and weighting.
+    :param weighted_edges: Whether the graphs have weighted edges. (bool)
+    :param time_interval: Time interval of the graphs. (ip_analysis_tool.enums.TimeInterval)
+    :return: Path to the folder, e.g. ~/.cache/IPAnalysisTool/graphs/week/base (str)
+    """
+    return os.path.expanduser(f"~/.cache/IPAnalysisTool/graphs/{str(time_interval).lower()}/{'base' if not weighted_edges else 'weighted'}")
+
+def get_graph_path(date: datetime.date = None, weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK) -> str:
+    """
+    Returns the path to the cached graph for the interval containing the given date.
+    :param date: The date to get the graph for (can be either datetime.date, or string in format YYYY-MM-DD). Ignored for TimeInterval.ALL. (datetime.date or str)
+    :param weighted_edges: Whether to get the graph with weighted edges. (bool)
+    :param time_interval: Time interval of the graph. (ip_analysis_tool.enums.TimeInterval)
+    :return: Path to the .gt file of the graph. (str)
+    """
+    folder = get_graph_folder(weighted_edges, time_interval)
+    if time_interval == TimeInterval.ALL:
+        return f"{folder}/all.gt"
+    if type(date) != datetime.date:
+        from .date_util import get_date_object
+        date = get_date_object(date)
+    return f"{folder}/{get_date_string(get_parent_interval(date, time_interval=time_interval)[0])}.gt"
+
+def get_source_graph_path(g : Graph) -> str:
+    """
+    Returns the path to the cached graph file a loaded graph comes from, based on its metadata.
+    :param g: A graph loaded from the cache (or a view of it).
+    :return: Path to the .gt file of the graph. (str)
+    """
+    from json import loads
+    metadata = loads(g.gp.metadata)
+    return get_graph_path(metadata["date"], metadata["weighted_edges"], TimeInterval[metadata["time_interval"].upper()])
+
+def get_ragged_property(g : Graph, name : str, kind : str = "vertex"):
+    """
+    Returns a ragged property of a cached graph, e.g. the route indices of each vertex. The ragged properties are stored in a side-store next to the graph file, so they are only loaded on demand.
+    :param g: A graph loaded from the cache (or a view of it).
+    :param name: Name of the property: routes or distance_histogram_bins/_counts for vertices; routes or weight_histogram_bins/_counts for edges. (str)
+    :param kind: Either vertex or edge. (str)
+    :return: The property, its item i holds the values of the vertex/edge with the index i. (ip_analysis_tool.caching.graph_store.RaggedProperty)
+    """
+    from ..caching.graph_store import RaggedProperty, load_ragged_property
+    # Graphs generated before the side-store was introduced hold the lists in vector properties
+    properties = g.vp if kind == "vertex" else g.ep
+    if name in properties:
+        return RaggedProperty.from_property_map(properties[name], g.vertices() if kind == "vertex" else g.edges())
+    return load_ragged_property(get_source_graph_path(g), name, kind)
+
+def get_latency_statistics(g : Graph, kind : str = "vertex"):
+    """
+    Returns the latency statistics of a cached graph: the vertex distances or the edge weights (only in graphs with weighted edges).
+    :param g: A graph loaded from the cache, generated with the latency statistics.
+    :param kind: Either vertex or edge. (str)
+    :return: The statistics, its item i belongs to the vertex/edge with the index i. (ip_analysis_tool.caching.latency_stats.LatencyStatistics)
+    """
+    from ..caching.latency_stats import LatencyStatistics
+    properties = g.vp if kind == "vertex" else g.ep
+    name = "distance" if kind == "vertex" else "weight"
+    bins = get_ragged_property(g, f"{name}_histogram_bins", kind)
+    counts = get_ragged_property(g, f"{name}_histogram_counts", kind)
+    return LatencyStatistics.from_arrays(properties[f"{name}_count"].a, properties[f"avg_{name}"].a, properties[f"{name}_variance"].a,
+                                         properties[f"min_{name}"].a, properties[f"max_{name}"].a, bins.offsets, bins.values, counts.values)
+
+def merge_latency_statistics(graphs, kind : str = "vertex") -> tuple:
+    """
+    Merges the latency statistics of several cached graphs, e.g. weekly graphs into monthly statistics, without going back to the database.
+    Vertices are matched by their IP address, edges by the IP addresses of their endpoints.
+    :param graphs: Graphs loaded from the cache. (Iterable[graph_tool.Graph])
+    :param kind: Either vertex or edge. (str)
+    :return: A tuple of the list of keys (IP addresses, or (source, target) IP address pairs for edges) and the merged statistics, its item i belongs to the key i. (tuple)
+    """
+    from ..caching.latency_stats import LatencyStatistics
+    keys = {}
+    merged = LatencyStatistics()
+    for g in graphs:
+        if kind == "vertex":
+            graph_keys = [g.vp.ip[v] for v in g.vertices()]
+        else:
+            graph_keys = [(g.vp.ip[e.source()], g.vp.ip[e.target()]) for e in g.edges()]
+        mapping = [keys.setdefault(key, len(keys)) for key in graph_keys]
+        merged.merge(get_latency_statistics(g, kind), mapping)
+    return list(keys), merged
+
+# Process-wide cache of the loaded graphs, see get_graph_memory_cache()
+_graph_memory_cache = None
+
+def get_graph_memory_cache():
+    """
+    Returns the process-wide cache of the graphs loaded by get_graph_by_date(), created with the memory budget from the config file on first use.
+    Its statistics() give the hit, miss and eviction counters, its budget can be changed by set_graph_memory_budget().
+    :return: The cache. (ip_analysis_tool.util.graph_memory_cache.GraphMemoryCache)
+    """
+    global _graph_memory_cache
+    if _graph_memory_cache is None:
+        from .graph_memory_cache import GraphMemoryCache, load_memory_budget
+        _graph_memory_cache = GraphMemoryCache(load_memory_budget())
+    return _graph_memory_cache
+
+def set_graph_memory_budget(budget):
+    """
+    Sets the memory budget of the process-wide graph cache, the least recently used graphs are evicted once it's exceeded.
+    :param budget: Number of bytes, or a size with a suffix, e.g. 4G. 0 disables the cache. (int or str)
+    """
+    from .memory_util import parse_size
+    get_graph_memory_cache().set_budget(parse_size(budget))
+
+def load_cached_graph(path : str, properties = None) -> Graph:
+    """
+    Loads a cached graph with the given properties, the compression codec of the file is detected. The topology, the ip, gid and traversals properties and the metadata are always loaded, the other scalar properties come from the side-store next to the graph file.
+    :param path: Path to the .gt file of the graph. (str)
+    :param properties: Names of the vertex and edge properties to load besides the core ones, e.g. ["hop_distance", "avg_distance"]. None loads all of them. (list)
+    :return: The graph. (graph_tool.Graph)
+    """
+    from ..caching.graph_codec import load_graph_file
+    from ..caching.graph_store import load_scalar_properties
+    g = load_graph_file(path)
+    load_scalar_properties(g, path, properties)
+    return g
+
+def get_graph_by_date(date: datetime.date = None, weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK, copy : bool = True, properties = None) -> Graph:
     """
     Returns the graph for the week containing the given date.
+    The loaded graphs are kept in a process-wide cache with a memory budget (see get_graph_memory_cache()), so repeated calls for the same interval don't read the file again.
     :param date: The date to get the graph for (can be either datetime.date, or string in format YYYY-MM-DD). (datetime.date or str)
     :param weighted_edges: Whether to get the graph with weighted edges. Default is False. Graphs with weighted edges have much less data. (bool)
     :param time_interval: Specify the time interval, for which the measurement data should be returned (ip_analysis_tool.enums.TimeInterval)
+    :param copy: Return a copy of the cached graph, which can be freely modified. If False, the cached graph itself is returned, which saves the copying, but it must not be modified. (bool)
+    :param properties: Names of the vertex and edge properties to load besides the topology, ip, gid and traversals, e.g. ["hop_distance"]. Default None loads all of them, [] only the core ones.
+    The route lists and latency histograms aren't loaded either way, see get_ragged_property(). (list)
     :return: The graph for the specified interval and weight. (graph_tool.Graph)
     """
-    from graph_tool import load_graph
+    try:
+        input_file : str = get_graph_path(date, weighted_edges, time_interval)
+    except:
+        print("Invalid date format.")
+        return None
     if time_interval == TimeInterval.ALL:
-        return load_graph(os.path.expanduser(f"""~/.cache/IPAnalysisTool/graphs/all/{'weighted' if weighted_edges else 'base'}/all.gt"""))
-    if type(date) != datetime.date:
-        try:
-            from .date_util import get_date_object
-            date = get_date_object(date)
-        except:
-            print("Invalid date format.")
-    input_file : str = os.path.expanduser(f'''~/.cache/IPAnalysisTool/graphs/{str(time_interval).lower()}/{'base' if not weighted_edges else 'weighted'}/{get_date_string(get_parent_interval(date, time_interval=time_interval)[0])}.gt''')
+        return load_graph_from_cache(input_file, weighted_edges, time_interval, copy, properties)
     try:
-        result = load_graph(input_file)
-        return result
+        return load_graph_from_cache(input_file, weighted_edges, time_interval, copy, properties)
     except:
         print("Requested graph could not be loaded.")
 
+def load_graph_from_cache(input_file : str, weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK, copy : bool = True, properties = None) -> Graph:
+    """
+    Returns the cached graph of the given file through the process-wide memory cache, see get_graph_by_date(). Errors are raised to the caller.
+    :param input_file: Path to the .gt file of the graph. (str)
+    :return: The graph. (graph_tool.Graph)
+    """
+    # The graph is held once, with all the properties requested for it so far, so it may have more of them than requested
+    key = (time_interval, weighted_edges, "all" if time_interval == TimeInterval.ALL else os.path.basename(input_file)[:-3])
+    result = get_graph_memory_cache().get(key, input_file, load_cached_graph, properties)
+    return Graph(result) if copy else result
+
+class GraphIteratorEntry(TypedDict):
+    """
+    A graph yielded by iter_graphs().
+    :param start: First day of the interval, for TimeInterval.ALL the start of the iterated range. (datetime.date)
+    :param end: Last day of the interval, for TimeInterval.ALL the end of the iterated range. (datetime.date)
+    :param graph: The graph, None if it's missing or failed to load. (graph_tool.Graph)
+    :param missing: Whether the interval has no cached graph. (bool)
+    :param error: Why the graph failed to load, None if it loaded or is missing. (str)
+    """
+    start: datetime.date
+    end: datetime.date
+    graph: Optional[Graph]
+    missing: bool
+    error: Optional[str]
+
+def iter_graphs(start : datetime.date, end : datetime.date, time_interval : TimeInterval = TimeInterval.WEEK, weighted_edges = False, prefetch : int = 2, properties = None, copy : bool = True):
+    """
+    Iterates over the cached graphs of the intervals in the given range, the following graphs are loaded on background threads while the caller processes the current one.
+    At most prefetch graphs are loaded ahead, so the memory held by the iterator stays bounded.
+    :param start: Date within the first interval. For TimeInterval.ALL, the single graph from all the data is yielded with the given range. (datetime.date)
+    :param end: Date within the last interval. (datetime.date)
+    :param time_interval: Time interval of the graphs. (ip_analysis_tool.enums.TimeInterval)
+    :param weighted_edges: Whether to iterate over the graphs with weighted edges. (bool)
+    :param prefetch: Number of graphs loaded ahead, 0 loads each graph only when it's reached. (int)
+    :param properties: Properties to load, see get_graph_by_date(). (list)
+    :param copy: Yield copies of the cached graphs, see get_graph_by_date(). (bool)
+    :return: A generator of GraphIteratorEntry in the order of the intervals, including the missing ones.
+    """
+    import concurrent.futures
+    from collections import deque
+    from .date_util import iterate_range
+    intervals = [(start, end)] if time_interval == TimeInterval.ALL else iterate_range(start, end, time_interval)
+
+    def load(interval) -> GraphIteratorEntry:
+        entry : GraphIteratorEntry = {"start": interval[0], "end": interval[1], "graph": None, "missing": False, "error": None}
+        path = get_graph_path(interval[0], weighted_edges, time_interval)
+        if not os.path.exists(path):
+            entry["missing"] = True
+            return entry
+        try:
+            entry["graph"] = load_graph_from_cache(path, weighted_edges, time_interval, copy, properties)
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        return entry
+
+    if prefetch <= 0:
+        for interval in intervals:
+            yield load(interval)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending = deque()
+        remaining = iter(intervals)
+        try:
+            # The next graph and the prefetched ones
+            for interval in remaining:
+                pending.append(executor.submit(load, interval))
+                if len(pending) > prefetch: break
+            while pending:
+                # While the caller processes this one, the following prefetch graphs are loaded
+                yield pending.popleft().result()
+                next_interval = next(remaining, None)
+                if next_interval is not None:
+                    pending.append(executor.submit(load, next_interval))
+        finally:
+            # The caller may stop early, the prefetched graphs are dropped
+            for future in pending: future.cancel()
+
+def get_snapshot_by_date(date: datetime.date = None, weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK, create : bool = True):
+    """
+    Returns the memory-mapped snapshot of the graph for the interval containing the given date.
+    Unlike get_graph_by_date(), the snapshot isn't copied into the memory of the process, so worker processes analysing the same intervals share it through the page cache.
+    :param date: The date to get the snapshot for (can be either datetime.date, or string in format YYYY-MM-DD). Ignored for TimeInterval.ALL. (datetime.date or str)
+    :param weighted_edges: Whether to get the snapshot of the graph with weighted edges. (bool)
+    :param time_interval: Time interval of the graph. (ip_analysis_tool.enums.TimeInterval)
+    :param create: Create the snapshot from the cached graph if it's missing or outdated, graph_cache snapshot creates them in advance. (bool)
+    :return: The snapshot, None if the graph isn't cached (or the snapshot is missing and create is False). (ip_analysis_tool.caching.snapshot.GraphSnapshot)
+    """
+    from ..caching.snapshot import GraphSnapshot, get_snapshot_path, is_snapshot_current, write_snapshot
+    graph_path = get_graph_path(date, weighted_edges, time_interval)
+    snapshot_path = get_snapshot_path(graph_path)
+    if not os.path.exists(graph_path):
+        print("Requested graph could not be loaded.")
+        return None
+    if not is_snapshot_current(snapshot_path, graph_path):
+        if not create: return None
+        source_mtime = os.stat(graph_path).st_mtime_ns
+        write_snapshot(load_cached_graph(graph_path), snapshot_path, source_mtime)
+    return GraphSnapshot(snapshot_path)
+
 def get_all_graph_dates(weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK) -> list:
     """
     Returns a list of all dates for which graphs are available.
     :param weighted_edges: Whether to get the range for graphs with weighted edges. Default is False. Graphs with weighted edges have much less data. (bool)
     :return: A list of all dates for which graphs with the specified edge weighting are available. (list)
     """
-    return [datetime.datetime.strptime(f[:-3], "%Y-%m-%d").date() for f in sorted(os.listdir(os.path.expanduser(f"~/.cache/IPAnalysisTool/graphs/{str(time_interval).lower()}/{'base' if not weighted_edges else 'weighted'}")))]
\ No newline at end of file
+    from .date_util import get_cached_graph_files
+    return [datetime.datetime.strptime(f[:-3], "%Y-%m-%d").date() for f in get_cached_graph_files(weighted_edges, time_interval)]
+
+def get_graph_summaries(weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK, validate : bool = True) -> list:
+    """
+    Returns the summaries of the cached graphs (path, date, vertex and edge counts, file size and metadata) from the manifest of their folder, without loading the graphs.
+    Graphs generated before the summaries were introduced have none, graph_cache index adds them.
+    :param weighted_edges: Whether to get the summaries of the graphs with weighted edges. (bool)
+    :param time_interval: Time interval of the graphs. (ip_analysis_tool.enums.TimeInterval)
+    :param validate: Leave out the summaries whose graph file changed or disappeared since they were written. (bool)
+    :return: List of the summaries sorted by date. (list of ip_analysis_tool.caching.manifest.GraphSummary)
+    """
+    from ..caching.manifest import load_manifest, is_summary_current
+    manifest = load_manifest(get_graph_folder(weighted_edges, time_interval))
+    summaries = [entry["summary"] for entry in manifest.values() if "summary" in entry]
+    if validate:
+        summaries = [summary for summary in summaries if is_summary_current(summary)]
+    if len(summaries) < len(manifest):
+        print(f"{len(manifest) - len(summaries)} cached graphs have no current summary, run graph_cache index to add them.")
+    return sorted(summaries, key=lambda summary: summary["date"])
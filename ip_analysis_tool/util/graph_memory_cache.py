@@ -0,0 +1,162 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import TypedDict
+
+# Memory budget of the process-wide graph cache, unless set by graph_memory_budget in config.yml
+DEFAULT_MEMORY_BUDGET = "2G"
+
+# Estimated bytes per value of the property maps, by their value type
+PROPERTY_VALUE_SIZES = {"bool": 1, "uint8_t": 1, "int16_t": 2, "short": 2, "int32_t": 4, "int": 4, "float": 8, "double": 8, "int64_t": 8, "long": 8}
+# Estimate for the value types without a fixed size (strings, vectors, python objects)
+VARIABLE_VALUE_SIZE = 64
+
+class GraphCacheStatistics(TypedDict):
+    """
+    Counters of a GraphMemoryCache.
+    :param hits: Number of the graphs returned from the memory. (int)
+    :param misses: Number of the graphs loaded from the disk. (int)
+    :param evictions: Number of the graphs dropped to stay within the memory budget. (int)
+    :param invalidations: Number of the graphs dropped, because their file changed. (int)
+    :param graphs: Number of the graphs currently held. (int)
+    :param size: Estimated memory of the held graphs in bytes. (int)
+    :param budget: Memory budget in bytes. (int)
+    """
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    graphs: int
+    size: int
+    budget: int
+
+def estimate_graph_size(g) -> int:
+    """
+    Estimates the memory used by a graph from the number of its vertices and edges and the types of its properties.
+    :param g: The graph.
+    :return: Estimated number of bytes.
+    """
+    # Adjacency lists hold each edge twice (in and out) as pairs of 64-bit integers
+    size = 32 * g.num_edges() + 32 * g.num_vertices()
+    for (kind, _), prop in g.properties.items():
+        count = g.num_vertices() if kind == "v" else g.num_edges() if kind == "e" else 1
+        size += count * PROPERTY_VALUE_SIZES.get(prop.value_type(), VARIABLE_VALUE_SIZE)
+    return size
+
+class GraphMemoryCache:
+    """
+    Least recently used cache of loaded graphs, which keeps their estimated memory within a budget.
+    Graphs are invalidated when the modification time of their file changes. Each graph is held once, with the union of the properties requested for it.
+    It can be shared by threads, the graphs are loaded outside of its lock, so several of them can be loaded at once.
+    """
+    def __init__(self, budget : int):
+        """
+        :param budget: Memory budget in bytes, 0 disables the cache.
+        """
+        self.budget = budget
+        # Key mapped to (graph, modification time of the file, estimated size, loaded properties), the most recently used last
+        self.graphs = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, path : str, loader, properties = None):
+        """
+        Returns the graph of the given key, it's loaded from the file if it isn't held, the file changed since or the held graph lacks some of the properties.
+        :param key: Key of the graph, e.g. (time_interval, weighted_edges, interval start).
+        :param path: Path to the file of the graph.
+        :param loader: Function loading the graph from the path with the given properties (None for all of them), e.g. load_cached_graph.
+        :param properties: Names of the needed properties, None for all of them. A held graph with more of them is returned as it is,
+        otherwise the graph is loaded again with the properties of the held graph and the needed ones and replaces it.
+        :return: The graph, shared by all the callers until it's evicted.
+        """
+        mtime = os.stat(path).st_mtime_ns
+        if properties is not None: properties = frozenset(properties)
+        with self.lock:
+            entry = self.graphs.get(key)
+            if entry is not None:
+                if entry[1] != mtime:
+                    self.invalidations += 1
+                    self.remove(key)
+                elif entry[3] is None or (properties is not None and properties <= entry[3]):
+                    self.hits += 1
+                    self.graphs.move_to_end(key)
+                    return entry[0]
+                elif properties is not None:
+                    properties = properties | entry[3]
+            self.misses += 1
+        g = loader(path, sorted(properties) if properties is not None else None)
+        size = estimate_graph_size(g)
+        with self.lock:
+            self.remove(key)
+            # Graphs larger than the whole budget aren't held at all
+            if size <= self.budget:
+                self.shrink(size)
+                self.graphs[key] = (g, mtime, size, properties)
+                self.size += size
+        return g
+
+    def remove(self, key):
+        """
+        Drops the graph of the given key.
+        :param key: Key of the graph.
+        """
+        entry = self.graphs.pop(key, None)
+        if entry is not None: self.size -= entry[2]
+
+    def shrink(self, reserved : int = 0):
+        """
+        Evicts the least recently used graphs until the held graphs and the reserved size fit into the budget. The caller has to hold the lock.
+        :param reserved: Number of bytes to keep free, e.g. for a graph about to be added.
+        """
+        while self.graphs and self.size + reserved > self.budget:
+            self.remove(next(iter(self.graphs)))
+            self.evictions += 1
+
+    def set_budget(self, budget : int):
+        """
+        Changes the memory budget, the least recently used graphs are evicted if they don't fit into it.
+        :param budget: Memory budget in bytes, 0 disables the cache.
+        """
+        with self.lock:
+            self.budget = budget
+            self.shrink()
+
+    def clear(self):
+        """
+        Drops all the graphs, the counters are kept.
+        """
+        self.graphs.clear()
+        self.size = 0
+
+    def statistics(self) -> GraphCacheStatistics:
+        """
+        :return: Counters of the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "graphs": len(self.graphs),
+            "size": self.size,
+            "budget": self.budget,
+        }
+
+def load_memory_budget() -> int:
+    """
+    Loads the memory budget of the graph cache from the config file (graph_memory_budget, e.g. 4G).
+    :return: The budget in bytes, DEFAULT_MEMORY_BUDGET if it isn't set.
+    """
+    import yaml
+    from .memory_util import parse_size
+    try:
+        with open(os.path.expanduser("~/.config/IPAnalysisTool/config.yml"), "r") as f:
+            config = yaml.safe_load(f)
+        budget = config.get("graph_memory_budget") if isinstance(config, dict) else None
+    except OSError:
+        budget = None
+    return parse_size(budget if budget is not None else DEFAULT_MEMORY_BUDGET)
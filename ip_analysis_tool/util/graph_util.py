@@ -1,14 +1,53 @@
+import numpy as np
 from graph_tool import Graph, VertexPropertyMap
 
 
+def get_vertex_gids(g: Graph) -> np.ndarray:
+    """
+    Returns the global IDs of the IP addresses of the vertices, which are the same in every cached graph (see ip_analysis_tool.caching.ip_dictionary).
+    Graphs generated before the gid property was introduced get the IDs from the dictionary.
+    :param g: A cached graph (or a view of it).
+    :return: Array of the IDs (int64) indexed by the vertex index, for views the filtered out vertices get UNKNOWN_ID unless the graph has the gid property.
+    """
+    from ..caching.ip_dictionary import get_ip_dictionary, ID_MASK, UNKNOWN_ID
+    if "gid" in g.vp:
+        # Older graphs store the IDs as signed 32-bit, the IDs above 2^31 wrapped around
+        return g.vp.gid.a.astype(np.int64) & ID_MASK
+    gids = np.full(g.num_vertices(ignore_filter=True), UNKNOWN_ID, dtype=np.int64)
+    gids[g.get_vertices()] = get_ip_dictionary().get_ids(g.vp.ip[v] for v in g.vertices())
+    return gids
+
+def get_edge_keys(g: Graph, gids: np.ndarray = None) -> np.ndarray:
+    """
+    Returns the edges of a graph as integers made of the global IDs of their endpoints, the lower ID first, so the same edge has the same key in every cached graph regardless of its direction.
+    :param g: A cached graph (or a view of it).
+    :param gids: The IDs returned by get_vertex_gids(), if already known.
+    :return: Array of the unique keys (uint64).
+    """
+    from ..caching.ip_dictionary import ID_MASK, UNKNOWN_ID
+    if gids is None: gids = get_vertex_gids(g)
+    edges = g.get_edges()
+    sources, targets = gids[edges[:, 0]], gids[edges[:, 1]]
+    # An unknown ID would set all the bits of the key and collide with the other edges of the vertex
+    if np.any(sources == UNKNOWN_ID) or np.any(targets == UNKNOWN_ID):
+        raise ValueError("Some edges have endpoints without a global ID")
+    # Two unsigned 32-bit IDs only fit into an unsigned 64-bit key
+    sources, targets = (sources & ID_MASK).astype(np.uint64), (targets & ID_MASK).astype(np.uint64)
+    return np.unique((np.minimum(sources, targets) << np.uint64(32)) | np.maximum(sources, targets))
+
 def map_vertices_by_property(g1: Graph, g2: Graph, property: str = "ip") -> dict:
     """
     Maps vertices between two graphs based on a given property.
+    Cached graphs are mapped by the global IDs of their IP addresses, which avoids hashing the address strings.
     :param g1: First input graph.
     :param g2: Second input graph.
     :param property: Name of the property to map vertices on.
     :return: A map, where a vertex from g1 is mapped to a corresponding vertex from g2.
     """
+    if property == "ip" and "gid" in g1.vp and "gid" in g2.vp:
+        vertices1, vertices2 = g1.get_vertices(), g2.get_vertices()
+        _, indices1, indices2 = np.intersect1d(get_vertex_gids(g1)[vertices1], get_vertex_gids(g2)[vertices2], assume_unique=True, return_indices=True)
+        return {g1.vertex(v1): g2.vertex(v2) for v1, v2 in zip(vertices1[indices1], vertices2[indices2])}
     g1_prop = g1.vertex_properties[property]
     g2_prop = g2.vertex_properties[property]
     ip_to_vertex = {}
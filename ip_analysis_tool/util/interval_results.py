@@ -0,0 +1,77 @@
+import json
+import os
+import numpy as np
+from ..enums import TimeInterval
+
+def get_results_folder(analysis : str, version : int, parameters : dict, weighted_edges = False, time_interval : TimeInterval = TimeInterval.WEEK) -> str:
+    """
+    Returns the folder of the per-interval results of an analysis of the cached graphs, creating it if it doesn't exist.
+    :param analysis: Name of the analysis, e.g. time_series.
+    :param version: Version of the analysis, has to be increased whenever its results change.
+    :param parameters: JSON serializable parameters affecting the results.
+    :param weighted_edges: Whether the analyzed graphs have weighted edges.
+    :param time_interval: Time interval of the analyzed graphs.
+    :return: Path to the folder, e.g. ~/.cache/IPAnalysisTool/results/week/base/time_series-<hash>
+    """
+    from ..caching.derived_cache import get_result_key
+    folder = os.path.expanduser(f"~/.cache/IPAnalysisTool/results/{str(time_interval).lower()}/{'base' if not weighted_edges else 'weighted'}/{get_result_key(analysis, version, parameters)}")
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    return folder
+
+def get_source_state(graph_path : str) -> dict:
+    """
+    Describes the current state of a cached graph file, a result is only reused while its graph file stays the same.
+    :param graph_path: Path to the .gt file.
+    :return: Dict of the modification time in nanoseconds and the size of the file, None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(graph_path)
+    except OSError:
+        return None
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+def to_json_value(value):
+    """
+    Converts numpy values of a result to their JSON serializable form.
+    """
+    if isinstance(value, np.ndarray): return value.tolist()
+    if isinstance(value, np.generic): return value.item()
+    return value
+
+def load_interval_result(folder : str, date : str, source : dict) -> dict:
+    """
+    Loads the stored result of an interval, if it was computed from the current graph file.
+    :param folder: Folder of the results, see get_results_folder().
+    :param date: First day of the interval. Format is YYYY-MM-DD.
+    :param source: Current state of the graph file, see get_source_state().
+    :return: The result with its arrays as numpy arrays, None if it's missing or outdated.
+    """
+    if source is None: return None
+    try:
+        with open(f"{folder}/{date}.json") as f:
+            stored = json.load(f)
+        if stored["source"] != source: return None
+        result = stored["result"]
+        for name in stored["arrays"]:
+            result[name] = np.array(result[name])
+    except (OSError, ValueError, KeyError):
+        return None
+    return result
+
+def save_interval_result(folder : str, date : str, source : dict, result : dict):
+    """
+    Stores the result of an interval, replacing the previous one.
+    :param folder: Folder of the results, see get_results_folder().
+    :param date: First day of the interval. Format is YYYY-MM-DD.
+    :param source: State of the graph file the result was computed from, see get_source_state().
+    :param result: Dict of JSON serializable values, numpy arrays and numpy scalars.
+    """
+    temporary = f"{folder}/{date}.json.tmp{os.getpid()}"
+    with open(temporary, "w") as f:
+        json.dump({
+            "source": source,
+            "arrays": [name for name, value in result.items() if isinstance(value, np.ndarray)],
+            "result": {name: to_json_value(value) for name, value in result.items()},
+        }, f)
+    os.replace(temporary, f"{folder}/{date}.json")
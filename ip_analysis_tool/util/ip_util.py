@@ -0,0 +1,107 @@
+from socket import inet_aton, inet_ntoa
+from typing import Iterable
+
+# Key of addresses which can't be parsed as IPv4 addresses, e.g. a 'localhost' starting address
+INVALID_ADDRESS = -1
+
+def ip_to_int(address : str) -> int:
+    """
+    Converts an IPv4 address to a 32-bit integer.
+    :param address: IPv4 address, optionally in the CIDR notation (e.g. 192.0.2.1/32), the prefix length is ignored.
+    :return: The address as an integer, or INVALID_ADDRESS if it isn't a valid IPv4 address.
+    """
+    try:
+        return int.from_bytes(inet_aton(address.split("/", 1)[0]), "big")
+    except OSError:
+        return INVALID_ADDRESS
+
+def int_to_ip(address : int) -> str:
+    """
+    Converts a 32-bit integer to an IPv4 address.
+    :param address: The address as an integer.
+    :return: IPv4 address in the dotted notation.
+    """
+    return inet_ntoa(address.to_bytes(4, "big"))
+
+def ips_to_ints(addresses : Iterable[str]) -> list:
+    """
+    Converts a batch of IPv4 addresses to 32-bit integers.
+    :param addresses: IPv4 addresses, optionally in the CIDR notation.
+    :return: List of the addresses as integers, INVALID_ADDRESS for the invalid ones.
+    """
+    return [ip_to_int(address) for address in addresses]
+
+# Reserved IPv4 blocks, routes to destinations within them aren't used for the graphs
+DEFAULT_RESERVED_RANGES = [
+    "0.0.0.0/8",
+    "10.0.0.0/8",
+    "100.64.0.0/10",
+    "127.0.0.0/8",
+    "169.254.0.0/16",
+    "172.16.0.0/12",
+    "192.0.0.0/24",
+    "192.0.2.0/24",
+    "192.88.99.0/24",
+    "192.168.0.0/16",
+    "198.18.0.0/15",
+    "198.51.100.0/24",
+    "203.0.113.0/24",
+    "255.255.255.255/32",
+]
+
+def cidr_to_range(block : str) -> tuple:
+    """
+    Converts an IPv4 block to the range of its addresses.
+    :param block: IPv4 block in the CIDR notation, e.g. 10.0.0.0/8. A single address is a /32 block.
+    :return: Tuple of the first and the last address of the block as integers.
+    """
+    address, _, prefix = block.partition("/")
+    prefix = int(prefix) if prefix else 32
+    first = ip_to_int(address)
+    if first == INVALID_ADDRESS or not 0 <= prefix <= 32:
+        raise ValueError(f"Invalid IPv4 block: {block}")
+    size = 1 << (32 - prefix)
+    first &= ~(size - 1)
+    return first, first + size - 1
+
+class ReservedRangeIndex:
+    """
+    Index of IPv4 blocks answering whether addresses fall into any of them. The blocks are merged into sorted disjoint intervals, which are looked up by a binary search.
+    """
+    def __init__(self, blocks : Iterable[str] = DEFAULT_RESERVED_RANGES):
+        """
+        :param blocks: IPv4 blocks in the CIDR notation.
+        """
+        import numpy as np
+        starts, ends = [], []
+        for first, last in sorted(cidr_to_range(block) for block in blocks):
+            if ends and first <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], last)
+            else:
+                starts.append(first)
+                ends.append(last)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def contains(self, addresses):
+        """
+        Determines which of the addresses fall into any of the blocks.
+        :param addresses: Addresses as integers (see ip_to_int()), e.g. a numpy array.
+        :return: Boolean numpy array, True for the addresses within the blocks. Negative addresses, e.g. INVALID_ADDRESS, are never within a block.
+        """
+        import numpy as np
+        addresses = np.asarray(addresses, dtype=np.int64)
+        # Index of the last interval starting at or before each address
+        interval = np.searchsorted(self.starts, addresses, side="right") - 1
+        return (interval >= 0) & (addresses <= self.ends[np.maximum(interval, 0)]) if len(self) else np.zeros(len(addresses), dtype=bool)
+
+    def contains_address(self, address : str) -> bool:
+        """
+        Determines whether a single address falls into any of the blocks.
+        :param address: IPv4 address, optionally in the CIDR notation.
+        :return: True if the address is within a block.
+        """
+        return bool(self.contains([ip_to_int(address)])[0])
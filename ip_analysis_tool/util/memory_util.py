@@ -0,0 +1,27 @@
+import re
+
+# Multipliers of the size suffixes, powers of 1024
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+def parse_size(size) -> int:
+    """
+    Parses a memory size given as a number of bytes or with a suffix, e.g. 512M, 4G or 1.5GB.
+    :param size: The size as a string or a number of bytes.
+    :return: Number of bytes.
+    """
+    if isinstance(size, (int, float)): return int(size)
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*", str(size), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid memory size: {size}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+def format_size(size : int) -> str:
+    """
+    Formats a number of bytes for printing, e.g. 1.5G.
+    :param size: Number of bytes.
+    :return: The size with the largest suffix keeping the number at least 1.
+    """
+    for unit in ("T", "G", "M", "K"):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f}{unit}"
+    return f"{size}B"
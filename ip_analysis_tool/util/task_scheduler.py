@@ -0,0 +1,89 @@
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import TypedDict
+
+class ScheduledTask(TypedDict):
+    """
+    Task of run_scheduled().
+    :param key: Identifies the task in its outcome, e.g. the index of the interval. (hashable)
+    :param args: Positional arguments of the worker. (tuple)
+    :param kwargs: Keyword arguments of the worker. (dict)
+    :param memory: Estimated peak memory of the task in bytes. (int)
+    """
+    key: object
+    args: tuple
+    kwargs: dict
+    memory: int
+
+class TaskOutcome(TypedDict):
+    """
+    Outcome of a task of run_scheduled().
+    :param key: Key of the task. (hashable)
+    :param result: Return value of the worker, None if it failed.
+    :param error: The exception of the failed task, None if it succeeded. (Exception)
+    :param attempts: Number of the times the task was started. (int)
+    """
+    key: object
+    result: object
+    error: Exception
+    attempts: int
+
+def is_out_of_memory(error : Exception) -> bool:
+    """
+    :return: Whether the task failed for the lack of memory, either by a MemoryError or by its worker process being killed (e.g. by the OOM killer).
+    """
+    return isinstance(error, (MemoryError, BrokenProcessPool))
+
+def run_scheduled(worker, tasks : list, max_workers : int = 1, memory_limit : int = None, verbose : bool = False, executor_factory = None):
+    """
+    Runs tasks in a process pool, keeping the sum of the estimated memory of the running tasks under a limit.
+    The largest tasks are started first, so the long ones don't end up last, and the smaller tasks fill the remaining memory.
+    A task larger than the limit is only started when nothing else is running.
+    Tasks which ran out of memory are retried with half the concurrency, until they fail with a single worker.
+    :param worker: Function run by the processes, has to be picklable.
+    :param tasks: List of the tasks. (list of ScheduledTask)
+    :param max_workers: Maximum number of the tasks running at once.
+    :param memory_limit: Memory budget of the running tasks in bytes. None only limits the number of the workers.
+    :param verbose: Print the retries.
+    :param executor_factory: Function creating the executor for a number of workers. Default is ProcessPoolExecutor.
+    :return: Generator of the outcomes in the order of completion. (TaskOutcome)
+    """
+    if executor_factory is None:
+        executor_factory = lambda workers: concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    pending = sorted(tasks, key=lambda task: task["memory"], reverse=True)
+    attempts = {}
+    workers = max(1, max_workers)
+    while pending:
+        retry, broken = [], False
+        with executor_factory(workers) as executor:
+            running, used = {}, 0
+            while True:
+                # Admit the largest tasks which fit, as long as the pool works
+                for task in list(pending) if not broken else []:
+                    if len(running) >= workers: break
+                    if running and memory_limit is not None and used + task["memory"] > memory_limit: continue
+                    running[executor.submit(worker, *task["args"], **task["kwargs"])] = task
+                    attempts[task["key"]] = attempts.get(task["key"], 0) + 1
+                    used += task["memory"]
+                    pending.remove(task)
+                if not running: break
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    used -= task["memory"]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if is_out_of_memory(e) and workers > 1:
+                            # A killed worker breaks the pool, the tasks left are run by a new one
+                            broken = broken or isinstance(e, BrokenProcessPool)
+                            retry.append(task)
+                            continue
+                        yield TaskOutcome(key=task["key"], result=None, error=e, attempts=attempts[task["key"]])
+                        continue
+                    yield TaskOutcome(key=task["key"], result=result, error=None, attempts=attempts[task["key"]])
+        if retry:
+            workers = max(1, workers // 2)
+            if verbose:
+                print(f"{len(retry)} tasks ran out of memory, retrying them with {workers} workers")
+        pending = sorted(retry + pending, key=lambda task: task["memory"], reverse=True)
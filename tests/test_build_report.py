@@ -0,0 +1,54 @@
+import datetime
+from time import sleep
+from ip_analysis_tool.caching.build_report import BUILD_PHASES, BuildTimer, load_reports, write_report
+from ip_analysis_tool.enums import TimeInterval
+
+def batches(timer):
+    with timer.phase("query"):
+        sleep(0.02)
+    sleep(0.01)
+    yield [1, 2, 3]
+    sleep(0.01)
+    yield [4, 5]
+
+def test_time_batches():
+    timer = BuildTimer()
+    rows = []
+    for batch in timer.time_batches(batches(timer)):
+        rows.extend(batch)
+        sleep(0.01)
+    assert rows == [1, 2, 3, 4, 5]
+    assert timer.rows == 5
+    assert timer.phases["query"] >= 0.02
+    # The query is measured separately from the wait for the first rows
+    assert 0.01 <= timer.phases["first_row"] < 0.02
+    assert timer.phases["fetch"] >= 0.01
+    assert timer.phases["construction"] >= 0.02
+
+def test_stopped_early():
+    timer = BuildTimer()
+    generator = batches(timer)
+    for _ in timer.time_batches(generator):
+        break
+    assert timer.rows == 3
+    # The retrieval of the rows is stopped as well
+    assert next(generator, None) is None
+
+def test_report_file(tmp_path):
+    timer = BuildTimer()
+    with timer.phase("save"):
+        sleep(0.01)
+    timer.rows = 100
+    path = tmp_path / "2021-01-04.gt"
+    path.write_bytes(b"graph")
+    report = timer.create_report(TimeInterval.WEEK, datetime.date(2021, 1, 4), {"path": str(path), "num_vertices": 3, "num_edges": 2})
+    assert report["interval"] == "week" and report["start"] == "2021-01-04"
+    assert list(report["phases"]) == list(BUILD_PHASES)
+    assert report["file_size"] == 5
+    assert report["rows_per_second"] == report["rows"] / report["seconds"]
+    assert report["peak_rss"] > 0
+    scan = BuildTimer().create_report("scan", datetime.date(2021, 1, 4))
+    assert scan["path"] is None and scan["file_size"] is None and scan["rows_per_second"] == 0
+    write_report(str(tmp_path / "report.jsonl"), report)
+    write_report(str(tmp_path / "report.jsonl"), scan)
+    assert load_reports(str(tmp_path / "report.jsonl")) == [report, scan]
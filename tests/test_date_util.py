@@ -0,0 +1,15 @@
+import json
+import os
+from ip_analysis_tool.enums import TimeInterval
+from ip_analysis_tool.util.date_util import get_cached_graph_files, get_cache_date_range
+
+def test_graphs_missing_from_manifest_are_listed(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    folder = tmp_path / ".cache/IPAnalysisTool/graphs/week/base"
+    os.makedirs(folder)
+    for name in ("2021-01-04.gt", "2021-01-11.gt", "2021-01-11.gt.props.npz"):
+        (folder / name).write_bytes(b"graph")
+    # Only the latest generated graph is in the manifest
+    (folder / "manifest.json").write_text(json.dumps({"2021-01-11.gt": {}}))
+    assert get_cached_graph_files(False, TimeInterval.WEEK) == ["2021-01-04.gt", "2021-01-11.gt"]
+    assert str(get_cache_date_range(False, TimeInterval.WEEK)[0]) == "2021-01-04"
@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+from ip_analysis_tool.caching import derived_cache
+from ip_analysis_tool.caching.derived_cache import get_derived_result, get_derived_path, get_result_key, remove_derived_results
+
+class FakeProperty:
+    """
+    Stands in for a scalar graph_tool property map.
+    """
+    def __init__(self, values):
+        self.fa = np.array(values, dtype=np.int64)
+
+class FakeGraph:
+    """
+    Stands in for a cached graph_tool.Graph with the given number of vertices and traversals edge property values.
+    """
+    def __init__(self, vertices, directed=True, traversals=()):
+        self.vertices = vertices
+        self.directed = directed
+        self.ep = {"traversals": FakeProperty(traversals)}
+
+    def num_vertices(self):
+        return self.vertices
+
+    def num_edges(self):
+        return 0
+
+    def is_directed(self):
+        return self.directed
+
+@pytest.fixture
+def graph_path(tmp_path, monkeypatch):
+    path = tmp_path / "2021-01-04.gt"
+    path.write_bytes(b"graph")
+    monkeypatch.setattr(derived_cache, "get_source_path", lambda g: str(path))
+    return str(path)
+
+def counting(calls):
+    def compute(g):
+        calls.append(g)
+        return {"arrays": {"k_core": np.arange(g.num_vertices())}, "scalars": {"max_k": g.num_vertices() - 1}}
+    return compute
+
+def test_result_key():
+    assert get_result_key("k_core", 1, {"a": 1, "b": 2}) == get_result_key("k_core", 1, {"b": 2, "a": 1})
+    assert get_result_key("k_core", 1, {}) != get_result_key("k_core", 2, {})
+    assert get_result_key("k_core", 1, {}).startswith("k_core-")
+
+def test_result_is_stored(graph_path):
+    calls = []
+    first = get_derived_result(FakeGraph(5), "k_core", 1, {}, counting(calls))
+    second = get_derived_result(FakeGraph(5), "k_core", 1, {}, counting(calls))
+    assert len(calls) == 1
+    assert second["arrays"]["k_core"].tolist() == first["arrays"]["k_core"].tolist() == [0, 1, 2, 3, 4]
+    assert second["scalars"] == {"max_k": 4}
+    # Different versions, parameters and directedness are stored separately
+    get_derived_result(FakeGraph(5), "k_core", 2, {}, counting(calls))
+    get_derived_result(FakeGraph(5), "k_core", 1, {"k": 3}, counting(calls))
+    get_derived_result(FakeGraph(5, directed=False), "k_core", 1, {}, counting(calls))
+    assert len(calls) == 4
+    assert get_derived_result(FakeGraph(5), "k_core", 1, {}, counting(calls), cache=False) is not None
+    assert len(calls) == 5
+
+def test_result_is_outdated(graph_path):
+    calls = []
+    get_derived_result(FakeGraph(5), "k_core", 1, {}, counting(calls))
+    # A different graph of the same file, e.g. modified after loading
+    get_derived_result(FakeGraph(6), "k_core", 1, {}, counting(calls))
+    # The graph file was generated again
+    with open(graph_path, "wb") as f:
+        f.write(b"regenerated graph")
+    get_derived_result(FakeGraph(6), "k_core", 1, {}, counting(calls))
+    assert len(calls) == 3
+    get_derived_result(FakeGraph(6), "k_core", 1, {}, counting(calls))
+    assert len(calls) == 3
+
+def test_remove_derived_results(graph_path):
+    calls = []
+    get_derived_result(FakeGraph(5), "k_core", 1, {}, counting(calls))
+    assert os.path.isdir(get_derived_path(graph_path))
+    remove_derived_results(graph_path)
+    assert not os.path.exists(get_derived_path(graph_path))
+    get_derived_result(FakeGraph(5), "k_core", 1, {}, counting(calls))
+    assert len(calls) == 2
+
+def test_uncached_graph(monkeypatch):
+    monkeypatch.setattr(derived_cache, "get_source_path", lambda g: None)
+    calls = []
+    get_derived_result(FakeGraph(3), "k_core", 1, {}, counting(calls))
+    get_derived_result(FakeGraph(3), "k_core", 1, {}, counting(calls))
+    assert len(calls) == 2
+
+def test_edited_properties(graph_path):
+    calls = []
+    get_derived_result(FakeGraph(5, traversals=[1, 2]), "disparity", 1, {}, counting(calls), properties=["traversals"])
+    get_derived_result(FakeGraph(5, traversals=[1, 2]), "disparity", 1, {}, counting(calls), properties=["traversals"])
+    assert len(calls) == 1
+    # A copy of the graph with edited traversals
+    get_derived_result(FakeGraph(5, traversals=[1, 3]), "disparity", 1, {}, counting(calls), properties=["traversals"])
+    assert len(calls) == 2
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from graph_tool import Graph
+from graph_tool.all import shortest_distance
+from ip_analysis_tool.util.diameter import ifub_diameter, multi_sweep_diameter
+
+def all_pairs_diameter(g, weights=None):
+    """
+    The largest finite distance, by a search from every vertex.
+    """
+    diameter = 0.0
+    for v in g.vertices():
+        distances = shortest_distance(g, source=v, weights=weights, directed=False).a.astype(float)
+        unreachable = np.iinfo(np.int32).max if weights is None else np.inf
+        finite = distances[(distances != unreachable) & np.isfinite(distances)]
+        if len(finite): diameter = max(diameter, finite.max())
+    return diameter
+
+def random_graph(n, m, seed):
+    rng = np.random.default_rng(seed)
+    g = Graph(directed=True)
+    g.add_vertex(n)
+    edges = rng.integers(0, n, (m, 2))
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    g.add_edge_list(edges)
+    g.ep.min_weight = g.new_ep("double", vals=rng.uniform(0.1, 20, g.num_edges()))
+    return g
+
+def test_path_and_cycle():
+    path = Graph([(i, i + 1) for i in range(9)], directed=True)
+    cycle = Graph([(i, (i + 1) % 10) for i in range(10)], directed=True)
+    assert ifub_diameter(path)["diameter"] == 9 and ifub_diameter(path)["exact"]
+    assert ifub_diameter(cycle)["diameter"] == 5
+    assert multi_sweep_diameter(path)["diameter"] == 9
+
+def test_disconnected_graph():
+    g = Graph([(0, 1), (1, 2), (3, 4), (4, 5), (5, 6), (7, 8)], directed=True)
+    g.add_vertex()
+    result = ifub_diameter(g)
+    assert result["diameter"] == 3 and result["exact"] and set(result["endpoints"]) == {3, 6}
+    assert ifub_diameter(Graph(directed=False))["diameter"] == 0
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_all_pairs(seed):
+    g = random_graph(60, 80, seed)
+    for weights in (None, g.ep.min_weight):
+        expected = all_pairs_diameter(g, weights)
+        result = ifub_diameter(g, weights)
+        assert result["exact"] and result["diameter"] == pytest.approx(expected)
+        assert result["bfs_count"] <= g.num_vertices() + 3
+        estimate = multi_sweep_diameter(g, weights)
+        assert estimate["diameter"] <= expected + 1e-9 <= estimate["upper_bound"] + 2e-9
+
+def test_search_limit():
+    g = random_graph(200, 260, 7)
+    result = ifub_diameter(g, g.ep.min_weight, max_bfs=3)
+    assert result["diameter"] <= all_pairs_diameter(g, g.ep.min_weight) + 1e-9 <= result["upper_bound"] + 2e-9
@@ -0,0 +1,67 @@
+import datetime
+import os
+import pytest
+from ip_analysis_tool.caching.graph_builder import GraphBuilder, intern_addresses
+from ip_analysis_tool.caching.ip_dictionary import temporary_ip_dictionary
+from ip_analysis_tool.util.ip_util import INVALID_ADDRESS
+
+@pytest.fixture
+def saved_graph(tmp_path, monkeypatch):
+    """
+    Saves a weighted graph whose edges weren't discovered in the order of their source vertices, so the saved graph numbers them differently.
+    :return: Tuple of the builder and the path to the saved graph.
+    """
+    monkeypatch.setenv("HOME", str(tmp_path))
+    builder = GraphBuilder(datetime.date(2021, 1, 4), "localhost", weighted_edges=True)
+    with temporary_ip_dictionary(str(tmp_path / "ip_dictionary.txt")):
+        builder.add_routes([
+            (["192.0.2.1/32", "192.0.2.2/32"], [1.0, 3.0], datetime.datetime(2021, 1, 4)),
+            (["198.51.100.1/32", "198.51.100.2/32", "192.0.2.2/32"], [2.0, 7.0, 15.0], datetime.datetime(2021, 1, 4)),
+            (["192.0.2.1/32", "198.51.100.2/32"], [4.0, 9.0], datetime.datetime(2021, 1, 5)),
+        ])
+        result = builder.save(os.path.expanduser("~/.cache/IPAnalysisTool/graphs/week"), codec="none")
+    return builder, result["path"]
+
+def get_builder_edges(builder):
+    """
+    :return: List of the (source ip, target ip) of the edges of the builder, indexed by its edge index.
+    """
+    return [(builder.vertex_ips[s], builder.vertex_ips[t]) for s, t in zip(builder.edge_sources, builder.edge_targets)]
+
+def test_invalid_addresses_get_their_own_keys():
+    address_ids = {}
+    intern_addresses(address_ids, [["192.0.2.1/32", "2001:db8::1/128", "garbage"]])
+    intern_addresses(address_ids, [["fe80::1/128", "192.0.2.1/32"]])
+    invalid = [address_ids[address] for address in ("2001:db8::1/128", "garbage", "fe80::1/128")]
+    assert address_ids["192.0.2.1/32"] == 0xC0000201
+    assert len(set(invalid)) == 3 and all(key < INVALID_ADDRESS for key in invalid)
+
+def test_invalid_hops_are_separate_vertices():
+    builder = GraphBuilder(datetime.date(2021, 1, 4), "localhost")
+    builder.add_routes([
+        (["192.0.2.1/32", "2001:db8::1/128", "198.51.100.7/32"], [1.0, 2.0, 3.0], datetime.datetime(2021, 1, 4)),
+        (["192.0.2.1/32", "garbage", "198.51.100.7/32"], [1.0, 2.0, 3.0], datetime.datetime(2021, 1, 5)),
+    ])
+    assert builder.vertex_ips == ["", "192.0.2.1", "2001:db8::1", "198.51.100.7", "garbage"]
+    assert builder.hop_distance[2] == 2 and builder.hop_distance[4] == 2
+    # Every edge leaves the starting vertex only once
+    assert [source for source in builder.edge_sources].count(builder.starting_node) == 1
+
+def test_scalar_edge_properties_survive_saving(saved_graph):
+    from ip_analysis_tool.util.graph_getter import load_cached_graph
+    builder, path = saved_graph
+    expected = dict(zip(get_builder_edges(builder), builder.weight_statistics.minimum()))
+    g = load_cached_graph(path)
+    loaded = {(g.vp.ip[e.source()], g.vp.ip[e.target()]): g.ep.min_weight[e] for e in g.edges()}
+    assert loaded == pytest.approx(expected)
+    assert {(g.vp.ip[e.source()], g.vp.ip[e.target()]): g.ep.traversals[e] for e in g.edges()} == dict(zip(get_builder_edges(builder), builder.edge_traversals))
+
+def test_ragged_edge_properties_survive_saving(saved_graph):
+    from ip_analysis_tool.util.graph_getter import get_ragged_property, load_cached_graph
+    builder, path = saved_graph
+    vertex_properties, edge_properties = builder.get_ragged_properties()
+    g = load_cached_graph(path)
+    for name in ("routes", "weight_histogram_bins", "weight_histogram_counts"):
+        expected = {edge: edge_properties[name][i].tolist() for i, edge in enumerate(get_builder_edges(builder))}
+        loaded = get_ragged_property(g, name, "edge")
+        assert {(g.vp.ip[e.source()], g.vp.ip[e.target()]): loaded[g.edge_index[e]].tolist() for e in g.edges()} == expected
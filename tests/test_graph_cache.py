@@ -0,0 +1,21 @@
+import datetime
+from ip_analysis_tool.caching.graph_cache import fetch_route_batches
+from ip_analysis_tool.caching.synthetic_routes import SyntheticCursor
+from ip_analysis_tool.util.ip_util import DEFAULT_RESERVED_RANGES
+
+def create_row(destination, hour):
+    """
+    :return: A completed route to the destination, as returned by generate_routes().
+    """
+    route = ["192.0.2.1/32", "198.51.100.1/32", f"{destination}/{128 if ':' in destination else 32}"]
+    return route, [1.0, 2.0, 3.0], datetime.datetime(2021, 1, 4, hour), "C", len(route), destination
+
+def test_client_filtering_matches_database():
+    rows = [create_row(destination, hour) for hour, destination in enumerate(["8.8.8.8", "10.1.2.3", "2001:db8::1", "192.168.0.1", "fe80::1", "1.1.1.1"])]
+    fetched = {}
+    for mode, parameters in (("database", {}), ("client", {"non_reserved_table": None, "reserved_ranges": DEFAULT_RESERVED_RANGES})):
+        batches = fetch_route_batches(SyntheticCursor(rows), "2021-01-04", "2021-01-05", order_by_date=True, **parameters)
+        fetched[mode] = [record for batch in batches for record in batch]
+    # The IPv6 destinations aren't within any of the reserved IPv4 blocks
+    assert [record[0][-1] for record in fetched["client"]] == ["8.8.8.8/32", "2001:db8::1/128", "fe80::1/128", "1.1.1.1/32"]
+    assert fetched["client"] == fetched["database"]
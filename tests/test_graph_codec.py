@@ -0,0 +1,27 @@
+import pytest
+from ip_analysis_tool.caching.graph_codec import detect_codec, open_compressed, parse_codec
+
+def test_parse_codec():
+    assert parse_codec("none") == ("none", None)
+    assert parse_codec("ZSTD:19") == ("zstd", 19)
+    assert parse_codec(" gzip ") == ("gzip", None)
+    for spec in ("lz4", "none:3", "xz:fast"):
+        with pytest.raises(ValueError):
+            parse_codec(spec)
+
+@pytest.mark.parametrize("codec", ["gzip", "gzip:1", "xz", "xz:9"])
+def test_compressed_roundtrip(tmp_path, codec):
+    data = b"\xe2\x9b\xbe gt" + bytes(range(256)) * 64
+    path = str(tmp_path / "graph.gt")
+    with open_compressed(path, "wb", codec) as f:
+        f.write(data)
+    assert detect_codec(path) == parse_codec(codec)[0]
+    with open_compressed(path, "rb", codec) as f:
+        assert f.read() == data
+
+def test_detect_uncompressed(tmp_path):
+    path = tmp_path / "graph.gt"
+    path.write_bytes(b"\xe2\x9b\xbe gt\x01\x00")
+    assert detect_codec(str(path)) == "none"
+    path.write_bytes(b"")
+    assert detect_codec(str(path)) == "none"
@@ -0,0 +1,93 @@
+import os
+import pytest
+from ip_analysis_tool.util.graph_memory_cache import GraphMemoryCache
+from ip_analysis_tool.util.memory_util import parse_size, format_size
+
+class FakeGraph:
+    """
+    Stands in for a graph_tool.Graph with the given number of vertices, it only records the names of the loaded properties.
+    """
+    def __init__(self, path, loaded=None):
+        with open(path) as f:
+            self.vertices = int(f.read())
+        self.properties = {}
+        self.loaded = loaded
+
+    def num_vertices(self):
+        return self.vertices
+
+    def num_edges(self):
+        return 0
+
+@pytest.fixture
+def graph_files(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.gt"
+        path.write_text("100")
+        paths.append(str(path))
+    return paths
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("4G") == 4 << 30
+    assert parse_size("1.5 GB") == 3 << 29
+    assert parse_size("2MiB") == 2 << 20
+    assert parse_size(1000) == 1000
+    assert format_size(3 << 29) == "1.5G"
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+def test_hits_and_evictions(graph_files):
+    # Each graph takes 32 * 100 bytes, two of them fit into the budget
+    cache = GraphMemoryCache(7000)
+    first = cache.get(0, graph_files[0], FakeGraph)
+    assert cache.get(0, graph_files[0], FakeGraph) is first
+    cache.get(1, graph_files[1], FakeGraph)
+    # Use the first graph, so the second one is the least recently used
+    cache.get(0, graph_files[0], FakeGraph)
+    cache.get(2, graph_files[2], FakeGraph)
+    assert list(cache.graphs) == [0, 2]
+    statistics = cache.statistics()
+    assert (statistics["hits"], statistics["misses"], statistics["evictions"]) == (2, 3, 1)
+    assert statistics["size"] == 6400
+
+def test_invalidation(graph_files):
+    cache = GraphMemoryCache(1 << 20)
+    first = cache.get(0, graph_files[0], FakeGraph)
+    with open(graph_files[0], "w") as f:
+        f.write("50")
+    stat = os.stat(graph_files[0])
+    os.utime(graph_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    second = cache.get(0, graph_files[0], FakeGraph)
+    assert second is not first and second.num_vertices() == 50
+    assert cache.statistics()["invalidations"] == 1
+
+def test_graph_over_budget(graph_files):
+    cache = GraphMemoryCache(1000)
+    cache.get(0, graph_files[0], FakeGraph)
+    assert cache.statistics()["graphs"] == 0
+
+def test_set_budget(graph_files):
+    cache = GraphMemoryCache(1 << 20)
+    for key, path in enumerate(graph_files):
+        cache.get(key, path, FakeGraph)
+    cache.set_budget(7000)
+    assert list(cache.graphs) == [1, 2] and cache.statistics()["evictions"] == 1
+    cache.set_budget(0)
+    assert cache.statistics()["graphs"] == 0 and cache.statistics()["size"] == 0
+
+def test_union_of_properties(graph_files):
+    cache = GraphMemoryCache(1 << 20)
+    first = cache.get(0, graph_files[0], FakeGraph, ["hop_distance"])
+    assert first.loaded == ["hop_distance"]
+    # A subset of the held properties is a hit, other properties load the graph again with both
+    assert cache.get(0, graph_files[0], FakeGraph, []) is first
+    second = cache.get(0, graph_files[0], FakeGraph, ["avg_distance"])
+    assert second.loaded == ["avg_distance", "hop_distance"]
+    assert cache.get(0, graph_files[0], FakeGraph, ["hop_distance"]) is second
+    every = cache.get(0, graph_files[0], FakeGraph)
+    assert every.loaded is None and cache.get(0, graph_files[0], FakeGraph, ["ip"]) is every
+    statistics = cache.statistics()
+    # The graph is held and counted once
+    assert (statistics["graphs"], statistics["size"], statistics["hits"], statistics["misses"]) == (1, 3200, 3, 3)
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from graph_tool import Graph
+from ip_analysis_tool.util.graph_util import get_edge_keys, get_vertex_gids
+
+def test_edge_keys_of_large_ids():
+    g = Graph([(0, 1), (1, 2), (2, 0)], directed=True)
+    # IDs above 2^31, which older graphs stored wrapped around in a signed 32-bit property
+    ids = [(1 << 31) + 5, 7, (1 << 32) - 1]
+    g.vp["gid"] = g.new_vertex_property("int", vals=np.array(ids, dtype=np.uint32).view(np.int32))
+    assert get_vertex_gids(g).tolist() == ids
+    keys = get_edge_keys(g)
+    assert keys.dtype == np.uint64
+    assert sorted(keys.tolist()) == sorted([(7 << 32) | ids[0], (ids[0] << 32) | ids[2], (7 << 32) | ids[2]])
+    g.vp["gid"] = g.new_vertex_property("int64_t", vals=ids)
+    assert np.array_equal(get_edge_keys(g), keys)
+
+def test_edge_keys_of_unknown_ids():
+    g = Graph([(0, 1)], directed=True)
+    with pytest.raises(ValueError):
+        get_edge_keys(g, np.array([3, -1]))
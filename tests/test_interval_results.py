@@ -0,0 +1,28 @@
+import os
+import numpy as np
+from ip_analysis_tool.enums import TimeInterval
+from ip_analysis_tool.util.interval_results import get_results_folder, get_source_state, load_interval_result, save_interval_result
+
+def test_results_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    folder = get_results_folder("time_series", 1, {"diameter": False}, True, TimeInterval.MONTH)
+    assert os.path.isdir(folder)
+    assert folder.startswith(f"{tmp_path}/.cache/IPAnalysisTool/results/month/weighted/time_series-")
+    assert folder != get_results_folder("time_series", 1, {"diameter": True}, True, TimeInterval.MONTH)
+    assert folder != get_results_folder("time_series", 2, {"diameter": False}, True, TimeInterval.MONTH)
+
+def test_result_is_reused_while_graph_is_unchanged(tmp_path):
+    graph = tmp_path / "2021-01-04.gt"
+    assert get_source_state(str(graph)) is None
+    graph.write_bytes(b"graph")
+    source = get_source_state(str(graph))
+    result = {"i": 3, "num_vertices": np.int64(5), "radius_ms": np.float64(1.5), "diameter": None, "k_core": np.array([0, 2, 3])}
+    save_interval_result(str(tmp_path), "2021-01-04", source, result)
+    stored = load_interval_result(str(tmp_path), "2021-01-04", get_source_state(str(graph)))
+    assert stored["num_vertices"] == 5 and stored["radius_ms"] == 1.5 and stored["diameter"] is None
+    assert isinstance(stored["k_core"], np.ndarray) and stored["k_core"].tolist() == [0, 2, 3]
+    assert load_interval_result(str(tmp_path), "2021-01-11", source) is None
+    # The graph was generated again
+    graph.write_bytes(b"regenerated graph")
+    assert load_interval_result(str(tmp_path), "2021-01-04", get_source_state(str(graph))) is None
+    assert load_interval_result(str(tmp_path), "2021-01-04", None) is None
@@ -0,0 +1,36 @@
+import numpy as np
+from ip_analysis_tool.caching.ip_dictionary import IPDictionary
+
+def test_ids_are_stable(tmp_path):
+    path = str(tmp_path / "ip_dictionary.txt")
+    dictionary = IPDictionary(path)
+    ids = dictionary.get_ids(["192.0.2.1", "198.51.100.7", "192.0.2.1"])
+    assert ids.dtype == np.uint32
+    assert ids.tolist() == [0, 1, 0]
+    assert dictionary.get_ids(["203.0.113.9", "198.51.100.7"]).tolist() == [2, 1]
+    assert dictionary.get_ips([2, 0]) == ["203.0.113.9", "192.0.2.1"]
+    # A new process reads the same IDs from the file
+    reloaded = IPDictionary(path)
+    reloaded.refresh()
+    assert len(reloaded) == 3
+    assert reloaded.lookup(["198.51.100.7", "10.0.0.1"]).tolist() == [1, -1]
+
+def test_concurrent_appends(tmp_path):
+    path = str(tmp_path / "ip_dictionary.txt")
+    first, second = IPDictionary(path), IPDictionary(path)
+    assert first.get_ids(["192.0.2.1", "192.0.2.2"]).tolist() == [0, 1]
+    # The second dictionary hasn't read the file yet, it must not hand out the taken IDs
+    assert second.get_ids(["192.0.2.3", "192.0.2.1"]).tolist() == [2, 0]
+    assert first.lookup(["192.0.2.3"]).tolist() == [2]
+    with open(path) as f:
+        assert f.read().splitlines() == ["192.0.2.1", "192.0.2.2", "192.0.2.3"]
+
+def test_partial_line_is_not_read(tmp_path):
+    path = tmp_path / "ip_dictionary.txt"
+    path.write_bytes(b"192.0.2.1\n192.0.2")
+    dictionary = IPDictionary(str(path))
+    dictionary.refresh()
+    assert len(dictionary) == 1
+    with open(path, "ab") as f:
+        f.write(b".2\n")
+    assert dictionary.lookup(["192.0.2.2"]).tolist() == [1]
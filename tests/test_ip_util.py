@@ -0,0 +1,39 @@
+import ipaddress
+import numpy as np
+import pytest
+from ip_analysis_tool.util.ip_util import ReservedRangeIndex, DEFAULT_RESERVED_RANGES, INVALID_ADDRESS, cidr_to_range, ip_to_int, int_to_ip
+
+def test_ip_conversion():
+    assert ip_to_int("192.0.2.1/32") == 0xC0000201
+    assert int_to_ip(0xC0000201) == "192.0.2.1"
+    assert ip_to_int("localhost") == INVALID_ADDRESS
+
+def test_cidr_to_range():
+    assert cidr_to_range("10.0.0.0/8") == (0x0A000000, 0x0AFFFFFF)
+    assert cidr_to_range("192.0.2.7") == (0xC0000207, 0xC0000207)
+    # Host bits are ignored, the same as PostgreSQL's <<= operator
+    assert cidr_to_range("10.1.2.3/8") == (0x0A000000, 0x0AFFFFFF)
+    with pytest.raises(ValueError):
+        cidr_to_range("10.0.0.0/33")
+
+def test_reserved_range_index():
+    index = ReservedRangeIndex()
+    networks = [ipaddress.ip_network(block) for block in DEFAULT_RESERVED_RANGES]
+    rng = np.random.default_rng(1)
+    # Random addresses and the boundaries of all the blocks
+    addresses = list(rng.integers(0, 1 << 32, 20000))
+    for network in networks:
+        first, last = int(network.network_address), int(network.broadcast_address)
+        addresses += [first - 1, first, last, last + 1]
+    addresses = [address for address in addresses if 0 <= address < 1 << 32]
+    expected = [any(ipaddress.ip_address(int(address)) in network for network in networks) for address in addresses]
+    assert list(index.contains(np.array(addresses))) == expected
+    assert not index.contains([INVALID_ADDRESS])[0]
+    assert index.contains_address("172.16.5.4")
+    assert not index.contains_address("8.8.8.8")
+
+def test_reserved_range_index_merges_blocks():
+    index = ReservedRangeIndex(["10.0.0.0/9", "10.128.0.0/9", "10.0.0.0/16", "11.0.0.0/8"])
+    assert len(index) == 1
+    assert len(ReservedRangeIndex([])) == 0
+    assert not ReservedRangeIndex([]).contains([1])[0]
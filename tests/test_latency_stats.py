@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+from ip_analysis_tool.caching.latency_stats import LatencyStatistics, HISTOGRAM_GROWTH
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(1)
+    owners = rng.integers(0, 20, 5000)
+    values = rng.lognormal(2, 1, 5000)
+    return owners, values
+
+def add_samples(statistics, owners, values):
+    for owner, value in zip(owners, values):
+        statistics.owners.append(int(owner))
+        statistics.values.append(float(value))
+        statistics.flush_if_needed()
+    statistics.flush()
+
+def test_moments(samples):
+    owners, values = samples
+    statistics = LatencyStatistics(buffer_size=64)
+    add_samples(statistics, owners, values)
+    for item in range(20):
+        item_values = values[owners == item]
+        assert statistics.count[item] == len(item_values)
+        assert statistics.mean[item] == pytest.approx(item_values.mean())
+        assert statistics.variance()[item] == pytest.approx(item_values.var())
+        assert statistics.minimum()[item] == item_values.min()
+        assert statistics.maximum()[item] == item_values.max()
+
+def test_quantiles(samples):
+    owners, values = samples
+    statistics = LatencyStatistics()
+    add_samples(statistics, owners, values)
+    for q in (0.5, 0.95, 0.99):
+        estimates = statistics.quantile(q)
+        for item in range(20):
+            exact = np.quantile(values[owners == item], q, method="inverted_cdf")
+            assert estimates[item] == pytest.approx(exact, rel=HISTOGRAM_GROWTH - 1)
+
+def test_merge(samples):
+    owners, values = samples
+    whole = LatencyStatistics()
+    add_samples(whole, owners, values)
+    # Split the samples into two parts, the second one with the items in the reverse order
+    first, second = LatencyStatistics(), LatencyStatistics()
+    add_samples(first, owners[:2000], values[:2000])
+    add_samples(second, 19 - owners[2000:], values[2000:])
+    first.merge(second, 19 - np.arange(len(second)))
+    assert np.array_equal(first.count, whole.count)
+    assert np.allclose(first.mean, whole.mean)
+    assert np.allclose(first.variance(), whole.variance())
+    assert np.array_equal(first.minimum(), whole.minimum())
+    assert np.array_equal(first.maximum(), whole.maximum())
+    assert np.array_equal(first.quantile(0.95), whole.quantile(0.95))
+
+def test_from_arrays(samples):
+    owners, values = samples
+    statistics = LatencyStatistics()
+    add_samples(statistics, owners, values)
+    statistics.resize(25)
+    restored = LatencyStatistics.from_arrays(statistics.count, statistics.mean, statistics.variance(), statistics.minimum(),
+                                             statistics.maximum(), *statistics.get_histograms())
+    assert np.array_equal(restored.count, statistics.count)
+    assert np.allclose(restored.variance(), statistics.variance())
+    assert np.array_equal(restored.minimum(), statistics.minimum())
+    assert np.array_equal(restored.quantile(0.5), statistics.quantile(0.5))
+    assert restored.quantile(0.5)[24] == 0
@@ -0,0 +1,69 @@
+import datetime
+import pytest
+from ip_analysis_tool.caching import route_copy
+from ip_analysis_tool.caching.route_copy import copy_route_batches, decode_route_chunk, parse_array, parse_float_array, parse_timestamp
+
+class CopyCursor:
+    """
+    Stands in for a psycopg2 cursor, writes the given rows in the COPY CSV format.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def copy_expert(self, sql, file):
+        self.queries.append(sql)
+        for row in self.rows:
+            file.write(row.encode() + b"\n")
+
+@pytest.fixture
+def records():
+    start = datetime.datetime(2021, 1, 4)
+    return [([f"192.0.2.{i}", f"198.51.100.{i % 7}", "0.0.0.0"], [0.5 * i, 1.25 + i, 3.0 + i / 3], start + datetime.timedelta(minutes=i, microseconds=i))
+            for i in range(1000)]
+
+def to_copy_row(record):
+    route, times, date = record
+    return "{" + ",".join(route) + "}\t{" + ",".join(repr(time) for time in times) + "}\t" + date.isoformat(sep=" ")
+
+def test_parse_fields():
+    assert parse_array("{}") == []
+    assert parse_array("\\N") is None
+    assert parse_array("{192.0.2.1/32,NULL}") == ["192.0.2.1/32", None]
+    assert parse_array('{"a,b",NULL,"NULL"}') == ["a,b", None, "NULL"]
+    assert parse_float_array("{1.5,-2,NaN,NULL}")[:2] == [1.5, -2.0]
+    assert parse_float_array("{1.5,NULL}") == [1.5, None]
+    assert parse_timestamp("2021-01-04 12:00:00.5+01").utcoffset() == datetime.timedelta(hours=1)
+
+def test_decode_route_chunk():
+    data = ("{192.0.2.1/32,192.0.2.2/32}\t{0.5,1.25}\t2021-01-04 12:00:00.5+01\t192.0.2.2\n"
+            '"{""a,b"",NULL}"\t{1.5,NULL}\t2021-01-04 13:00:00+01\t\n'
+            '{}\t\t2021-01-04 14:00:00+01\t""\n').encode()
+    records = decode_route_chunk(data)
+    assert records[0] == (["192.0.2.1/32", "192.0.2.2/32"], [0.5, 1.25], parse_timestamp("2021-01-04 12:00:00.5+01"), "192.0.2.2")
+    # Quoted and NULL elements, NULL arrays and NULL or empty strings
+    assert records[1][:2] == (["a,b", None], [1.5, None]) and records[1][3] is None
+    assert records[2][:2] == ([], None) and records[2][3] == ""
+
+@pytest.mark.parametrize("chunk_size", [64, 1 << 20])
+def test_copy_route_batches(records, monkeypatch, chunk_size):
+    monkeypatch.setattr(route_copy, "COPY_CHUNK_SIZE", chunk_size)
+    cursor = CopyCursor([to_copy_row(record) for record in records])
+    batches = list(copy_route_batches(cursor, "SELECT 1", 300))
+    assert [len(batch) for batch in batches] == [300, 300, 300, 100]
+    assert [record for batch in batches for record in batch] == [tuple(record) for record in records]
+    assert cursor.queries == ["COPY (SELECT 1) TO STDOUT WITH (FORMAT csv, DELIMITER E'\\t')"]
+
+def test_copy_route_batches_closed_early(records, monkeypatch):
+    monkeypatch.setattr(route_copy, "COPY_CHUNK_SIZE", 64)
+    batches = copy_route_batches(CopyCursor([to_copy_row(record) for record in records]), "SELECT 1", 10)
+    assert len(next(batches)) == 10
+    # The reading thread has to finish even though its output isn't consumed
+    batches.close()
+
+def test_copy_route_batches_error():
+    class FailingCursor:
+        def copy_expert(self, sql, file):
+            raise RuntimeError("connection lost")
+    with pytest.raises(RuntimeError):
+        list(copy_route_batches(FailingCursor(), "SELECT 1", 10))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from ip_analysis_tool.caching.snapshot import GraphSnapshot, write_snapshot_arrays, is_snapshot_current, get_snapshot_path
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "2021-01-04.snapshot")
+    write_snapshot_arrays(
+        path,
+        sources=[0, 0, 1, 2, 0],
+        targets=[1, 2, 2, 3, 3],
+        ips=["192.0.2.1", "198.51.100.20", "203.0.113.255", "10.0.0.1"],
+        vertex_properties={"hop_distance": np.array([0, 1, 1, 2], dtype=np.int32)},
+        edge_properties={"traversals": np.array([5, 3, 2, 7, 1], dtype=np.int32)},
+        metadata={"graph": {"date": "2021-01-04"}, "source_mtime": 42})
+    return path
+
+def test_snapshot_arrays(snapshot_path):
+    snapshot = GraphSnapshot(snapshot_path)
+    assert (snapshot.num_vertices(), snapshot.num_edges()) == (4, 5)
+    assert snapshot.metadata == {"date": "2021-01-04"}
+    assert snapshot.vertex_properties() == ["hop_distance"]
+    assert snapshot.edge_properties() == ["traversals"]
+    assert isinstance(snapshot.vertex_property("hop_distance"), np.memmap)
+    assert snapshot.edge_property("traversals").tolist() == [5, 3, 2, 7, 1]
+    with pytest.raises(KeyError):
+        snapshot.vertex_property("avg_distance")
+
+def test_snapshot_adjacency(snapshot_path):
+    snapshot = GraphSnapshot(snapshot_path)
+    assert snapshot.out_edges(0).tolist() == [0, 1, 4]
+    assert snapshot.out_neighbors(0).tolist() == [1, 2, 3]
+    assert snapshot.in_neighbors(3).tolist() == [2, 0]
+    assert snapshot.out_neighbors(3).tolist() == []
+    assert snapshot.out_degrees().tolist() == [3, 1, 1, 0]
+    assert snapshot.in_degrees().tolist() == [0, 1, 2, 2]
+
+def test_snapshot_ips(snapshot_path):
+    snapshot = GraphSnapshot(snapshot_path)
+    assert snapshot.ip(2) == "203.0.113.255"
+    assert snapshot.ips() == ["192.0.2.1", "198.51.100.20", "203.0.113.255", "10.0.0.1"]
+
+def test_snapshot_replaced(snapshot_path):
+    old = GraphSnapshot(snapshot_path)
+    traversals = old.edge_property("traversals")
+    write_snapshot_arrays(snapshot_path, [0], [1], ["192.0.2.1", "192.0.2.2"], {}, {"traversals": np.array([9], dtype=np.int32)}, {"graph": None})
+    # The mapped arrays of the old snapshot stay readable
+    assert traversals.tolist() == [5, 3, 2, 7, 1]
+    assert GraphSnapshot(snapshot_path).edge_property("traversals").tolist() == [9]
+
+def test_snapshot_current(tmp_path):
+    graph_path = tmp_path / "2021-01-04.gt"
+    graph_path.write_bytes(b"")
+    path = get_snapshot_path(str(graph_path))
+    assert path == str(tmp_path / "2021-01-04.snapshot")
+    assert not is_snapshot_current(path, str(graph_path))
+    write_snapshot_arrays(path, [], [], [], {}, {}, {"graph": None, "source_mtime": graph_path.stat().st_mtime_ns})
+    assert is_snapshot_current(path, str(graph_path))
@@ -0,0 +1,48 @@
+import datetime
+from ip_analysis_tool.caching.route_copy import copy_route_batches
+from ip_analysis_tool.caching.synthetic_routes import GAP_ADDRESS, SyntheticCursor, SyntheticTopology, generate_routes
+
+START, END = datetime.date(2021, 1, 4), datetime.date(2021, 1, 11)
+
+QUERY = """
+            SELECT t_route, t_roundtrip, t_date FROM topology t JOIN non_reserved_ip n ON n.ip_addr = t.ip_addr
+               WHERE NOT ('0.0.0.0/32' = ANY(t_route)) AND t_status = 'C' AND t_date >= %s AND t_date <= %s AND t_hops > 1"""
+
+def test_routes_are_reproducible():
+    rows = generate_routes(START, END, 500, seed=3)
+    assert len(rows) == 500
+    assert rows == generate_routes(START, END, 500, seed=3)
+    assert rows != generate_routes(START, END, 500, seed=4)
+    dates = [row[2] for row in rows]
+    assert dates == sorted(dates) and START <= dates[0].date() and dates[-1].date() < END
+
+def test_topology_shape():
+    topology = SyntheticTopology(destinations=200, mean_hops=10, max_hops=16, access_hops=2, seed=1)
+    rows = generate_routes(START, END, 2000, topology, gap_rate=0.1, seed=1)
+    lengths = [len(row[0]) for row in rows]
+    assert min(lengths) >= 4 and max(lengths) <= 16
+    # All the routes leave through the access hops, unless one of them is unknown
+    assert all(row[0][:2] == [f"{address}/32" for address in topology.access] for row in rows if GAP_ADDRESS not in row[0])
+    assert all(len(row[0]) == len(row[1]) == row[4] for row in rows)
+    assert 100 < sum(GAP_ADDRESS in row[0] for row in rows) < 300
+
+def test_cursor_filters_routes():
+    rows = generate_routes(START, END, 2000, SyntheticTopology(reserved_rate=0.2, seed=2), seed=2)
+    cursor = SyntheticCursor(rows).connection.cursor(name="routes")
+    cursor.execute(QUERY, ("2021-01-04", "2021-01-08"))
+    records = cursor.fetchall()
+    assert 0 < len(records) < len(rows)
+    assert all(len(record) == 3 and GAP_ADDRESS not in record[0] and record[2] <= datetime.datetime(2021, 1, 8) for record in records)
+    assert not any(record[0][-1].startswith("10.") for record in records)
+    # Without the non-reserved table, the destinations are returned for the client-side filtering
+    cursor.execute(QUERY.replace("t_date FROM topology t JOIN non_reserved_ip n ON n.ip_addr = t.ip_addr", "t_date, host(t.ip_addr) FROM topology t"), ("2021-01-04", "2021-01-08"))
+    unfiltered = cursor.fetchall()
+    assert len(unfiltered) > len(records) and any(record[3].startswith("10.") for record in unfiltered)
+
+def test_copy_matches_cursor():
+    rows = generate_routes(START, END, 1000, seed=5)
+    cursor = SyntheticCursor(rows)
+    cursor.execute(QUERY, ("2021-01-04", "2021-01-11"))
+    expected = cursor.fetchall()
+    copied = [record for batch in copy_route_batches(cursor, cursor.mogrify(QUERY, ("2021-01-04", "2021-01-11")).decode(), 100) for record in batch]
+    assert copied == expected
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ip_analysis_tool.util.task_scheduler import ScheduledTask, run_scheduled
+
+def create_tasks(memories):
+    return [ScheduledTask(key=key, args=(key,), kwargs={}, memory=memory) for key, memory in enumerate(memories)]
+
+def exit_once(key, marker):
+    """
+    Kills its worker process the first time the task 0 is run, as the OOM killer would.
+    """
+    if key == 0 and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return key
+
+def test_memory_limit_and_order():
+    lock, running, peaks, started = threading.Lock(), {}, [], []
+    memories = [3, 9, 5, 1, 4, 6]
+    def worker(key):
+        with lock:
+            started.append(key)
+            running[key] = memories[key]
+            peaks.append(sum(running.values()))
+        time.sleep(0.02)
+        with lock:
+            del running[key]
+        return key * 2
+    outcomes = list(run_scheduled(worker, create_tasks(memories), 4, 10, executor_factory=lambda workers: ThreadPoolExecutor(workers)))
+    assert sorted(outcome["result"] for outcome in outcomes) == [0, 2, 4, 6, 8, 10]
+    assert all(outcome["error"] is None and outcome["attempts"] == 1 for outcome in outcomes)
+    # The largest task is started first and the running tasks stay within the limit
+    assert started[0] == 1 and max(peaks) <= 10
+
+def test_task_larger_than_limit_runs_alone():
+    outcomes = list(run_scheduled(lambda key: key, create_tasks([50, 1]), 2, 10, executor_factory=lambda workers: ThreadPoolExecutor(workers)))
+    assert sorted(outcome["result"] for outcome in outcomes) == [0, 1]
+
+def test_out_of_memory_is_retried():
+    calls, worker_counts = {}, []
+    def worker(key):
+        calls[key] = calls.get(key, 0) + 1
+        if key == 0 and calls[key] == 1: raise MemoryError()
+        if key == 1: raise ValueError("broken graph")
+        return key
+    def executor_factory(workers):
+        worker_counts.append(workers)
+        return ThreadPoolExecutor(workers)
+    outcomes = {outcome["key"]: outcome for outcome in run_scheduled(worker, create_tasks([5, 4, 3]), 4, executor_factory=executor_factory)}
+    assert outcomes[0]["result"] == 0 and outcomes[0]["attempts"] == 2
+    # Other errors aren't retried
+    assert isinstance(outcomes[1]["error"], ValueError) and outcomes[1]["attempts"] == 1
+    assert outcomes[2]["result"] == 2 and worker_counts == [4, 2]
+
+def test_out_of_memory_with_single_worker_fails():
+    def worker(key):
+        raise MemoryError()
+    outcomes = list(run_scheduled(worker, create_tasks([1]), 1, executor_factory=lambda workers: ThreadPoolExecutor(workers)))
+    assert len(outcomes) == 1 and isinstance(outcomes[0]["error"], MemoryError)
+
+def test_killed_worker_is_retried(tmp_path):
+    tasks = [ScheduledTask(key=key, args=(key, str(tmp_path / "killed")), kwargs={}, memory=3 - key) for key in range(3)]
+    outcomes = list(run_scheduled(exit_once, tasks, 2))
+    assert sorted(outcome["result"] for outcome in outcomes) == [0, 1, 2]
+    assert all(outcome["error"] is None for outcome in outcomes)